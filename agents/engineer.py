@@ -11,7 +11,7 @@ class Engineer(BaseAgent):
     def process(self, message: Message) -> Message:
         task = message.content
         if not isinstance(task, Task):
-            return self.send_message("Invalid input: expected Task object", "planner")
+            return self.send_message("Invalid input: expected Task object", "planner", message.context)
             
         # Generate or update code for pending subtasks
         updated = False
@@ -23,7 +23,7 @@ class Engineer(BaseAgent):
                 
         # Always return task to verifier, even if no updates
         # This ensures the workflow continues
-        return self.send_message(task, "verifier")
+        return self.send_message(task, "verifier", message.context)
         
     def _generate_code(self, subtask: Dict[str, str]) -> str:
         """Generate code based on subtask description"""
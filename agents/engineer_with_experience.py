@@ -5,6 +5,7 @@ from core.message import Message
 from core.task import Task
 from core.experience import Experience
 from core.experience_pool import ExperiencePool
+from core.cluster_template import ClusterTemplate
 
 class EngineerWithExperience(BaseAgent):
     """Engineer agent that uses experience pool for code generation"""
@@ -16,42 +17,68 @@ class EngineerWithExperience(BaseAgent):
     def process(self, message: Message) -> Message:
         task = message.content
         if not isinstance(task, Task):
-            return self.send_message("Invalid input: expected Task object", "planner")
+            return self.send_message("Invalid input: expected Task object", "planner", message.context)
             
-        # Generate or update code for pending subtasks
-        updated = False
-        for subtask in task.subtasks:
-            if subtask["id"] not in (task.code_blocks or {}):
-                code = self._generate_code_with_experience(subtask)
-                task.add_code_block(subtask["id"], code)
-                updated = True
-                
-                # Add to experience pool
+        # Look up cluster templates and similar experiences for all pending
+        # subtasks in one call
+        pending = [
+            subtask for subtask in task.subtasks
+            if subtask["id"] not in (task.code_blocks or {})
+        ]
+        lookups = self.experience_pool.find_with_template_batch(
+            [subtask["description"] for subtask in pending]
+        )
+
+        # Generate code for pending subtasks
+        for subtask, (template, similar_experiences) in zip(pending, lookups):
+            code = self._generate_code_with_experience(subtask, similar_experiences, template)
+            task.add_code_block(subtask["id"], code)
+            
+            # Add to experience pool, once per run when candidates
+            # generate the same code
+            if self._first_in_run(message, subtask["description"], code):
                 self.experience_pool.add_experience(
                     question=subtask["description"],
                     function=code
                 )
                 
-        if updated:
-            return self.send_message(task, "verifier")
-        return self.send_message(task, "planner")
+        # Always hand the task to the verifier; returning it to the planner
+        # when nothing was pending made the two agents loop forever
+        return self.send_message(task, "verifier", message.context)
         
-    def _generate_code_with_experience(self, subtask: dict) -> str:
+    def _first_in_run(self, message: Message, question: str, code: str) -> bool:
+        """Whether this run has not yet recorded the experience"""
+        context = message.context
+        if context is None:
+            return True
+        with context.lock:
+            if (question, code) in context.recorded:
+                return False
+            context.recorded.add((question, code))
+            return True
+            
+    def _generate_code_with_experience(self, 
+                                       subtask: dict,
+                                       similar_experiences: List[Tuple[Experience, float]],
+                                       template: Optional[ClusterTemplate] = None) -> str:
         """Generate code using similar experiences as examples"""
         description = subtask["description"]
         
-        # Find similar experiences
-        similar_experiences = self.experience_pool.find_similar(description)
-        
         if not similar_experiences:
-            # Fall back to simple code generation
-            return self._generate_basic_code(description)
+            # Fall back to simple code generation, with the cluster's
+            # generic template as a reference
+            return self._generate_basic_code(description, template)
             
         # Use the most similar experience's code as template
         return self._adapt_code_from_experiences(description, similar_experiences)
         
-    def _generate_basic_code(self, description: str) -> str:
-        """Generate basic code template for a given description"""
+    def _generate_basic_code(self, description: str, template: Optional[ClusterTemplate] = None) -> str:
+        """
+        Generate basic code template for a given description
+
+        The cluster template was written for similar questions, not for
+        this subtask, so it is only included as commented-out context.
+        """
         if "load" in description.lower():
             return """
 def load_data(file_path):
@@ -71,7 +98,11 @@ def analyze_data(data):
     plt.show()
     return stats
 """
-        return f"# TODO: Implement {description}"
+        code = f"# TODO: Implement {description}"
+        if template is not None and template.function_template:
+            reference = "\n".join(f"# {line}" for line in template.function_template.splitlines())
+            code += f"\n# Template for similar questions ({template.question_template}):\n{reference}"
+        return code
         
     def _adapt_code_from_experiences(self, 
                                    description: str, 
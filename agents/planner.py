@@ -1,5 +1,6 @@
 # agents/planner.py
-from typing import List, Dict
+import copy
+from typing import Any, List, Dict, Union
 import uuid
 from core.base_agent import BaseAgent
 from core.message import Message
@@ -9,15 +10,22 @@ class Planner(BaseAgent):
     def __init__(self):
         super().__init__("planner")
         
-    def process(self, message: Message) -> Message:
+    def process(self, message: Message) -> Union[Message, List[Message]]:
         if isinstance(message.content, str):
             # Create new analysis plan
             task = self._create_analysis_plan(message.content)
-            return self.send_message(task, "engineer")
+            fan_out = message.context.fan_out if message.context is not None else 1
+            if fan_out > 1:
+                # Start every candidate pipeline from the same plan at once
+                return [
+                    self.send_message(candidate, "engineer", message.context)
+                    for candidate in self._candidates(task, fan_out)
+                ]
+            return self.send_message(task, "engineer", message.context)
         elif isinstance(message.content, Task):
             # Update existing plan based on feedback
             updated_task = self._update_plan(message.content)
-            return self.send_message(updated_task, "engineer")
+            return self.send_message(updated_task, "engineer", message.context)
             
     def _create_analysis_plan(self, requirements: str) -> Task:
         # Validate requirements
@@ -37,11 +45,22 @@ class Planner(BaseAgent):
             subtasks=subtasks
         )
         
+    def _candidates(self, task: Task, count: int) -> List[Task]:
+        """Independent copies of a plan, one per candidate pipeline"""
+        candidates = []
+        for i in range(count):
+            candidate = copy.deepcopy(task)
+            candidate.task_id = f"{task.task_id}-{i}"
+            candidates.append(candidate)
+        return candidates
+        
     def _update_plan(self, task: Task) -> Task:
         # Analyze execution results and modify plan if needed
         if task.execution_results:
-            for subtask_id, result in task.execution_results.items():
-                if result.get("status") == "failed":
+            for subtask_id, result in list(task.execution_results.items()):
+                # Blocks that only failed because an upstream block did are
+                # retried as they are once the upstream block is fixed
+                if result.get("status") == "failed" and not result.get("blocked_by"):
                     # Modify failed subtask
                     self._modify_subtask(task, subtask_id)
         return task
@@ -80,17 +99,35 @@ class Planner(BaseAgent):
                 {"id": f"{failed_subtask_id}_2", "description": f"Verify and validate results"}
             ]
             
-        # Replace the failed subtask with new subtasks
+        # Chain the new steps in place of the failed subtask: the first step
+        # takes over its dependencies and the last one its dependents
+        upstream = list(failed_subtask.get("depends_on", []))
+        for subtask in new_subtasks:
+            subtask["depends_on"] = upstream
+            upstream = [subtask["id"]]
+        for subtask in task.subtasks:
+            if failed_subtask_id in subtask.get("depends_on", []):
+                subtask["depends_on"] = [
+                    upstream[0] if dep == failed_subtask_id else dep
+                    for dep in subtask["depends_on"]
+                ]
+            
+        # Replace the failed subtask with new subtasks and drop its stale code
         task.subtasks = [
             st for st in task.subtasks if st["id"] != failed_subtask_id
         ] + new_subtasks
+        if task.code_blocks:
+            task.code_blocks.pop(failed_subtask_id, None)
+        if task.execution_results:
+            task.execution_results.pop(failed_subtask_id, None)
         
-    def _generate_subtasks(self, requirements: str) -> List[Dict[str, str]]:
-        # Example subtasks generation
+    def _generate_subtasks(self, requirements: str) -> List[Dict[str, Any]]:
+        # Example subtasks generation; depends_on lists the subtasks whose
+        # results a subtask consumes
         subtasks = [
-            {"id": "1", "description": "Load and preprocess data"},
-            {"id": "2", "description": "Perform exploratory data analysis"},
-            {"id": "3", "description": "Build analytical models"},
-            {"id": "4", "description": "Generate insights and visualizations"}
+            {"id": "1", "description": "Load and preprocess data", "depends_on": []},
+            {"id": "2", "description": "Perform exploratory data analysis", "depends_on": ["1"]},
+            {"id": "3", "description": "Build analytical models", "depends_on": ["1"]},
+            {"id": "4", "description": "Generate insights and visualizations", "depends_on": ["2", "3"]}
         ]
         return subtasks
\ No newline at end of file
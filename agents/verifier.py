@@ -1,47 +1,137 @@
 # agents/verifier.py
-from typing import Dict, Any
-import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, Any, List, Optional, Union
 from core.base_agent import BaseAgent
 from core.message import Message
 from core.task import Task, TaskStatus
+from core.code_executor import InProcessExecutor, WorkerPool, failure
+from core.execution_cache import ExecutionCache
+from core.dataset_registry import DatasetRegistry
 
 class Verifier(BaseAgent):
-    def __init__(self):
+    def __init__(self,
+                 executor: Optional[Union[InProcessExecutor, WorkerPool]] = None,
+                 cache: Optional[ExecutionCache] = None,
+                 datasets: Optional[DatasetRegistry] = None):
         super().__init__("verifier")
+        # Runs code blocks; a WorkerPool isolates them in worker processes
+        self.executor = executor if executor is not None else InProcessExecutor()
+        # Results of blocks that already passed, so unchanged blocks are not re-run
+        self.cache = cache if cache is not None else ExecutionCache()
+        # Published input files, reachable from code blocks as load_dataset(name)
+        self.datasets = datasets
         
     def process(self, message: Message) -> Message:
         task = message.content
         if not isinstance(task, Task):
-            return self.send_message("Invalid input: expected Task object", "engineer")
+            return self.send_message("Invalid input: expected Task object", "engineer", message.context)
             
-        # Execute and verify each code block
-        for subtask_id, code in (task.code_blocks or {}).items():
-            result = self._execute_and_verify(code)
+        # Execute and verify the code blocks as a dependency graph
+        for subtask_id, result in self._execute_graph(task).items():
+            # Exports are only needed while the graph runs
+            result = {key: value for key, value in result.items() if key != "exports"}
             task.update_execution_result(subtask_id, result)
             
         if self._needs_revision(task):
-            return self.send_message(task, "planner")
-        return self.send_message(task, "voter")
+            return self.send_message(task, "planner", message.context)
+        return self.send_message(task, "voter", message.context)
         
     def _execute_and_verify(self, code: str) -> Dict[str, Any]:
-        try:
-            # Create isolated environment
-            local_vars = {}
-            exec(code, {}, local_vars)
-            
-            # Basic verification
-            result = {
-                "status": "success",
-                "variables": list(local_vars.keys()),
-                "output": str(local_vars)
-            }
-        except Exception as e:
-            result = {
-                "status": "failed",
-                "error": str(e),
-                "traceback": traceback.format_exc()
-            }
-        return result
+        return self.executor.run(code)
+
+    def _execute_graph(self, task: Task) -> Dict[str, Dict[str, Any]]:
+        """
+        Run the code blocks in dependency order
+
+        Blocks whose dependencies have all passed are submitted together, so
+        independent branches run concurrently on a WorkerPool. Each block
+        sees the exports of all its upstream blocks, plus load_dataset when
+        a DatasetRegistry is attached. Blocks that already
+        passed with the same code and upstream keys reuse the cached result;
+        blocks downstream of a failure are not run.
+        """
+        blocks = task.code_blocks or {}
+        dependencies = {
+            subtask_id: [dep for dep in task.dependencies(subtask_id) if dep in blocks]
+            for subtask_id in blocks
+        }
+        # Blocks whose exports some other block consumes
+        upstream = {dep for deps in dependencies.values() for dep in deps}
+        results: Dict[str, Dict[str, Any]] = {}
+        keys: Dict[str, List[str]] = {}
+        context = None
+        roots: List[str] = []
+        if self.datasets is not None:
+            context = {"load_dataset": self.datasets.loader()}
+            # Results depend on the published data as well as on the code
+            roots = [self.datasets.fingerprint()]
+        waiting = dict(dependencies)
+        running: Dict[Future, str] = {}
+
+        while waiting or running:
+            # Start (or resolve from the cache) every block that is ready
+            progressed = False
+            for subtask_id, deps in list(waiting.items()):
+                if any(dep not in results for dep in deps):
+                    continue
+                del waiting[subtask_id]
+                progressed = True
+
+                failed = [dep for dep in deps if results[dep].get("status") != "success"]
+                if failed:
+                    results[subtask_id] = dict(
+                        failure(f"Upstream subtask {failed[0]} failed"), blocked_by=failed[0]
+                    )
+                    continue
+
+                code = blocks[subtask_id]
+                keys[subtask_id] = roots + [self.cache.make_key(blocks[dep], keys[dep]) for dep in deps]
+                cached = self.cache.get(code, keys[subtask_id], require_exports=subtask_id in upstream)
+                if cached is not None:
+                    # Marked so the Voter does not charge its original run again
+                    results[subtask_id] = dict(cached, cached=True)
+                    continue
+
+                inputs = [
+                    results[ancestor]["exports"]
+                    for ancestor in self._ancestors(subtask_id, dependencies)
+                    if "exports" in results[ancestor]
+                ]
+                # Only blocks with dependents send their values back
+                running[self.executor.submit(code, inputs, context, export=subtask_id in upstream)] = subtask_id
+
+            if not running:
+                if waiting and not progressed:
+                    # Whatever is left waits on itself
+                    for subtask_id in waiting:
+                        results[subtask_id] = failure("Dependency cycle between subtasks")
+                    waiting.clear()
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                subtask_id = running.pop(future)
+                result = future.result()
+                self.cache.put(blocks[subtask_id], result, keys[subtask_id])
+                results[subtask_id] = result
+
+        return {subtask_id: results[subtask_id] for subtask_id in blocks}
+
+    @staticmethod
+    def _ancestors(subtask_id: str, dependencies: Dict[str, List[str]]) -> List[str]:
+        """Transitive dependencies of a subtask, furthest upstream first"""
+        order: List[str] = []
+        seen = set()
+
+        def visit(node: str) -> None:
+            for dep in dependencies.get(node, []):
+                if dep not in seen:
+                    seen.add(dep)
+                    visit(dep)
+                    order.append(dep)
+
+        visit(subtask_id)
+        return order
         
     def _needs_revision(self, task: Task) -> bool:
         """Check if any subtask failed and needs revision"""
@@ -1,41 +1,117 @@
 # agents/voter.py
-from typing import List, Optional
+import copy
+import threading
+from typing import Dict, List, Optional, Sequence, Union
 from core.base_agent import BaseAgent
 from core.message import Message
+from core.run_context import RunContext
+from core.stopping_policy import PerfectScore, StoppingPolicy
 from core.task import Task, TaskStatus
 
 class Voter(BaseAgent):
-    def __init__(self, max_iterations: int = 5):
+    def __init__(self,
+                 max_iterations: int = 5,
+                 stopping_policies: Optional[Sequence[StoppingPolicy]] = None):
         super().__init__("voter")
         self.max_iterations = max_iterations
-        self.iterations = 0
-        self.candidates: List[Task] = []
+        # Any policy can end a run before all candidates are in; by default
+        # a candidate that passes every code block is selected right away
+        self.stopping_policies = list(stopping_policies) if stopping_policies is not None else [PerfectScore()]
+        self.stats: Dict[str, int] = {"runs": 0, "stopped_early": 0, "iterations_saved": 0}
+        self._stats_lock = threading.Lock()
         
-    def process(self, message: Message) -> Optional[Message]:
+    def process(self, message: Message) -> Union[Message, List[Message], None]:
         task = message.content
         if not isinstance(task, Task):
-            return self.send_message("Invalid input: expected Task object", "verifier")
+            return self.send_message("Invalid input: expected Task object", "verifier", message.context)
+        context = message.context
+        if context is None:
+            raise ValueError("Voter requires a message with a RunContext")
+        if context.fan_out > 1:
+            return self._gather(task, message)
             
-        self.candidates.append(task)
-        self.iterations += 1
-        
-        if self.iterations >= self.max_iterations:
-            best_task = self._select_best_task()
-            return self.send_message(best_task, "output")
-        return self.send_message(task, "planner")
-        
-    def _select_best_task(self) -> Task:
-        """Select the best task based on execution results"""
-        def score_task(task: Task) -> float:
-            if not task.execution_results:
-                return 0.0
-                
-            success_rate = sum(
-                1 for result in task.execution_results.values()
-                if result.get("status") == "success"
-            ) / len(task.execution_results)
-            
-            return success_rate
+        # Iterations and candidates are per run. The Planner revises this
+        # same Task in place for the next iteration, so keep a snapshot of
+        # the candidate as it was scored
+        with context.lock:
+            self._add_candidate(context, copy.deepcopy(task))
+            if context.iterations < self.max_iterations and not self._should_stop(context):
+                return self.send_message(task, "planner", message.context)
+            best_task = self._select(context, self.max_iterations)
+        return self.send_message(best_task, "output", message.context)
+        
+    def _gather(self, task: Task, message: Message) -> List[Message]:
+        """
+        Collect one of the concurrent candidates of a fan-out run
+
+        Selects once every candidate has arrived, or as soon as a stopping
+        policy is satisfied; candidates arriving after the selection are
+        dropped.
+        """
+        context = message.context
+        with context.lock:
+            if context.selected:
+                return []
+            self._add_candidate(context, task)
+            if context.iterations < context.fan_out and not self._should_stop(context):
+                return []
+            best_task = self._select(context, context.fan_out)
+        return [self.send_message(best_task, "output", context)]
+        
+    def _add_candidate(self, context: RunContext, task: Task) -> None:
+        context.candidates.append(task)
+        context.iterations += 1
+        context.scores.append(self._score(task))
+        context.cost += self._cost(task)
+        
+    def _should_stop(self, context: RunContext) -> bool:
+        """Whether a stopping policy ends the run; records which one"""
+        for policy in self.stopping_policies:
+            if policy.should_stop(context):
+                context.stop_reason = repr(policy)
+                return True
+        return False
+        
+    def _select(self, context: RunContext, target: int) -> Task:
+        """Pick the run's best candidate and record the iterations saved"""
+        context.selected = True
+        context.iterations_saved = max(0, target - context.iterations)
+        with self._stats_lock:
+            self.stats["runs"] += 1
+            self.stats["iterations_saved"] += context.iterations_saved
+            if context.iterations_saved:
+                self.stats["stopped_early"] += 1
+        return self._select_best_task(context.candidates)
+        
+    @staticmethod
+    def _score(task: Task) -> float:
+        """Fraction of the task's code blocks that executed successfully"""
+        if not task.execution_results:
+            return 0.0
             
-        scored_tasks = [(score_task(task), task) for task in self.candidates]
-        return max(scored_tasks, key=lambda x: x[0])[1]
\ No newline at end of file
+        return sum(
+            1 for result in task.execution_results.values()
+            if result.get("status") == "success"
+        ) / len(task.execution_results)
+        
+    @staticmethod
+    def _cost(task: Task) -> float:
+        """
+        Total wall time the task's code blocks took to execute; results
+        the Verifier served from its cache ran nothing and cost nothing
+        """
+        return sum(
+            (result.get("metrics") or {}).get("wall_time") or 0.0
+            for result in (task.execution_results or {}).values()
+            if not result.get("cached")
+        )
+        
+    def _select_best_task(self, candidates: List[Task]) -> Task:
+        """
+        Select the best task based on execution results
+
+        Ties on success rate go to the candidate whose code blocks took the
+        least total wall time to execute.
+        """
+        scored_tasks = [((self._score(task), -self._cost(task)), task) for task in candidates]
+        return max(scored_tasks, key=lambda x: x[0])[1]
@@ -0,0 +1,93 @@
+# benchmarks/bench_ann_recall.py
+"""
+Compares recall@k and queries per second of the approximate vector indexes
+against exact search on synthetic clustered embeddings.
+
+Usage:
+    python -m benchmarks.bench_ann_recall [--size 200000] [--dim 128] [--k 10]
+"""
+import argparse
+import time
+import numpy as np
+from core.vector_store import VectorStore
+from core.vector_index import FlatIndex, IVFIndex, HNSWIndex, hnswlib
+
+def make_data(size: int, dim: int, n_queries: int, seed: int = 0):
+    """Gaussian blobs roughly resembling clustered text embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(256, dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=size + n_queries)
+    data = centers[labels] + 1.5 * rng.normal(size=(size + n_queries, dim)).astype(np.float32)
+    return data[:size], data[size:]
+
+def measure(store: VectorStore, queries: np.ndarray, k: int, batch_size: int):
+    start = time.perf_counter()
+    results = [
+        store.search_batch(queries[i:i + batch_size], k)[0]
+        for i in range(0, len(queries), batch_size)
+    ]
+    elapsed = time.perf_counter() - start
+    return np.vstack(results), len(queries) / elapsed
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([
+        len(set(row) & set(expected)) / len(expected)
+        for row, expected in zip(found, truth)
+    ]))
+
+def run(size: int, dim: int, k: int, n_queries: int, batch_size: int) -> None:
+    data, queries = make_data(size, dim, n_queries)
+    n_lists = int(np.sqrt(size))
+
+    print(f"{'index':<24} {'build s':>8} {'recall@' + str(k):>10} {'QPS':>10}")
+
+    def report(name, index_factory, configure=None):
+        store = VectorStore(index=index_factory())
+        start = time.perf_counter()
+        store.add_vectors(data)
+        build = time.perf_counter() - start
+        for label, setup in (configure or [(name, None)]):
+            if setup:
+                setup(store.index)
+            found, qps = measure(store, queries, k, batch_size)
+            print(f"{label:<24} {build:>8.2f} {recall(found, truth):>10.3f} {qps:>10.0f}")
+
+    exact = VectorStore(index=FlatIndex())
+    exact.add_vectors(data)
+    truth, qps = measure(exact, queries, k, batch_size)
+    print(f"{'exact':<24} {'-':>8} {1.0:>10.3f} {qps:>10.0f}")
+
+    report(
+        f"ivf n_lists={n_lists}",
+        lambda: IVFIndex(n_lists=n_lists),
+        [
+            (f"ivf nprobe={nprobe}", lambda index, n=nprobe: setattr(index, 'nprobe', n))
+            for nprobe in (1, 4, 16, 64)
+        ]
+    )
+
+    if hnswlib is None:
+        print("hnsw                     skipped (pip install hnswlib)")
+        return
+    report(
+        "hnsw",
+        lambda: HNSWIndex(),
+        [
+            (f"hnsw ef={ef}", lambda index, e=ef: setattr(index, 'ef_search', e))
+            for ef in (16, 64, 256)
+        ]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="queries per search_batch call (1 = engineer-style lookups)")
+    args = parser.parse_args()
+    run(args.size, args.dim, args.k, args.queries, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_cluster_selection.py
+"""
+Measures the cost of automatic cluster-count selection as the pool grows.
+Candidate k values are scored on a fixed-size sample, so selection time
+should stay flat while the single full KMeans fit grows with the pool.
+
+Usage:
+    python -m benchmarks.bench_cluster_selection [--sizes 1000 10000 100000] [--dim 64]
+"""
+import argparse
+import time
+import numpy as np
+from core.cluster_manager import ClusterManager
+
+def make_data(size: int, dim: int, n_centers: int, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs roughly resembling clustered text embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = 4.0 * rng.normal(size=(n_centers, dim)).astype(np.float32)
+    labels = rng.integers(0, n_centers, size=size)
+    return centers[labels] + rng.normal(size=(size, dim)).astype(np.float32)
+
+def run(sizes, dim: int, n_centers: int, max_clusters: int, sample_size: int) -> None:
+    print(f"{'pool size':>10} {'select s':>9} {'total s':>10} {'k':>4} {'after merge':>12}")
+    for size in sizes:
+        data = make_data(size, dim, n_centers)
+        manager = ClusterManager(
+            "unused", auto_k=True, max_clusters=max_clusters,
+            selection_sample_size=sample_size, random_state=0
+        )
+        start = time.perf_counter()
+        manager.select_n_clusters(data)
+        select = time.perf_counter() - start
+
+        start = time.perf_counter()
+        labels = manager.cluster(data)
+        total = time.perf_counter() - start
+        print(f"{size:>10} {select:>9.2f} {total:>10.2f} {manager.selected_k:>4} "
+              f"{len(np.unique(labels)):>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--centers", type=int, default=8)
+    parser.add_argument("--max-clusters", type=int, default=16)
+    parser.add_argument("--sample-size", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.centers, args.max_clusters, args.sample_size)
+
+if __name__ == "__main__":
+    main()
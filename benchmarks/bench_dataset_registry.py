@@ -0,0 +1,87 @@
+# benchmarks/bench_dataset_registry.py
+"""
+Compares code blocks that each re-parse a CSV in a worker with blocks that
+attach to the same data published once through DatasetRegistry.
+
+Usage:
+    python -m benchmarks.bench_dataset_registry [--rows 5000000] [--blocks 8] [--workers 4]
+    python -m benchmarks.bench_dataset_registry --csv /path/to/large.csv --column value
+
+Use --rows 40000000 (about 2.5 GB) for a multi-GB file.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from core.code_executor import WorkerPool
+from core.dataset_registry import DatasetRegistry
+
+def make_csv(path: str, rows: int, chunk_size: int = 1_000_000, seed: int = 0) -> None:
+    """Survey-like CSV with numeric and text columns, written in chunks"""
+    rng = np.random.default_rng(seed)
+    segments = np.array(["retail", "online", "wholesale", "partner"])
+    for start in range(0, rows, chunk_size):
+        size = min(chunk_size, rows - start)
+        pd.DataFrame({
+            "customer_id": np.arange(start, start + size),
+            "satisfaction_score": rng.integers(1, 6, size),
+            "age": rng.integers(18, 90, size),
+            "value": rng.gamma(2.0, 100.0, size).round(2),
+            "segment": segments[rng.integers(0, len(segments), size)]
+        }).to_csv(path, mode="a" if start else "w", header=start == 0, index=False)
+
+def run_blocks(pool: WorkerPool, code: str, blocks: int, context=None) -> float:
+    start = time.perf_counter()
+    futures = [pool.submit(code, context=context) for _ in range(blocks)]
+    results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if result["status"] != "success"]
+    if failed:
+        raise RuntimeError(failed[0]["error"])
+    return elapsed
+
+def run(path: str, column: str, blocks: int, workers: int) -> None:
+    size_mb = os.path.getsize(path) / 1024 ** 2
+    print(f"{path}: {size_mb:.0f} MB, {blocks} blocks on {workers} workers")
+    print(f"{'mode':<16} {'setup s':>8} {'blocks s':>9} {'per block s':>12}")
+
+    with WorkerPool(n_workers=workers, timeout=3600, preload=["pandas"]) as pool:
+        # Wait until every worker has finished preloading
+        run_blocks(pool, "x = 1", workers)
+
+        parse = f"import pandas as pd\nframe = pd.read_csv({path!r})\nresult = float(frame[{column!r}].mean())\ndel frame"
+        elapsed = run_blocks(pool, parse, blocks)
+        print(f"{'read_csv':<16} {'-':>8} {elapsed:>9.2f} {elapsed / blocks:>12.3f}")
+
+        registry = DatasetRegistry()
+        try:
+            start = time.perf_counter()
+            registry.register(path, "bench")
+            setup = time.perf_counter() - start
+            attach = f"frame = load_dataset('bench')\nresult = float(frame[{column!r}].mean())\ndel frame"
+            elapsed = run_blocks(pool, attach, blocks, context={"load_dataset": registry.loader()})
+            print(f"{'shared memory':<16} {setup:>8.2f} {elapsed:>9.2f} {elapsed / blocks:>12.3f}")
+        finally:
+            registry.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", help="existing CSV file (default: generate one)")
+    parser.add_argument("--column", default="value", help="numeric column the blocks aggregate")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--blocks", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.csv:
+        run(args.csv, args.column, args.blocks, args.workers)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.csv")
+        make_csv(path, args.rows)
+        run(path, args.column, args.blocks, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_run_many.py
+"""
+Measures pipeline throughput (runs per minute) of MultiAgentSystem.run_many
+at several concurrency levels, against calling run() once per requirement.
+
+The OpenAI embedding and chat endpoints are replaced by stubs that sleep
+for a fixed latency, so no API key or network access is needed.
+
+Usage:
+    python -m benchmarks.bench_run_many [--runs 32] [--concurrency 1 2 4 8 16]
+        [--embedding-latency 0.05] [--llm-latency 0.5] [--workers 4]
+        [--parallel-candidates] [--no-early-stop]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Tuple
+from unittest.mock import patch
+import numpy as np
+from main import MultiAgentSystem
+
+def stub_embedding(latency: float, dim: int):
+    """Embedding.create stub: one request costs `latency`, whatever its size"""
+    def create(model, input):
+        time.sleep(latency)
+        texts = input if isinstance(input, list) else [input]
+        data = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            data.append({"embedding": np.random.default_rng(seed).normal(size=dim).tolist()})
+        return {"data": data}
+    return create
+
+def stub_chat(latency: float):
+    """ChatCompletion.create stub returning a fixed template"""
+    def create(model, messages, **kwargs):
+        time.sleep(latency)
+        content = "Analyze the dataset ### def analyze(data):\n    return data.describe()"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    return create
+
+def make_requirements(runs: int):
+    return [f"Analyze dataset {i}:\n1. Load the data\n2. Summarize it\n3. Plot trends" for i in range(runs)]
+
+def run_level(directory: str, requirements, concurrency: int, workers: int, max_iterations: int,
+              parallel_candidates: bool = False, early_stop: bool = True) -> Tuple[float, int]:
+    """
+    Seconds to finish every run and the Voter iterations saved by early
+    stopping; concurrency 0 calls run() sequentially
+    """
+    system = MultiAgentSystem(
+        "unused",
+        max_iterations=max_iterations,
+        experience_pool_path=os.path.join(directory, f"pool_{concurrency}.pkl"),
+        execution_workers=workers,
+        parallel_candidates=parallel_candidates,
+        stopping_policies=None if early_stop else []
+    )
+    try:
+        # Wait until every worker has finished preloading
+        system.executor.run_many({str(i): "x = 1" for i in range(max(workers, 1))})
+        start = time.perf_counter()
+        if concurrency == 0:
+            results = [system.run(text) for text in requirements]
+        else:
+            results = [result for _, result in system.run_many(requirements, concurrency=concurrency)]
+        elapsed = time.perf_counter() - start
+    finally:
+        system.close()
+    failed = [result for result in results if result is None or result.sender_id == "system"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} runs failed")
+    return elapsed, system.agents["voter"].stats["iterations_saved"]
+
+def run(runs: int, levels, embedding_latency: float, llm_latency: float,
+        workers: int, max_iterations: int, dim: int, parallel_candidates: bool = False,
+        early_stop: bool = True) -> None:
+    requirements = make_requirements(runs)
+    print(f"{runs} runs, embedding latency {embedding_latency}s, LLM latency {llm_latency}s, "
+          f"{workers} execution workers, {'parallel' if parallel_candidates else 'serial'} candidates")
+    print(f"{'mode':<16} {'total s':>8} {'runs/min':>9} {'saved/run':>10}")
+    with patch("openai.Embedding.create", side_effect=stub_embedding(embedding_latency, dim)), \
+            patch("openai.ChatCompletion.create", side_effect=stub_chat(llm_latency)), \
+            tempfile.TemporaryDirectory() as directory:
+        for concurrency in [0] + list(levels):
+            elapsed, saved = run_level(
+                directory, requirements, concurrency, workers, max_iterations, parallel_candidates, early_stop
+            )
+            mode = "run() loop" if concurrency == 0 else f"run_many x{concurrency}"
+            print(f"{mode:<16} {elapsed:>8.2f} {runs / elapsed * 60:>9.1f} {saved / runs:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=4, help="code execution workers (0 runs code in-process)")
+    parser.add_argument("--iterations", type=int, default=2, help="Voter iterations per run")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--parallel-candidates", action="store_true",
+                        help="run each run's Voter candidates concurrently")
+    parser.add_argument("--no-early-stop", action="store_true",
+                        help="always collect every Voter candidate")
+    args = parser.parse_args()
+    # main.py logs every agent message at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+    run(args.runs, args.concurrency, args.embedding_latency, args.llm_latency,
+        args.workers, args.iterations, args.dim, args.parallel_candidates, not args.no_early_stop)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# benchmarks/bench_vector_store_insert.py
+"""
+Measures per-insert latency of VectorStore.add_vector as the store grows.
+
+Usage:
+    python -m benchmarks.bench_vector_store_insert [--dim 128] [--max-size 1000000]
+"""
+import argparse
+import time
+import numpy as np
+from core.vector_store import VectorStore
+
+def run(dim: int, max_size: int, window: int = 1000) -> None:
+    rng = np.random.default_rng(0)
+    store = VectorStore()
+    checkpoints = []
+    size = 1000
+    while size <= max_size:
+        checkpoints.append(size)
+        size *= 10
+
+    print(f"{'size':>10} {'us/insert':>12}")
+    batch = rng.normal(size=(window, dim)).astype(np.float32)
+    for checkpoint in checkpoints:
+        # Fill up to just below the checkpoint, then time a window of inserts
+        fill = checkpoint - window - len(store)
+        if fill > 0:
+            store.add_vectors(rng.normal(size=(fill, dim)).astype(np.float32))
+
+        start = time.perf_counter()
+        for vector in batch:
+            store.add_vector(vector)
+        elapsed = time.perf_counter() - start
+        print(f"{len(store):>10} {elapsed / window * 1e6:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--max-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.dim, args.max_size)
+
+if __name__ == "__main__":
+    main()
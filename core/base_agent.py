@@ -1,28 +1,40 @@
 # core/base_agent.py
 import abc
-from typing import List, Optional
+from typing import Any, List, Optional, Union
 from core.message import Message
+from core.run_context import DEFAULT_MAX_MESSAGES, RunContext
 from core.task import Task
 
 class BaseAgent(abc.ABC):
-    def __init__(self, agent_id: str):
+    """
+    Agents process messages without keeping per-run state; anything a run
+    needs between messages lives in the message's RunContext
+    """
+    def __init__(self, agent_id: str, max_messages: int = DEFAULT_MAX_MESSAGES):
         self.agent_id = agent_id
+        # Messages received outside of a run, most recent max_messages only
         self.messages: List[Message] = []
+        self.max_messages = max_messages
         
     @abc.abstractmethod
-    def process(self, message: Message) -> Optional[Message]:
-        """Process incoming message and generate response"""
+    def process(self, message: Message) -> Union[Message, List[Message], None]:
+        """Process incoming message and generate response (or several, or none)"""
         pass
     
     def receive_message(self, message: Message):
-        """Receive and store message"""
+        """Receive and store message in its run's log"""
+        if message.context is not None:
+            message.context.record(message)
+            return
         self.messages.append(message)
+        del self.messages[:-self.max_messages]
         
-    def send_message(self, content: str, recipient_id: str) -> Message:
-        """Create and send a new message"""
+    def send_message(self, content: Any, recipient_id: str, context: Optional[RunContext] = None) -> Message:
+        """Create and send a new message, within the run `context`"""
         message = Message(
             sender_id=self.agent_id,
             recipient_id=recipient_id,
-            content=content
+            content=content,
+            context=context
         )
         return message
\ No newline at end of file
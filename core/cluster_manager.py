@@ -1,10 +1,12 @@
 # core/cluster_manager.py
-from typing import List, Dict
+from typing import Any, List, Dict, Optional
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
 import openai
 from .experience import Experience
 from .cluster_template import ClusterTemplate
+from .retry import LoopSemaphore, retry_async
 
 class ClusterManager:
     """
@@ -13,20 +15,166 @@ class ClusterManager:
     def __init__(self, 
                  openai_api_key: str,
                  n_clusters: int = 10,
-                 min_cluster_size: int = 3):
+                 min_cluster_size: int = 3,
+                 batch_size: int = 256,
+                 random_state: Optional[int] = None,
+                 max_examples: int = 8,
+                 prompt_char_budget: int = 8000,
+                 auto_k: bool = False,
+                 max_clusters: int = 20,
+                 selection_sample_size: int = 2000):
         self.n_clusters = n_clusters
         self.min_cluster_size = min_cluster_size
+        self.max_examples = max_examples
+        self.prompt_char_budget = prompt_char_budget
+        self.auto_k = auto_k
+        self.max_clusters = max_clusters
+        self.selection_sample_size = selection_sample_size
+        self.selected_k: Optional[int] = None
+        self._centroids: Optional[np.ndarray] = None
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.template_model = "gpt-3.5-turbo"
         self.kmeans = KMeans(n_clusters=n_clusters)
+        self.online_kmeans: Optional[MiniBatchKMeans] = None
         openai.api_key = openai_api_key
 
+    @property
+    def centroids(self) -> Optional[np.ndarray]:
+        """Centroids from the last KMeans fit, or None if not fitted yet"""
+        if self.online_kmeans is not None:
+            return self.online_kmeans.cluster_centers_
+        if self._centroids is not None:
+            return self._centroids
+        return getattr(self.kmeans, 'cluster_centers_', None)
+
+    @property
+    def is_fitted(self) -> bool:
+        """Whether incremental clustering has initialized its centroids"""
+        return self.online_kmeans is not None
+
     def cluster(self, embeddings: np.ndarray) -> np.ndarray:
         """Perform clustering on embeddings"""
+        if self.auto_k:
+            return self._cluster_adaptive(embeddings)
+
         if len(embeddings) < self.n_clusters:
             # Return single cluster if not enough samples
             return np.zeros(len(embeddings), dtype=int)
             
+        self._centroids = None
         return self.kmeans.fit_predict(embeddings)
 
+    def partial_cluster(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Assign new embeddings to clusters, updating the centroids with only
+        these embeddings (mini-batch k-means)
+
+        Until n_clusters embeddings have been seen in one call, returns a
+        single cluster without fitting, so the caller should pass the same
+        rows again next time. With auto_k, the first fitted batch is
+        clustered as in cluster(), merging clusters below min_cluster_size,
+        and seeds the centroids; later batches are assigned to the merged
+        clusters only.
+        """
+        if len(embeddings) == 0:
+            return np.zeros(0, dtype=int)
+
+        if self.online_kmeans is None:
+            if len(embeddings) < self.n_clusters:
+                return np.zeros(len(embeddings), dtype=int)
+            if self.auto_k:
+                self._cluster_adaptive(embeddings)
+                self.online_kmeans = MiniBatchKMeans(
+                    n_clusters=len(self._centroids),
+                    init=self._centroids,
+                    batch_size=self.batch_size,
+                    n_init=1,
+                    random_state=self.random_state
+                )
+            else:
+                self.online_kmeans = MiniBatchKMeans(
+                    n_clusters=self.n_clusters,
+                    batch_size=self.batch_size,
+                    n_init=3,
+                    random_state=self.random_state
+                )
+
+        self.online_kmeans.partial_fit(embeddings)
+        return self.online_kmeans.predict(embeddings)
+
+    def select_n_clusters(self, embeddings: np.ndarray) -> int:
+        """
+        Choose the number of clusters by silhouette score
+
+        Candidate values of k are fitted and scored on a fixed-size uniform
+        sample of the embeddings, so the cost does not grow with the pool.
+        """
+        rng = np.random.default_rng(self.random_state)
+        if len(embeddings) > self.selection_sample_size:
+            sample = embeddings[np.sort(rng.choice(len(embeddings), self.selection_sample_size, replace=False))]
+        else:
+            sample = embeddings
+
+        # Every cluster should be able to reach min_cluster_size
+        max_k = min(self.max_clusters, len(sample) - 1,
+                    len(embeddings) // max(1, self.min_cluster_size))
+        best_k, best_score = 1, -1.0
+        for k in range(2, max_k + 1):
+            labels = KMeans(n_clusters=k, n_init=1, random_state=self.random_state).fit_predict(sample)
+            if len(np.unique(labels)) < 2:
+                continue
+            score = silhouette_score(sample, labels)
+            if score > best_score:
+                best_k, best_score = k, score
+
+        self.selected_k = best_k
+        return best_k
+
+    def _cluster_adaptive(self, embeddings: np.ndarray) -> np.ndarray:
+        """Cluster with a data-driven k, then merge clusters below min_cluster_size"""
+        n_clusters = self.select_n_clusters(embeddings)
+        if n_clusters < 2:
+            self._centroids = embeddings.mean(axis=0, keepdims=True)
+            return np.zeros(len(embeddings), dtype=int)
+
+        self.kmeans = KMeans(n_clusters=n_clusters, random_state=self.random_state)
+        labels = self.kmeans.fit_predict(embeddings)
+        return self._merge_small_clusters(embeddings, labels, self.kmeans.cluster_centers_)
+
+    def _merge_small_clusters(self,
+                              embeddings: np.ndarray,
+                              labels: np.ndarray,
+                              centroids: np.ndarray) -> np.ndarray:
+        """Move members of undersized clusters to the nearest large cluster"""
+        sizes = np.bincount(labels, minlength=len(centroids))
+        large = np.flatnonzero(sizes >= self.min_cluster_size)
+        if len(large) == 0:
+            large = np.array([int(np.argmax(sizes))])
+
+        small_members = ~np.isin(labels, large)
+        if small_members.any():
+            distances = np.linalg.norm(
+                embeddings[small_members][:, None, :] - centroids[large][None, :, :], axis=2
+            )
+            labels = labels.copy()
+            labels[small_members] = large[np.argmin(distances, axis=1)]
+
+        # Relabel the surviving clusters 0..n-1 and recompute their centroids
+        remap = np.full(len(centroids), -1)
+        remap[large] = np.arange(len(large))
+        labels = remap[labels]
+        self._centroids = np.stack([embeddings[labels == i].mean(axis=0) for i in range(len(large))])
+        return labels
+
+    def get_state(self) -> Dict[str, Any]:
+        """Incremental clustering state to persist between runs"""
+        return {"online_kmeans": self.online_kmeans}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restore state saved by get_state"""
+        self.online_kmeans = state.get("online_kmeans")
+
     def generate_template(self, experiences: List[Experience]) -> ClusterTemplate:
         """Generate template from cluster experiences"""
         if not experiences:
@@ -38,40 +186,130 @@ class ClusterManager:
         try:
             # Generate template using GPT
             response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an AI that generates generalized function templates from specific examples."},
-                    {"role": "user", "content": prompt}
-                ]
+                model=self.template_model,
+                messages=self._template_messages(prompt)
             )
+            return self._parse_template(response.choices[0].message.content, experiences)
 
-            template_text = response.choices[0].message.content
-            
-            # Parse template
-            template_parts = template_text.split("###")
-            if len(template_parts) >= 2:
-                question_template = template_parts[0].strip()
-                function_template = template_parts[1].strip()
-            else:
-                question_template = "Generic Question"
-                function_template = template_text.strip()
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate template: {str(e)}")
+
+    def _template_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for a template generation request"""
+        return [
+            {"role": "system", "content": "You are an AI that generates generalized function templates from specific examples."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _parse_template(self, template_text: str, experiences: List[Experience]) -> ClusterTemplate:
+        """Parse an LLM response of the form QUESTION_TEMPLATE ### FUNCTION_TEMPLATE"""
+        template_parts = template_text.split("###")
+        if len(template_parts) >= 2:
+            question_template = template_parts[0].strip()
+            function_template = template_parts[1].strip()
+        else:
+            question_template = "Generic Question"
+            function_template = template_text.strip()
+
+        return ClusterTemplate(
+            question_template=question_template,
+            function_template=function_template,
+            examples=experiences
+        )
+
+    def select_exemplars(self, experiences: List[Experience]) -> List[Experience]:
+        """
+        Pick a bounded, diverse set of examples to show the LLM
+
+        Starts from the medoid (the member nearest the cluster mean) and adds
+        farthest-point samples in embedding space, up to max_examples. Members
+        without embeddings are only used to fill remaining slots.
+        """
+        embedded = [exp for exp in experiences if exp.embedding is not None]
+        if len(embedded) <= 1:
+            return experiences[:self.max_examples]
 
-            return ClusterTemplate(
-                question_template=question_template,
-                function_template=function_template,
-                examples=experiences
+        embeddings = np.stack([exp.get_embedding_array() for exp in embedded])
+        mean = embeddings.mean(axis=0)
+        selected = [int(np.argmin(np.linalg.norm(embeddings - mean, axis=1)))]
+        min_distances = np.linalg.norm(embeddings - embeddings[selected[0]], axis=1)
+        while len(selected) < min(self.max_examples, len(embedded)):
+            candidate = int(np.argmax(min_distances))
+            if min_distances[candidate] <= 0:
+                break
+            selected.append(candidate)
+            min_distances = np.minimum(
+                min_distances,
+                np.linalg.norm(embeddings - embeddings[candidate], axis=1)
             )
 
-        except Exception as e:
-            raise RuntimeError(f"Failed to generate template: {str(e)}")
+        exemplars = [embedded[i] for i in selected]
+        remaining = self.max_examples - len(exemplars)
+        if remaining > 0:
+            exemplars += [exp for exp in experiences if exp.embedding is None][:remaining]
+        return exemplars
 
     def _format_template_prompt(self, experiences: List[Experience]) -> str:
         """Format experiences into prompt for template generation"""
         prompt = "Generate a generalized template for these question-function pairs.\n"
         prompt += "The response should have format: QUESTION_TEMPLATE ### FUNCTION_TEMPLATE\n\n"
         
-        for i, exp in enumerate(experiences, 1):
-            prompt += f"Example {i}:\nQuestion: {exp.question}\nFunction:\n{exp.function}\n\n"
+        # Keep the prompt within a fixed character budget however big the cluster is
+        budget = self.prompt_char_budget
+        for i, exp in enumerate(self.select_exemplars(experiences), 1):
+            example = f"Example {i}:\nQuestion: {exp.question}\nFunction:\n{exp.function}\n\n"
+            if len(example) > budget:
+                if i > 1:
+                    break
+                example = example[:budget] + "\n...\n\n"
+            prompt += example
+            budget -= len(example)
             
         prompt += "Generate a template that captures the common pattern in these examples."
-        return prompt
\ No newline at end of file
+        return prompt
+
+class AsyncTemplateGenerator:
+    """
+    Non-blocking template generation for a ClusterManager
+
+    Shares the manager's prompt formatting and response parsing, runs at
+    most `max_concurrency` requests at once, and retries rate-limit errors
+    with jittered exponential backoff.
+    """
+    def __init__(self,
+                 cluster_manager: ClusterManager,
+                 max_concurrency: int = 4,
+                 max_retries: int = 5,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0):
+        self.cluster_manager = cluster_manager
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = LoopSemaphore(max_concurrency)
+
+    async def generate_template(self, experiences: List[Experience]) -> ClusterTemplate:
+        """Generate template from cluster experiences"""
+        if not experiences:
+            raise ValueError("No experiences provided for template generation")
+
+        manager = self.cluster_manager
+        messages = manager._template_messages(manager._format_template_prompt(experiences))
+
+        async def request():
+            async with self._semaphore.get():
+                return await openai.ChatCompletion.acreate(
+                    model=manager.template_model,
+                    messages=messages
+                )
+
+        try:
+            response = await retry_async(
+                request,
+                max_retries=self.max_retries,
+                base_delay=self.base_delay,
+                max_delay=self.max_delay
+            )
+            return manager._parse_template(response.choices[0].message.content, experiences)
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate template: {str(e)}")
@@ -1,8 +1,15 @@
 # core/cluster_template.py
+import hashlib
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, List, Optional
+import numpy as np
 from .experience import Experience
 
+def membership_fingerprint(member_ids: Iterable[int]) -> str:
+    """Order-independent hash of a cluster's member row ids"""
+    ids = np.sort(np.fromiter(member_ids, dtype=np.int64))
+    return hashlib.sha256(ids.tobytes()).hexdigest()
+
 @dataclass
 class ClusterTemplate:
     """
@@ -11,13 +18,15 @@ class ClusterTemplate:
     question_template: str
     function_template: str
     examples: List[Experience]
+    fingerprint: Optional[str] = None
 
     def to_dict(self):
         """Convert template to dictionary format"""
         return {
             "question_template": self.question_template,
             "function_template": self.function_template,
-            "examples": [exp.to_dict() for exp in self.examples]
+            "examples": [exp.to_dict() for exp in self.examples],
+            "fingerprint": self.fingerprint
         }
 
     @classmethod
@@ -26,5 +35,6 @@ class ClusterTemplate:
         return cls(
             question_template=data["question_template"],
             function_template=data["function_template"],
-            examples=[Experience.from_dict(exp) for exp in data["examples"]]
-        )
\ No newline at end of file
+            examples=[Experience.from_dict(exp) for exp in data["examples"]],
+            fingerprint=data.get("fingerprint")
+        )
@@ -0,0 +1,527 @@
+# core/code_executor.py
+import ast
+import copy
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import reprlib
+import sys
+import threading
+import time
+import traceback
+import types
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    import cloudpickle
+except ImportError:  # pragma: no cover - optional dependency
+    cloudpickle = None
+
+logger = logging.getLogger(__name__)
+
+# Libraries the generated analysis code imports on almost every block
+DEFAULT_PRELOAD = ("numpy", "pandas", "matplotlib.pyplot", "seaborn")
+
+# Upper bound on the length of a result's "output" repr
+MAX_OUTPUT_CHARS = 2000
+
+# Sent by a worker once its preload imports are done
+_READY = "ready"
+
+_output_repr = reprlib.Repr()
+_output_repr.maxdict = 50
+_output_repr.maxlist = _output_repr.maxtuple = _output_repr.maxset = 20
+_output_repr.maxstring = 200
+_output_repr.maxother = 200
+_output_repr.maxlevel = 3
+
+def bounded_repr(value: Any, limit: int = MAX_OUTPUT_CHARS) -> str:
+    """repr() with containers, strings and long object reprs truncated"""
+    text = _output_repr.repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def value_size(value: Any) -> int:
+    """Approximate bytes held by a value (array/frame buffers, else getsizeof)"""
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(index=True)
+            return int(usage.sum() if hasattr(usage, "sum") else usage)
+        except Exception:
+            pass
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return sys.getsizeof(value)
+    except Exception:
+        return 0
+
+def _reset_peak_rss() -> None:
+    """Reset the process's RSS high-water mark (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, if known"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def execute_code(code: str,
+                 inputs: Optional[Dict[str, Any]] = None,
+                 max_output: int = MAX_OUTPUT_CHARS,
+                 export: bool = True,
+                 measure_rss: bool = False) -> Dict[str, Any]:
+    """
+    Execute a code block in a fresh namespace
+
+    `inputs` are visible to the block as globals (upstream exports). Returns
+    the result dict stored by Task.update_execution_result: status plus
+    variables/output on success, error/traceback on failure. "output" is a
+    repr of the namespace bounded by `max_output` characters. Unless
+    `export` is False, successful results also carry "exports", the names
+    the block defined (modules excluded), for its dependents. Every result
+    has "metrics": wall_time and cpu_time (of the calling thread) in
+    seconds, peak_rss and output_bytes in bytes. peak_rss resets the
+    process's high-water mark, so it is only measured (`measure_rss`) in
+    worker processes that run one block at a time; otherwise it is None.
+    """
+    if measure_rss:
+        _reset_peak_rss()
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        # Create isolated environment
+        local_vars = {}
+        exec(code, dict(inputs or {}), local_vars)
+        wall_time, cpu_time = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+
+        exports = {
+            name: value for name, value in local_vars.items()
+            if not isinstance(value, types.ModuleType)
+        }
+        # Basic verification
+        result = {
+            "status": "success",
+            "variables": list(local_vars.keys()),
+            "output": bounded_repr(local_vars, max_output),
+            "exports": exports,
+            "metrics": {
+                "wall_time": wall_time,
+                "cpu_time": cpu_time,
+                "peak_rss": peak_rss() if measure_rss else None,
+                "output_bytes": sum(value_size(value) for value in exports.values())
+            }
+        }
+        if not export:
+            del result["exports"]
+    except Exception as e:
+        wall_time, cpu_time = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+        result = {
+            "status": "failed",
+            "error": str(e),
+            "traceback": traceback.format_exc(),
+            "metrics": {
+                "wall_time": wall_time,
+                "cpu_time": cpu_time,
+                "peak_rss": peak_rss() if measure_rss else None,
+                "output_bytes": 0
+            }
+        }
+    return result
+
+def copy_exports(exports: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deep copy of in-process exports, so a block cannot change the values
+    its upstream blocks (and the execution cache) hold; values that cannot
+    be copied are shared
+    """
+    try:
+        return copy.deepcopy(exports)
+    except Exception:
+        copied = {}
+        for name, value in exports.items():
+            try:
+                copied[name] = copy.deepcopy(value)
+            except Exception:
+                copied[name] = value
+        return copied
+
+def merge_inputs(exports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine upstream exports; later entries win on name clashes"""
+    inputs = {}
+    for values in exports:
+        inputs.update(values)
+    return inputs
+
+def dump_exports(exports: Dict[str, Any]) -> bytes:
+    """
+    Serialize exports for another process
+
+    cloudpickle (if installed) also carries functions and classes defined
+    by the block; values that cannot be serialized are dropped.
+    """
+    dumps = cloudpickle.dumps if cloudpickle is not None else pickle.dumps
+    try:
+        return dumps(exports)
+    except Exception:
+        picklable = {}
+        for name, value in exports.items():
+            try:
+                dumps(value)
+            except Exception:
+                continue
+            picklable[name] = value
+        return dumps(picklable)
+
+def failure(error: str, wall_time: float = 0.0) -> Dict[str, Any]:
+    """Result for a block that did not run to completion in its worker"""
+    return {
+        "status": "failed",
+        "error": error,
+        "traceback": "",
+        "metrics": {"wall_time": wall_time, "cpu_time": None, "peak_rss": None, "output_bytes": 0}
+    }
+
+class InProcessExecutor:
+    """Runs code blocks one at a time in the calling process"""
+    def submit(self,
+               code: str,
+               inputs: Optional[List[Any]] = None,
+               context: Optional[Dict[str, Any]] = None,
+               export: bool = True) -> Future:
+        """
+        Run a block with copies of the exports of its upstream blocks and
+        any extra `context` globals; returns a completed future
+        """
+        future: Future = Future()
+        inputs = [copy_exports(values) for values in inputs or []]
+        future.set_result(execute_code(code, merge_inputs([context or {}] + inputs), export=export))
+        return future
+
+    def run(self,
+            code: str,
+            inputs: Optional[List[Any]] = None,
+            context: Optional[Dict[str, Any]] = None,
+            export: bool = True) -> Dict[str, Any]:
+        return self.submit(code, inputs, context, export).result()
+
+    def run_many(self, blocks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """Execute several named code blocks and return their results by name"""
+        return {block_id: execute_code(code) for block_id, code in blocks.items()}
+
+    def close(self) -> None:
+        pass
+
+def imported_modules(code: str) -> Set[str]:
+    """Absolute module names imported anywhere in a code block"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+    return names
+
+def preload_modules(modules: Sequence[str]) -> Dict[str, float]:
+    """
+    Import modules ahead of time and return the seconds each import took
+
+    Each module is timed after the ones before it, so shared dependencies
+    are only counted once. Modules that fail to import are skipped.
+    """
+    # Generated code plots; never open a GUI window from a worker
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+def import_time_saved(code: str, timings: Dict[str, float]) -> float:
+    """Seconds of preloaded imports a block would otherwise have paid for"""
+    imported = imported_modules(code)
+    return sum(
+        seconds for name, seconds in timings.items()
+        if any(module == name or module.startswith(name + ".") for module in imported)
+    )
+
+def reset_session() -> None:
+    """Clear process-wide state generated code commonly leaves behind"""
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is not None:
+        pyplot.close("all")
+
+def _worker_main(conn, memory_limit: Optional[int], preload: Sequence[str] = ()) -> None:
+    """Worker process loop: receive code, send back its result"""
+    timings = preload_modules(preload)
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    conn.send(_READY)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        code, inputs, context, export = job
+        result = execute_code(
+            code, merge_inputs([context] + [pickle.loads(blob) for blob in inputs]),
+            export=export, measure_rss=True
+        )
+        reset_session()
+        if "exports" in result:
+            # Exports stay serialized until a dependent worker needs them
+            result["exports"] = dump_exports(result["exports"])
+        result["import_time_saved"] = import_time_saved(code, timings)
+        conn.send(result)
+
+class _Worker:
+    """One worker process and the pipe used to talk to it"""
+    def __init__(self, context, memory_limit: Optional[int], preload: Sequence[str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit, tuple(preload)), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.executions = 0
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """Ask the worker to exit, killing it if it does not"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """
+    Pool of pre-started worker processes that execute code blocks in parallel
+
+    Each block runs in a separate process with a wall-clock `timeout`;
+    a worker that exceeds it is killed and replaced. `memory_limit_mb`
+    caps each worker's address space via resource.setrlimit, and workers
+    are recycled after `max_tasks_per_worker` executions so state leaked
+    by generated code does not accumulate.
+
+    Workers are warm sessions: they import the `preload` modules once at
+    start-up and serve many blocks, each in a fresh namespace. A worker
+    gets no block until its imports are done, so start-up (bounded by
+    `start_timeout`) never counts against a block's `timeout`. Results
+    report the preloaded import time each block skipped
+    ("import_time_saved", in seconds).
+    """
+    def __init__(self,
+                 n_workers: int = 4,
+                 timeout: float = 30.0,
+                 memory_limit_mb: Optional[int] = None,
+                 max_tasks_per_worker: int = 100,
+                 preload: Sequence[str] = (),
+                 start_method: Optional[str] = None,
+                 start_timeout: float = 60.0):
+        self.n_workers = max(1, n_workers)
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.preload = tuple(preload)
+        if start_method is None:
+            # Forking a process that runs threads is unsafe; prefer a fork server
+            methods = multiprocessing.get_all_start_methods()
+            start_method = "forkserver" if "forkserver" in methods else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        self.stats: Dict[str, float] = {
+            "executed": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "import_time_saved": 0.0
+        }
+        self._stats_lock = threading.Lock()
+        self._jobs: "queue.Queue[Optional[Tuple[Tuple[str, List[bytes], Dict[str, Any], bool], Future]]]" = queue.Queue()
+        self._closed = False
+        self._threads = []
+        # Start every worker before waiting, so their imports overlap
+        workers = [self._spawn(wait=False) for _ in range(self.n_workers)]
+        for i, worker in enumerate(workers):
+            try:
+                self._wait_ready(worker)
+            except RuntimeError as e:
+                # Started again when the worker's first job arrives
+                logger.warning(f"Could not start a code worker: {str(e)}")
+                worker = None
+            thread = threading.Thread(
+                target=self._dispatch, args=(worker,), name=f"code-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self,
+               code: str,
+               inputs: Optional[List[bytes]] = None,
+               context: Optional[Dict[str, Any]] = None,
+               export: bool = True) -> Future:
+        """
+        Queue a code block and return a future for its result dict
+
+        `inputs` are the (serialized) exports of the block's upstream blocks;
+        `context` holds extra picklable globals such as a dataset loader.
+        Pass export=False for a block nothing depends on, so its values are
+        not serialized and sent back.
+        """
+        if self._closed:
+            raise RuntimeError("WorkerPool is closed")
+        future: Future = Future()
+        self._jobs.put(((code, list(inputs or []), dict(context or {}), export), future))
+        return future
+
+    def run(self,
+            code: str,
+            inputs: Optional[List[bytes]] = None,
+            context: Optional[Dict[str, Any]] = None,
+            export: bool = True) -> Dict[str, Any]:
+        return self.submit(code, inputs, context, export).result()
+
+    def run_many(self, blocks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """Execute several named code blocks in parallel and return their results by name"""
+        futures = {block_id: self.submit(code) for block_id, code in blocks.items()}
+        return {block_id: future.result() for block_id, future in futures.items()}
+
+    def close(self) -> None:
+        """Let queued blocks finish, then stop every worker"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> 'WorkerPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _spawn(self, wait: bool = True) -> _Worker:
+        worker = _Worker(self._context, self.memory_limit, self.preload)
+        if wait:
+            self._wait_ready(worker)
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        """Wait until a new worker has imported its preload modules"""
+        try:
+            ready = worker.conn.poll(self.start_timeout) and worker.conn.recv() == _READY
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            worker.kill()
+            raise RuntimeError(f"Code worker did not start within {self.start_timeout}s")
+
+    def _dispatch(self, worker: Optional[_Worker]) -> None:
+        """Feed queued blocks to one worker, replacing it when it dies or hangs"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                if worker is not None:
+                    worker.stop()
+                return
+
+            work, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            # Every job's future is resolved, whatever goes wrong, so callers
+            # waiting on it never hang
+            try:
+                if worker is None:
+                    worker = self._spawn()
+                result, healthy = self._execute(worker, work)
+            except Exception as e:
+                logger.warning(f"Code worker failed: {str(e)}")
+                result, healthy = failure(f"Code worker failed: {str(e)}"), False
+            self._count("executed")
+            self._count("import_time_saved", result.get("import_time_saved", 0.0))
+            future.set_result(result)
+
+            if worker is None:
+                continue
+            worker.executions += 1
+            try:
+                if not healthy:
+                    worker.kill()
+                    worker = None
+                    worker = self._spawn()
+                elif worker.executions >= self.max_tasks_per_worker:
+                    self._count("recycled")
+                    worker.stop()
+                    worker = None
+                    worker = self._spawn()
+            except Exception as e:
+                # Retried when the next job arrives
+                logger.warning(f"Could not start a code worker: {str(e)}")
+
+    def _execute(self, worker: _Worker, job: Tuple[str, List[bytes], Dict[str, Any], bool]) -> Tuple[Dict[str, Any], bool]:
+        """Run one block on a worker; returns (result, whether the worker is reusable)"""
+        start = time.perf_counter()
+        try:
+            worker.conn.send(job)
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError):
+            return self._crashed(worker, start), False
+        except Exception as e:
+            # The job is pickled before anything is written, so the worker
+            # never saw it and can be reused
+            return failure(f"Could not send code block to worker: {str(e)}", time.perf_counter() - start), True
+        try:
+            if not worker.conn.poll(self.timeout):
+                self._count("timeouts")
+                return failure(f"Execution timed out after {self.timeout}s", self.timeout), False
+            return worker.conn.recv(), True
+        except (EOFError, BrokenPipeError, ConnectionResetError, OSError):
+            return self._crashed(worker, start), False
+
+    def _crashed(self, worker: _Worker, start: float) -> Dict[str, Any]:
+        worker.process.join(1.0)
+        self._count("crashes")
+        logger.warning(f"Code worker exited unexpectedly (exit code {worker.process.exitcode})")
+        error = f"Worker exited unexpectedly (exit code {worker.process.exitcode})"
+        return failure(error, time.perf_counter() - start)
@@ -0,0 +1,276 @@
+# core/dataset_registry.py
+import hashlib
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Column offsets are aligned so every column view is suitably aligned
+ALIGNMENT = 64
+
+@dataclass
+class ColumnSpec:
+    """Location of one column inside a dataset's shared memory block"""
+    name: str
+    dtype: str
+    offset: int
+    # Non-numeric columns are stored as categorical codes; their pickled
+    # categories follow the codes in the same block
+    categories_offset: Optional[int] = None
+    categories_length: int = 0
+
+@dataclass
+class DatasetHandle:
+    """
+    Picklable description of a published dataset
+
+    Small enough to send with every code block; workers use it to attach
+    to the shared memory block.
+    """
+    name: str
+    path: str
+    version: str
+    shm_name: str
+    n_rows: int
+    columns: List[ColumnSpec] = field(default_factory=list)
+
+# Frames attached in this process, keyed by shared memory block name
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, pd.DataFrame]] = {}
+# Block last attached for each dataset name; workers never see the
+# registry release a block, so a newer block for the name replaces it
+_attached_names: Dict[str, str] = {}
+_attach_lock = threading.Lock()
+
+def _data_pointer(series: pd.Series) -> int:
+    """Address of the array backing a column (the codes, for categoricals)"""
+    values = series.array
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    return np.asarray(values).__array_interface__["data"][0]
+
+class SharedDataFrame(pd.DataFrame):
+    """
+    DataFrame attached to a published dataset
+
+    While its columns still point into the shared memory block it pickles
+    as a reference to the dataset, so passing it to a dependent block does
+    not serialize the data. Derived frames are plain DataFrames.
+    """
+    _metadata = ["dataset_handle"]
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def __reduce_ex__(self, protocol):
+        if self._is_unmodified():
+            return attach_dataset, (self.dataset_handle,)
+        # Modified: pickle the data as a plain DataFrame
+        return pd.DataFrame, (pd.DataFrame(self),)
+
+    def _is_unmodified(self) -> bool:
+        handle = getattr(self, "dataset_handle", None)
+        entry = _attached.get(handle.shm_name) if handle is not None else None
+        if entry is None:
+            return False
+        original = entry[1]
+        if not (self.columns.equals(original.columns) and self.index.equals(original.index)):
+            return False
+        return all(
+            self[name].dtype == original[name].dtype
+            and _data_pointer(self[name]) == _data_pointer(original[name])
+            for name in original.columns
+        )
+
+def attach_dataset(handle: DatasetHandle) -> SharedDataFrame:
+    """
+    DataFrame whose columns are read-only views of the shared memory block
+
+    The block is mapped once per process; later calls return a new frame
+    over the same memory, so columns added by one code block are not seen
+    by the next.
+    """
+    with _attach_lock:
+        previous = _attached_names.get(handle.name)
+        if previous is not None and previous != handle.shm_name:
+            _close(_attached.pop(previous, None))
+        _attached_names[handle.name] = handle.shm_name
+        if handle.shm_name not in _attached:
+            shm = shared_memory.SharedMemory(name=handle.shm_name)
+            columns = {}
+            for spec in handle.columns:
+                values = np.ndarray(
+                    handle.n_rows, dtype=np.dtype(spec.dtype), buffer=shm.buf, offset=spec.offset
+                )
+                values.flags.writeable = False
+                if spec.categories_offset is not None:
+                    end = spec.categories_offset + spec.categories_length
+                    categories = pickle.loads(shm.buf[spec.categories_offset:end])
+                    values = pd.Categorical.from_codes(values, categories=categories)
+                columns[spec.name] = values
+            _attached[handle.shm_name] = (shm, pd.DataFrame(columns, copy=False))
+        frame = SharedDataFrame(_attached[handle.shm_name][1], copy=False)
+    frame.dataset_handle = handle
+    return frame
+
+def detach_dataset(shm_name: str) -> None:
+    """Drop this process's mapping of a block"""
+    with _attach_lock:
+        entry = _attached.pop(shm_name, None)
+        for name, attached in list(_attached_names.items()):
+            if attached == shm_name:
+                del _attached_names[name]
+    _close(entry)
+
+def _close(entry: Optional[Tuple[shared_memory.SharedMemory, pd.DataFrame]]) -> None:
+    if entry is not None:
+        try:
+            entry[0].close()
+        except BufferError:
+            # Frames handed out earlier still reference the mapping
+            pass
+
+class DatasetLoader:
+    """
+    load_dataset(name_or_path) as seen by generated code
+
+    Picklable, so it can be sent to worker processes along with the
+    handles of the datasets registered so far.
+    """
+    def __init__(self, handles: Dict[str, DatasetHandle]):
+        self.handles = handles
+
+    def __call__(self, name: str) -> pd.DataFrame:
+        handle = self.handles.get(name)
+        if handle is None:
+            path = os.path.abspath(name)
+            handle = next((h for h in self.handles.values() if h.path == path), None)
+        if handle is None:
+            raise KeyError(f"Dataset {name!r} is not registered")
+        return attach_dataset(handle)
+
+class DatasetRegistry:
+    """
+    Loads each input file once and publishes its columns in shared memory
+
+    Numeric, boolean and datetime columns are copied into a single
+    multiprocessing.shared_memory block as-is; other columns are stored as
+    categorical codes. Workers attach to the block read-only through
+    DatasetLoader without copying or re-parsing the file. A file is
+    re-read only when its size or modification time changes.
+    """
+    def __init__(self):
+        self._datasets: Dict[str, Tuple[DatasetHandle, shared_memory.SharedMemory]] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"loads": 0, "reuses": 0}
+
+    def __len__(self) -> int:
+        return len(self._datasets)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._datasets
+
+    def register(self, path: str, name: Optional[str] = None, **read_csv_kwargs) -> DatasetHandle:
+        """Publish a CSV file under `name` (default: the file name) and return its handle"""
+        path = os.path.abspath(path)
+        name = name or os.path.basename(path)
+        stat = os.stat(path)
+        version = f"{stat.st_size}:{stat.st_mtime_ns}"
+
+        with self._lock:
+            current = self._datasets.get(name)
+            if current is not None and current[0].path == path and current[0].version == version:
+                self.stats["reuses"] += 1
+                return current[0]
+
+            handle, shm = self._publish(name, path, version, pd.read_csv(path, **read_csv_kwargs))
+            self.stats["loads"] += 1
+            if current is not None:
+                self._release(*current)
+            self._datasets[name] = (handle, shm)
+            return handle
+
+    def handles(self) -> Dict[str, DatasetHandle]:
+        """Handles of every published dataset by name"""
+        return {name: handle for name, (handle, _) in self._datasets.items()}
+
+    def loader(self) -> DatasetLoader:
+        return DatasetLoader(self.handles())
+
+    def load(self, name: str) -> pd.DataFrame:
+        """Attach to a published dataset in this process"""
+        return self.loader()(name)
+
+    def fingerprint(self) -> str:
+        """Hash of the registered datasets and their file versions"""
+        parts = sorted(f"{name}={handle.path}@{handle.version}" for name, handle in self.handles().items())
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            entry = self._datasets.pop(name, None)
+            if entry is not None:
+                self._release(*entry)
+
+    def close(self) -> None:
+        """Unlink every shared memory block"""
+        with self._lock:
+            for entry in self._datasets.values():
+                self._release(*entry)
+            self._datasets.clear()
+
+    def _publish(self,
+                 name: str,
+                 path: str,
+                 version: str,
+                 frame: pd.DataFrame) -> Tuple[DatasetHandle, shared_memory.SharedMemory]:
+        """Copy a frame's columns into a new shared memory block"""
+        arrays = []
+        for column in frame.columns:
+            values = frame[column]
+            if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufcmM":
+                arrays.append((str(column), values.to_numpy(), None))
+            else:
+                categorical = pd.Categorical(values)
+                categories = pickle.dumps(categorical.categories.tolist(), protocol=pickle.HIGHEST_PROTOCOL)
+                arrays.append((str(column), np.asarray(categorical.codes), categories))
+
+        specs = []
+        size = 0
+        for column, values, categories in arrays:
+            offset = size
+            size = _align(offset + values.nbytes)
+            categories_offset = None
+            if categories is not None:
+                categories_offset = size
+                size = _align(size + len(categories))
+            specs.append(ColumnSpec(
+                column, values.dtype.str, offset, categories_offset,
+                0 if categories is None else len(categories)
+            ))
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for spec, (_, values, categories) in zip(specs, arrays):
+            target = np.ndarray(len(values), dtype=values.dtype, buffer=shm.buf, offset=spec.offset)
+            target[:] = values
+            if categories is not None:
+                shm.buf[spec.categories_offset:spec.categories_offset + len(categories)] = categories
+
+        handle = DatasetHandle(name, path, version, shm.name, len(frame), specs)
+        return handle, shm
+
+    @staticmethod
+    def _release(handle: DatasetHandle, shm: shared_memory.SharedMemory) -> None:
+        detach_dataset(handle.shm_name)
+        shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
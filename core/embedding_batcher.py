@@ -0,0 +1,110 @@
+# core/embedding_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from .embedding_generator import EmbeddingGenerator
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent or closely spaced generate() calls into
+    generate_batch() requests
+
+    A background thread waits for the first pending text, then collects
+    more for up to `max_wait` seconds or until `max_batch_size` texts are
+    queued, and sends them in a single request. It exposes the same
+    generate/generate_batch interface as EmbeddingGenerator, so it can be
+    handed to ExperiencePool in its place.
+    """
+    def __init__(self,
+                 generator: EmbeddingGenerator,
+                 max_batch_size: int = 32,
+                 max_wait: float = 0.01):
+        self.generator = generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats: Dict[str, int] = {"requests": 0, "round_trips": 0}
+        self._pending: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        # Makes the closed check and the enqueue in submit() atomic with
+        # close(), so no text is queued behind the stop sentinel
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._closed = False
+        self._worker.start()
+
+    @property
+    def model(self) -> str:
+        return self.generator.model
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for the next batch and return a future for its embedding"""
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._pending.put((text, future))
+        return future
+
+    def generate(self, text: str) -> List[float]:
+        """Generate embedding for input text, sharing a request with concurrent callers"""
+        return self.submit(text).result()
+
+    def generate_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for texts that are already batched"""
+        with self._stats_lock:
+            self.stats["requests"] += len(texts)
+            self.stats["round_trips"] += 1
+        return self.generator.generate_batch(texts)
+
+    def close(self) -> None:
+        """Flush pending texts and stop the worker thread"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending.put(None)
+        self._worker.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: List[Tuple[str, Future]]) -> None:
+        """Send one request for the batch and resolve its futures"""
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = self.generate_batch(texts)
+            if len(embeddings) != len(batch):
+                raise RuntimeError(
+                    f"Embedding backend returned {len(embeddings)} vectors for {len(batch)} texts"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
@@ -0,0 +1,107 @@
+# core/embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+class EmbeddingCache:
+    """
+    Caches embeddings keyed by (model, sha256(text))
+
+    A bounded in-memory LRU tier sits in front of an optional persistent
+    sqlite tier. Entries evicted from memory stay on disk and are promoted
+    back on their next hit. Vectors are stored as float32.
+    """
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "disk_hits": 0}
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, digest))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> Tuple[str, str]:
+        """Cache key for a model and input text"""
+        return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Cached embedding for the text, or None on a miss"""
+        key = self.make_key(model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return vector.tolist()
+
+            vector = self._load(key)
+            if vector is None:
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self._remember(key, vector)
+            return vector.tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]) -> List[float]:
+        """
+        Store an embedding in memory and, if configured, on disk; returns
+        it as stored (float32), the value later hits will return
+        """
+        key = self.make_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                    (key[0], key[1], vector.tobytes())
+                )
+                self._db.commit()
+        return vector.tolist()
+
+    def clear(self) -> None:
+        """Drop the in-memory tier (the disk tier is kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        """Close the disk tier"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _load(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        """Read an embedding from the disk tier"""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND digest = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
@@ -1,30 +1,69 @@
 # core/embedding_generator.py
-from typing import List
+from typing import List, Optional
 import openai
 import numpy as np
+from .embedding_cache import EmbeddingCache
+from .retry import LoopSemaphore, retry_async
 
 class EmbeddingGenerator:
     """
     Generates embeddings using OpenAI's API
     """
-    def __init__(self, api_key: str, model: str = "text-embedding-ada-002"):
+    def __init__(self, 
+                 api_key: str, 
+                 model: str = "text-embedding-ada-002",
+                 cache: Optional[EmbeddingCache] = None):
         self.api_key = api_key
         self.model = model
+        self.cache = cache
         openai.api_key = api_key
 
     def generate(self, text: str) -> List[float]:
         """Generate embedding for input text"""
+        if self.cache is not None:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached
+
         try:
             response = openai.Embedding.create(
                 model=self.model,
                 input=text
             )
-            return response['data'][0]['embedding']
+            embedding = response['data'][0]['embedding']
         except Exception as e:
             raise RuntimeError(f"Failed to generate embedding: {str(e)}")
 
+        if self.cache is not None:
+            # Same float32 values that later cache hits return
+            embedding = self.cache.put(self.model, text, embedding)
+        return embedding
+
     def generate_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
+        if self.cache is None:
+            return self._request_batch(texts)
+
+        embeddings = [self.cache.get(self.model, text) for text in texts]
+
+        # Only request texts that missed the cache, each distinct text once
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if not missing:
+            return embeddings
+
+        fetched = {
+            text: self.cache.put(self.model, text, embedding)
+            for text, embedding in zip(missing, self._request_batch(missing))
+        }
+        return [
+            embedding if embedding is not None else fetched[text]
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+    def _request_batch(self, texts: List[str]) -> List[List[float]]:
+        """Request embeddings for multiple texts from the API"""
         try:
             response = openai.Embedding.create(
                 model=self.model,
@@ -40,4 +79,69 @@ class EmbeddingGenerator:
         v1_array = np.array(v1)
         v2_array = np.array(v2)
         return float(np.dot(v1_array, v2_array) / 
-                    (np.linalg.norm(v1_array) * np.linalg.norm(v2_array)))
\ No newline at end of file
+                    (np.linalg.norm(v1_array) * np.linalg.norm(v2_array)))
+
+class AsyncEmbeddingGenerator:
+    """
+    Non-blocking counterpart of EmbeddingGenerator for use inside an event loop
+
+    At most `max_concurrency` requests are in flight at once, and rate-limit
+    errors are retried with jittered exponential backoff.
+    """
+    def __init__(self,
+                 api_key: str,
+                 model: str = "text-embedding-ada-002",
+                 cache: Optional[EmbeddingCache] = None,
+                 max_concurrency: int = 8,
+                 max_retries: int = 5,
+                 base_delay: float = 0.5,
+                 max_delay: float = 20.0):
+        self.api_key = api_key
+        self.model = model
+        self.cache = cache
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = LoopSemaphore(max_concurrency)
+        openai.api_key = api_key
+
+    async def generate(self, text: str) -> List[float]:
+        """Generate embedding for input text"""
+        return (await self.generate_batch([text]))[0]
+
+    async def generate_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts"""
+        cached = [
+            self.cache.get(self.model, text) if self.cache is not None else None
+            for text in texts
+        ]
+        missing = list(dict.fromkeys(
+            text for text, embedding in zip(texts, cached) if embedding is None
+        ))
+        if not missing:
+            return cached
+
+        fetched = dict(zip(missing, await self._request_batch(missing)))
+        if self.cache is not None:
+            fetched = {text: self.cache.put(self.model, text, embedding) for text, embedding in fetched.items()}
+        return [
+            embedding if embedding is not None else fetched[text]
+            for text, embedding in zip(texts, cached)
+        ]
+
+    async def _request_batch(self, texts: List[str]) -> List[List[float]]:
+        """Request embeddings from the API under the concurrency limit"""
+        async def request():
+            async with self._semaphore.get():
+                return await openai.Embedding.acreate(model=self.model, input=texts)
+
+        try:
+            response = await retry_async(
+                request,
+                max_retries=self.max_retries,
+                base_delay=self.base_delay,
+                max_delay=self.max_delay
+            )
+            return [item['embedding'] for item in response['data']]
+        except Exception as e:
+            raise RuntimeError(f"Failed to generate embeddings: {str(e)}")
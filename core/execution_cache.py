@@ -0,0 +1,114 @@
+# core/execution_cache.py
+import hashlib
+import platform
+import sys
+import threading
+from collections import OrderedDict
+from importlib import metadata
+from typing import Any, Dict, Iterable, Optional, Sequence
+from core.code_executor import value_size
+
+# Packages whose versions can change what generated analysis code does
+DEFAULT_PACKAGES = ("numpy", "pandas", "scipy", "scikit-learn", "matplotlib", "seaborn")
+
+def environment_fingerprint(packages: Iterable[str] = DEFAULT_PACKAGES) -> str:
+    """Hash of the interpreter, platform and installed versions of `packages`"""
+    parts = [sys.version, platform.platform()]
+    for package in packages:
+        try:
+            version = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            version = "missing"
+        parts.append(f"{package}=={version}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+class ExecutionCache:
+    """
+    Caches successful code-block results keyed by sha256(code) and an
+    environment fingerprint
+
+    A block that consumes upstream results is also keyed by the keys of
+    its dependencies, so it re-runs whenever anything upstream changes.
+    Failed results are never stored, so a block is retried until it passes.
+    Entries are kept in an LRU bounded by count and by the approximate
+    size of their exports.
+    """
+    def __init__(self,
+                 max_entries: int = 1024,
+                 environment: Optional[str] = None,
+                 max_bytes: int = 256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.environment = environment if environment is not None else environment_fingerprint()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, code: str, dependencies: Sequence[str] = ()) -> str:
+        """Cache key for a code block in this environment, given its dependencies' keys"""
+        digest = hashlib.sha256()
+        digest.update(self.environment.encode("utf-8"))
+        for dependency in dependencies:
+            digest.update(b"\0")
+            digest.update(dependency.encode("utf-8"))
+        digest.update(b"\0\0")
+        digest.update(code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self,
+            code: str,
+            dependencies: Sequence[str] = (),
+            require_exports: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Cached result for the code, or None on a miss
+
+        With require_exports, a result stored without exports (from a run
+        where nothing depended on the block) is a miss.
+        """
+        key = self.make_key(code, dependencies)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None or (require_exports and "exports" not in result):
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return dict(result)
+
+    def put(self, code: str, result: Dict[str, Any], dependencies: Sequence[str] = ()) -> None:
+        """Store a result if the block succeeded"""
+        if result.get("status") != "success":
+            return
+        size = result_size(result)
+        if size > self.max_bytes:
+            return
+        key = self.make_key(code, dependencies)
+        with self._lock:
+            self.bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = dict(result)
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+def result_size(result: Dict[str, Any]) -> int:
+    """Approximate bytes held by a result's exports (serialized or live)"""
+    exports = result.get("exports")
+    if exports is None:
+        return 0
+    if isinstance(exports, (bytes, bytearray)):
+        return len(exports)
+    return sum(value_size(value) for value in exports.values())
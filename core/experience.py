@@ -1,25 +1,251 @@
 # core/experience.py
-from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 import numpy as np
 
-@dataclass
+class ExperienceTable:
+    """
+    Columnar storage for experiences
+
+    Embeddings are kept in one float32 matrix and cluster ids in an int32
+    array (-1 meaning unassigned), both grown by capacity doubling. Text
+    columns stay as Python lists. Individual rows are exposed as Experience
+    views, so callers never convert embeddings between lists and arrays.
+    """
+    NO_CLUSTER = -1
+
+    def __init__(self, initial_capacity: int = 1024):
+        self.initial_capacity = max(1, initial_capacity)
+        self.questions: List[str] = []
+        self.functions: List[str] = []
+        self.metadata: List[Dict] = []
+        self._embeddings: Optional[np.ndarray] = None
+        self._has_embedding = np.zeros(0, dtype=bool)
+        self._cluster_ids = np.zeros(0, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Embedding dimension, or None until the first embedding is set"""
+        return None if self._embeddings is None else self._embeddings.shape[1]
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """View of the embedding matrix; rows without an embedding are zero"""
+        if self._embeddings is None:
+            return None
+        return self._embeddings[:len(self)]
+
+    @property
+    def has_embedding(self) -> np.ndarray:
+        """Boolean mask of rows that have an embedding"""
+        return self._has_embedding[:len(self)]
+
+    @property
+    def cluster_ids(self) -> np.ndarray:
+        """View of the int32 cluster ids; NO_CLUSTER marks unassigned rows"""
+        return self._cluster_ids[:len(self)]
+
+    def append(self,
+               question: str,
+               function: str,
+               embedding: Optional[List[float]] = None,
+               cluster_id: Optional[int] = None,
+               metadata: Optional[Dict] = None) -> 'Experience':
+        """Append a row and return a view of it"""
+        row = len(self)
+        self._reserve(row + 1)
+        self.questions.append(question)
+        self.functions.append(function)
+        self.metadata.append(metadata if metadata is not None else {})
+        self._has_embedding[row] = False
+        self._cluster_ids[row] = self.NO_CLUSTER if cluster_id is None else cluster_id
+        if embedding is not None:
+            self.set_embedding(row, embedding)
+        return self.row(row)
+
+    def row(self, row: int) -> 'Experience':
+        """View of a single row"""
+        return Experience._view(self, row)
+
+    def rows(self) -> List['Experience']:
+        """Views of every row"""
+        return [self.row(row) for row in range(len(self))]
+
+    def set_embedding(self, row: int, embedding: Optional[List[float]]) -> None:
+        """Store (or clear) the embedding of a row"""
+        if embedding is None:
+            self._has_embedding[row] = False
+            if self._embeddings is not None:
+                self._make_writable()
+                self._embeddings[row] = 0.0
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((len(self._cluster_ids), len(vector)), dtype=np.float32)
+        elif len(vector) != self.dim:
+            raise ValueError(
+                f"Embedding dimension {len(vector)} does not match table dimension {self.dim}"
+            )
+        self._make_writable()
+        self._embeddings[row] = vector
+        self._has_embedding[row] = True
+
+    def get_embedding(self, row: int) -> Optional[np.ndarray]:
+        """Embedding row view, or None if the row has no embedding"""
+        if not self._has_embedding[row]:
+            return None
+        return self._embeddings[row]
+
+    def get_cluster_id(self, row: int) -> Optional[int]:
+        cluster_id = int(self._cluster_ids[row])
+        return None if cluster_id == self.NO_CLUSTER else cluster_id
+
+    def set_cluster_id(self, row: int, cluster_id: Optional[int]) -> None:
+        self._cluster_ids[row] = self.NO_CLUSTER if cluster_id is None else cluster_id
+
+    @classmethod
+    def from_columns(cls,
+                     questions: List[str],
+                     functions: List[str],
+                     metadata: List[Dict],
+                     cluster_ids: np.ndarray,
+                     embeddings: Optional[np.ndarray] = None,
+                     has_embedding: Optional[np.ndarray] = None) -> 'ExperienceTable':
+        """
+        Build a table around existing columns
+
+        The embedding matrix is adopted as is (an np.memmap stays mapped)
+        and only copied the first time the table has to write to it.
+        """
+        table = cls()
+        table.questions = list(questions)
+        table.functions = list(functions)
+        table.metadata = list(metadata)
+        table._cluster_ids = np.asarray(cluster_ids, dtype=np.int32).copy()
+        if embeddings is None or len(embeddings) == 0:
+            table._has_embedding = np.zeros(len(questions), dtype=bool)
+        else:
+            table._embeddings = embeddings
+            table._has_embedding = (np.ones(len(questions), dtype=bool)
+                                    if has_embedding is None
+                                    else np.asarray(has_embedding, dtype=bool).copy())
+        return table
+
+    def _reserve(self, required: int) -> None:
+        """Grow every column buffer to hold at least `required` rows"""
+        capacity = len(self._cluster_ids)
+        if required <= capacity:
+            return
+        capacity = max(self.initial_capacity, capacity)
+        while capacity < required:
+            capacity *= 2
+
+        size = len(self)
+        cluster_ids = np.full(capacity, self.NO_CLUSTER, dtype=np.int32)
+        cluster_ids[:size] = self._cluster_ids[:size]
+        has_embedding = np.zeros(capacity, dtype=bool)
+        has_embedding[:size] = self._has_embedding[:size]
+        self._cluster_ids, self._has_embedding = cluster_ids, has_embedding
+        if self._embeddings is not None:
+            embeddings = np.zeros((capacity, self.dim), dtype=np.float32)
+            embeddings[:size] = self._embeddings[:size]
+            self._embeddings = embeddings
+
+    def _make_writable(self) -> None:
+        """Copy an adopted read-only matrix (e.g. a memmap) before writing"""
+        if not self._embeddings.flags.writeable or len(self._embeddings) < len(self._cluster_ids):
+            embeddings = np.zeros((len(self._cluster_ids), self.dim), dtype=np.float32)
+            size = min(len(self._embeddings), len(embeddings))
+            embeddings[:size] = self._embeddings[:size]
+            self._embeddings = embeddings
+
 class Experience:
     """
     Represents a single experience entry containing question and function pairs
+
+    An Experience is a lightweight view of one ExperienceTable row. Creating
+    one directly gives it a private single-row table.
     """
-    question: str
-    function: str
-    embedding: Optional[List[float]] = None
-    cluster_id: Optional[int] = None
-    metadata: Dict = field(default_factory=dict)
+    __slots__ = ('_table', '_row')
+
+    def __init__(self,
+                 question: str,
+                 function: str,
+                 embedding: Optional[List[float]] = None,
+                 cluster_id: Optional[int] = None,
+                 metadata: Optional[Dict] = None):
+        view = ExperienceTable(initial_capacity=1).append(
+            question, function, embedding, cluster_id, metadata
+        )
+        self._table = view._table
+        self._row = view._row
+
+    @classmethod
+    def _view(cls, table: ExperienceTable, row: int) -> 'Experience':
+        exp = cls.__new__(cls)
+        exp._table = table
+        exp._row = row
+        return exp
+
+    @property
+    def table(self) -> ExperienceTable:
+        return self._table
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    @property
+    def question(self) -> str:
+        return self._table.questions[self._row]
+
+    @question.setter
+    def question(self, value: str) -> None:
+        self._table.questions[self._row] = value
+
+    @property
+    def function(self) -> str:
+        return self._table.functions[self._row]
+
+    @function.setter
+    def function(self, value: str) -> None:
+        self._table.functions[self._row] = value
+
+    @property
+    def metadata(self) -> Dict:
+        return self._table.metadata[self._row]
+
+    @metadata.setter
+    def metadata(self, value: Dict) -> None:
+        self._table.metadata[self._row] = value
+
+    @property
+    def embedding(self) -> Optional[np.ndarray]:
+        """float32 view of the embedding row, or None"""
+        return self._table.get_embedding(self._row)
+
+    @embedding.setter
+    def embedding(self, value: Optional[List[float]]) -> None:
+        self._table.set_embedding(self._row, value)
+
+    @property
+    def cluster_id(self) -> Optional[int]:
+        return self._table.get_cluster_id(self._row)
+
+    @cluster_id.setter
+    def cluster_id(self, value: Optional[int]) -> None:
+        self._table.set_cluster_id(self._row, value)
 
     def to_dict(self) -> Dict:
         """Convert experience to dictionary format"""
+        embedding = self.embedding
         return {
             "question": self.question,
             "function": self.function,
-            "embedding": self.embedding,
+            "embedding": None if embedding is None else embedding.tolist(),
             "cluster_id": self.cluster_id,
             "metadata": self.metadata
         }
@@ -36,7 +262,34 @@ class Experience:
         )
 
     def get_embedding_array(self) -> Optional[np.ndarray]:
-        """Get embedding as numpy array"""
-        if self.embedding is None:
-            return None
-        return np.array(self.embedding)
\ No newline at end of file
+        """Get embedding as numpy array (a view, no conversion)"""
+        return self.embedding
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Experience):
+            return NotImplemented
+        if self._table is other._table and self._row == other._row:
+            return True
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (f"Experience(question={self.question!r}, function={self.function!r}, "
+                f"cluster_id={self.cluster_id!r})")
+
+    def __reduce__(self):
+        # Pickle the row on its own rather than the whole backing table
+        return (Experience.from_dict, (self.to_dict(),))
+
+    def __setstate__(self, state) -> None:
+        # Pools pickled before Experience was table-backed stored a dict state
+        if isinstance(state, tuple):
+            state = state[0] or state[1]
+        self.__init__(
+            question=state["question"],
+            function=state["function"],
+            embedding=state.get("embedding"),
+            cluster_id=state.get("cluster_id"),
+            metadata=state.get("metadata", {})
+        )
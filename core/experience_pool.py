@@ -1,13 +1,24 @@
 # core/experience_pool.py
+import asyncio
+import logging
+import os
 import pickle
-from typing import Dict, List, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 from pathlib import Path
 import numpy as np
-from .experience import Experience
+from .experience import Experience, ExperienceTable
 from .embedding_generator import EmbeddingGenerator
 from .vector_store import VectorStore
-from .cluster_manager import ClusterManager
-from .cluster_template import ClusterTemplate
+from .vector_index import compute_distances, prepare_queries, top_k
+from .cluster_manager import AsyncTemplateGenerator, ClusterManager
+from .cluster_template import ClusterTemplate, membership_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Version of the on-disk layout written by ExperiencePool.save
+POOL_FORMAT_VERSION = 2
 
 class ExperiencePool:
     """
@@ -17,51 +28,220 @@ class ExperiencePool:
                  embedding_generator: EmbeddingGenerator,
                  vector_store: VectorStore,
                  cluster_manager: ClusterManager,
-                 save_path: str = "experience_pool.pkl"):
+                 save_path: str = "experience_pool.pkl",
+                 incremental_clustering: bool = False,
+                 min_template_change: float = 0.0,
+                 template_workers: int = 4,
+                 route_clusters: int = 2,
+                 template_generator: Optional[AsyncTemplateGenerator] = None):
+        self.table = ExperienceTable()
         self.experiences: List[Experience] = []
         self.embedding_generator = embedding_generator
         self.vector_store = vector_store
         self.cluster_manager = cluster_manager
         self.save_path = Path(save_path)
         self.templates: Dict[int, ClusterTemplate] = {}
+        self.incremental_clustering = incremental_clustering
+        # Rows already folded into the incremental clustering state
+        self.clustered_rows = 0
+        # Fraction of a cluster's membership that must change before its
+        # template is regenerated (0.0 regenerates on any change)
+        self.min_template_change = min_template_change
+        self.template_workers = template_workers
+        # When set, dirty clusters are sent from one event loop instead of
+        # template_workers threads
+        self.template_generator = template_generator
+        self.template_stats: Dict[str, int] = {"reused": 0, "regenerated": 0, "failed": 0}
+        # Number of nearest clusters searched by find_with_template_batch
+        self.route_clusters = route_clusters
+        self._routes: Optional[Dict] = None
+        # Guards the table, vector store and templates when several runs
+        # share the pool; embedding requests are made outside it
+        self._lock = threading.RLock()
+        # Serializes update_clusters, which releases _lock while templates
+        # are generated
+        self._cluster_lock = threading.Lock()
 
     def add_experience(self, question: str, function: str) -> Experience:
         """Add new experience to the pool"""
-        # Create experience
-        exp = Experience(question=question, function=function)
-        
         # Generate embedding
         embedding = self.embedding_generator.generate(question)
-        exp.embedding = embedding
         
-        # Add to experiences and vector store
-        self.experiences.append(exp)
-        self.vector_store.add_vector(embedding)
+        # Add to the experience table and vector store
+        with self._lock:
+            exp = self.table.append(question, function, embedding=embedding)
+            self.experiences.append(exp)
+            self.vector_store.add_vector(embedding)
         
         return exp
 
     def update_clusters(self) -> None:
-        """Update clusters and generate templates"""
-        # Get all embeddings
-        embeddings = [exp.get_embedding_array() for exp in self.experiences 
-                     if exp.embedding is not None]
-        if not embeddings:
-            return
+        """
+        Update clusters and generate templates
 
-        # Perform clustering
-        cluster_ids = self.cluster_manager.cluster(np.stack(embeddings))
-        
-        # Update experience cluster IDs
-        for exp, cluster_id in zip(self.experiences, cluster_ids):
-            exp.cluster_id = int(cluster_id)
-
-        # Generate templates for each cluster
-        self.templates = {}
-        for cluster_id in set(cluster_ids):
-            cluster_exps = [exp for exp in self.experiences 
-                          if exp.cluster_id == cluster_id]
-            template = self.cluster_manager.generate_template(cluster_exps)
-            self.templates[cluster_id] = template
+        Clustering runs under the pool lock; the LLM round trips for
+        changed clusters run outside it, so concurrent lookups and
+        additions are not held up by template generation.
+        """
+        with self._cluster_lock:
+            with self._lock:
+                changed = self._recluster()
+            if changed is None:
+                return
+            templates, dirty = changed
+
+            templates.update(self._generate_templates(dirty))
+            with self._lock:
+                self.templates = templates
+                self._routes = None
+
+    def _recluster(self) -> Optional[Tuple[Dict[int, ClusterTemplate], Dict[int, np.ndarray]]]:
+        """
+        Cluster the pool and sort clusters into reusable templates and
+        clusters that need a new one (None if nothing is embedded yet)
+        """
+        has_embedding = self.table.has_embedding
+        if not has_embedding.any():
+            return None
+
+        if self.incremental_clustering:
+            self._cluster_new_rows()
+        else:
+            self._cluster_all_rows()
+
+        # Let approximate indexes reuse the centroids as coarse cells
+        self.vector_store.use_centroids(self.cluster_manager.centroids)
+
+        # Regenerate templates only for clusters whose membership changed
+        templates = {}
+        dirty = {}
+        by_fingerprint = {
+            template.fingerprint: template for template in self.templates.values()
+            if template.fingerprint is not None
+        }
+        for cluster_id, rows in self._cluster_members().items():
+            template = by_fingerprint.get(membership_fingerprint(rows))
+            if template is None and self._below_change_threshold(
+                    self.templates.get(cluster_id), rows):
+                template = self.templates[cluster_id]
+
+            if template is not None:
+                templates[cluster_id] = template
+                self.template_stats["reused"] += 1
+            else:
+                dirty[cluster_id] = rows
+        # Cluster ids changed, so the routing centroids are stale
+        self._routes = None
+        return templates, dirty
+
+    def _generate_templates(self, clusters: Dict[int, np.ndarray]) -> Dict[int, ClusterTemplate]:
+        """
+        Generate templates for several clusters concurrently
+
+        A cluster whose generation fails keeps its previous template, if it
+        had one, and does not affect the others.
+        """
+        if not clusters:
+            return {}
+
+        if self.template_generator is not None:
+            outcomes = asyncio.run(self._generate_templates_async(clusters))
+        else:
+            outcomes = self._generate_templates_threaded(clusters)
+
+        templates = {}
+        for cluster_id, outcome in outcomes.items():
+            if isinstance(outcome, BaseException):
+                logger.warning(f"Template generation failed for cluster {cluster_id}: {str(outcome)}")
+                self.template_stats["failed"] += 1
+                if cluster_id in self.templates:
+                    templates[cluster_id] = self.templates[cluster_id]
+            else:
+                templates[cluster_id] = outcome
+                self.template_stats["regenerated"] += 1
+        return templates
+
+    def _generate_templates_threaded(self,
+                                     clusters: Dict[int, np.ndarray]
+                                     ) -> Dict[int, Union[ClusterTemplate, Exception]]:
+        """Call the ClusterManager for each cluster from a thread pool"""
+        def generate(rows: np.ndarray) -> ClusterTemplate:
+            template = self.cluster_manager.generate_template(
+                [self.experiences[row] for row in rows]
+            )
+            template.fingerprint = membership_fingerprint(rows)
+            return template
+
+        workers = max(1, min(self.template_workers, len(clusters)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="template") as executor:
+            futures = {
+                cluster_id: executor.submit(generate, rows)
+                for cluster_id, rows in clusters.items()
+            }
+
+        outcomes = {}
+        for cluster_id, future in futures.items():
+            try:
+                outcomes[cluster_id] = future.result()
+            except Exception as e:
+                outcomes[cluster_id] = e
+        return outcomes
+
+    async def _generate_templates_async(self,
+                                        clusters: Dict[int, np.ndarray]
+                                        ) -> Dict[int, Union[ClusterTemplate, Exception]]:
+        """Send every cluster through the AsyncTemplateGenerator at once"""
+        async def generate(rows: np.ndarray) -> ClusterTemplate:
+            template = await self.template_generator.generate_template(
+                [self.experiences[row] for row in rows]
+            )
+            template.fingerprint = membership_fingerprint(rows)
+            return template
+
+        results = await asyncio.gather(
+            *(generate(rows) for rows in clusters.values()), return_exceptions=True
+        )
+        return dict(zip(clusters, results))
+
+    def _cluster_members(self) -> Dict[int, np.ndarray]:
+        """Row ids of the embedded experiences in each cluster"""
+        rows = np.flatnonzero(self.table.has_embedding)
+        cluster_ids = self.table.cluster_ids[rows]
+        order = np.argsort(cluster_ids, kind='stable')
+        boundaries = np.flatnonzero(np.diff(cluster_ids[order])) + 1
+        return {
+            int(cluster_ids[group[0]]): rows[group]
+            for group in np.split(order, boundaries) if len(group)
+        }
+
+    def _below_change_threshold(self, template: Optional[ClusterTemplate], rows: np.ndarray) -> bool:
+        """Whether a cluster changed too little since its template was generated"""
+        if template is None or self.min_template_change <= 0:
+            return False
+        previous = {exp.row for exp in template.examples if exp.table is self.table}
+        current = set(rows.tolist())
+        changed = len(previous ^ current) / max(len(previous), len(current))
+        return changed < self.min_template_change
+
+    def _cluster_all_rows(self) -> None:
+        """Refit the clustering over every embedded experience"""
+        # Cluster the embedding matrix directly; no per-experience conversion
+        has_embedding = self.table.has_embedding
+        embeddings = self.table.embeddings
+        if not has_embedding.all():
+            embeddings = embeddings[has_embedding]
+
+        cluster_ids = np.asarray(self.cluster_manager.cluster(embeddings), dtype=np.int32)
+        self.table.cluster_ids[has_embedding] = cluster_ids
+
+    def _cluster_new_rows(self) -> None:
+        """Fold only the experiences added since the last update into the clusters"""
+        start = self.clustered_rows if self.cluster_manager.is_fitted else 0
+        rows = np.flatnonzero(self.table.has_embedding[start:]) + start
+        if len(rows):
+            cluster_ids = self.cluster_manager.partial_cluster(self.table.embeddings[rows])
+            self.table.cluster_ids[rows] = np.asarray(cluster_ids, dtype=np.int32)
+        self.clustered_rows = len(self.table)
 
     def find_similar(self, question: str, k: int = 5) -> List[Tuple[Experience, float]]:
         """Find k most similar experiences"""
@@ -69,35 +249,297 @@ class ExperiencePool:
         query_embedding = self.embedding_generator.generate(question)
         
         # Find similar vectors
-        similar_indices, distances = self.vector_store.search(query_embedding, k)
-        
-        # Return experiences with similarity scores
+        with self._lock:
+            similar_indices, distances = self.vector_store.search(query_embedding, k)
+            
+            # Return experiences with similarity scores
+            results = []
+            for idx, dist in zip(similar_indices, distances):
+                if idx < len(self.experiences):
+                    results.append((self.experiences[idx], float(dist)))
+        return results
+
+    def find_similar_batch(self, questions: List[str], k: int = 5) -> List[List[Tuple[Experience, float]]]:
+        """Find k most similar experiences for each question with one search"""
+        if not questions:
+            return []
+
+        # Embed all queries in one request and search them together
+        query_embeddings = self.embedding_generator.generate_batch(questions)
+        with self._lock:
+            return self._search_batch(np.asarray(query_embeddings), k)
+
+    def _search_batch(self, query_embeddings: np.ndarray, k: int) -> List[List[Tuple[Experience, float]]]:
+        """Exhaustive search of the vector store for already embedded queries"""
+        indices, distances = self.vector_store.search_batch(query_embeddings, k)
+
         results = []
-        for idx, dist in zip(similar_indices, distances):
-            if idx < len(self.experiences):
-                results.append((self.experiences[idx], float(dist)))
+        for row_indices, row_distances in zip(indices, distances):
+            results.append([
+                (self.experiences[idx], float(dist))
+                for idx, dist in zip(row_indices, row_distances)
+                if idx < len(self.experiences)
+            ])
         return results
 
+    def find_with_template(self, question: str, k: int = 5) -> Tuple[Optional[ClusterTemplate], List[Tuple[Experience, float]]]:
+        """Template of the closest cluster and the k most similar experiences"""
+        return self.find_with_template_batch([question], k)[0]
+
+    def find_with_template_batch(self,
+                                 questions: List[str],
+                                 k: int = 5) -> List[Tuple[Optional[ClusterTemplate], List[Tuple[Experience, float]]]]:
+        """
+        Two-level lookup: match each question against the cluster centroids,
+        then search only the members of the `route_clusters` closest clusters
+
+        Rows added since the last update_clusters are always searched too.
+        Falls back to find_similar_batch until the pool has been clustered.
+        """
+        if not questions:
+            return []
+
+        query_embeddings = np.asarray(self.embedding_generator.generate_batch(questions))
+        with self._lock:
+            return self._route_batch(query_embeddings, k)
+
+    def _route_batch(self,
+                     query_embeddings: np.ndarray,
+                     k: int) -> List[Tuple[Optional[ClusterTemplate], List[Tuple[Experience, float]]]]:
+        routes = self._build_routes()
+        if routes is None:
+            return [(None, similar) for similar in self._search_batch(query_embeddings, k)]
+
+        metric = self.vector_store.metric
+        queries = prepare_queries(query_embeddings, metric)
+        centroid_distances = compute_distances(queries, routes["centroids"], routes["norms"], metric)
+        nearest = top_k(centroid_distances, min(self.route_clusters, len(routes["cluster_ids"])))
+
+        # Rows that are not in any routed cluster are searched exhaustively
+        tail = np.flatnonzero(self.table.has_embedding[routes["rows"]:]) + routes["rows"]
+        unrouted = np.concatenate([routes["unrouted"], tail])
+
+        embeddings = self.table.embeddings
+        results = []
+        for query, clusters in zip(queries, nearest):
+            rows = np.concatenate([routes["members"][cluster] for cluster in clusters] + [unrouted])
+            candidates = embeddings[rows]
+            distances = compute_distances(
+                query[None, :], candidates, np.linalg.norm(candidates, axis=1), metric
+            )
+            order = top_k(distances, min(k, len(rows)))[0]
+            template = self.templates.get(int(routes["cluster_ids"][clusters[0]]))
+            results.append((template, [
+                (self.experiences[rows[i]], float(distances[0, i])) for i in order
+            ]))
+        return results
+
+    def _build_routes(self) -> Optional[Dict]:
+        """Centroid and membership table used by find_with_template_batch"""
+        if self._routes is not None:
+            return self._routes
+
+        members = self._cluster_members()
+        unrouted = members.pop(ExperienceTable.NO_CLUSTER, np.empty(0, dtype=np.int64))
+        if not members:
+            return None
+
+        cluster_ids = np.array(sorted(members))
+        embeddings = self.table.embeddings
+        centroids = np.stack([embeddings[members[c]].mean(axis=0) for c in cluster_ids])
+        self._routes = {
+            "cluster_ids": cluster_ids,
+            "centroids": centroids,
+            "norms": np.linalg.norm(centroids, axis=1),
+            "members": [members[c] for c in cluster_ids],
+            "unrouted": unrouted,
+            "rows": len(self.table)
+        }
+        return self._routes
+
+    @property
+    def embeddings_path(self) -> Path:
+        """Path of the .npy embedding matrix stored next to the row store"""
+        return self.save_path.with_suffix('.npy')
+
     def save(self) -> None:
-        """Save experience pool to disk"""
-        with open(self.save_path, 'wb') as f:
-            pickle.dump({
-                'experiences': self.experiences,
-                'templates': self.templates
-            }, f)
+        """
+        Save experience pool to disk
+
+        Embeddings are written as one contiguous float32 .npy matrix; questions,
+        functions, metadata and templates are pickled separately and refer to
+        embedding rows by index.
+        """
+        # Snapshot and write under the lock so rows, matrix and templates match
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        has_embedding = self.table.has_embedding
+        rows = [
+            {
+                "question": exp.question,
+                "function": exp.function,
+                "cluster_id": exp.cluster_id,
+                "metadata": exp.metadata,
+                "embedding_row": row if has_embedding[row] else None
+            }
+            for row, exp in enumerate(self.experiences)
+        ]
+        embeddings = self.table.embeddings
+        if embeddings is None:
+            embeddings = np.zeros((len(rows), 0), dtype=np.float32)
+
+        # Templates reference pool experiences by row index
+        templates = {
+            cluster_id: {
+                "question_template": template.question_template,
+                "function_template": template.function_template,
+                "fingerprint": template.fingerprint,
+                "examples": [
+                    exp.row if exp.table is self.table else exp.to_dict()
+                    for exp in template.examples
+                ]
+            }
+            for cluster_id, template in self.templates.items()
+        }
+
+        data = {
+            'format': POOL_FORMAT_VERSION,
+            'rows': rows,
+            'templates': templates
+        }
+        if self.incremental_clustering:
+            data['clustering'] = {
+                'clustered_rows': self.clustered_rows,
+                'state': self.cluster_manager.get_state()
+            }
+
+        # Write both files to temporary paths first (the current matrix may
+        # be memory-mapped), then swap them in, so a failed save leaves the
+        # previous pool intact
+        tmp_embeddings = self.embeddings_path.with_suffix('.tmp.npy')
+        tmp_rows = self.save_path.with_suffix(self.save_path.suffix + '.tmp')
+        try:
+            np.save(tmp_embeddings, embeddings)
+            with open(tmp_rows, 'wb') as f:
+                pickle.dump(data, f)
+        except BaseException:
+            for path in (tmp_embeddings, tmp_rows):
+                path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_embeddings, self.embeddings_path)
+        os.replace(tmp_rows, self.save_path)
 
     def load(self) -> None:
         """Load experience pool from disk"""
+        with self._lock:
+            self._load()
+
+    def _load(self) -> None:
         if not self.save_path.exists():
             return
             
         with open(self.save_path, 'rb') as f:
             data = pickle.load(f)
-            self.experiences = data['experiences']
-            self.templates = data.get('templates', {})
+
+        version = data.get('format')
+        if version is None and 'experiences' in data:
+            # Written before the format was versioned: a list of Experiences
+            self._load_legacy(data)
+            return
+        if version != POOL_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported experience pool format {version!r} in {self.save_path} "
+                f"(this version reads format {POOL_FORMAT_VERSION} and unversioned legacy pools)"
+            )
+
+        # Open the embedding matrix as a read-only memory map (no copy)
+        embeddings = None
+        rows = data['rows']
+        if self.embeddings_path.exists():
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+            if embeddings.ndim != 2 or embeddings.shape[0] != len(rows):
+                raise ValueError(
+                    f"Embedding matrix {self.embeddings_path} has shape {embeddings.shape}, "
+                    f"but {self.save_path} holds {len(rows)} rows"
+                )
+            if embeddings.shape[1] == 0:
+                embeddings = None
+
+        embedding_rows = [row["embedding_row"] for row in rows]
+        if embeddings is not None and embedding_rows != list(range(len(rows))):
+            # Rows without embeddings: align the matrix with the rows (copies)
+            aligned = np.zeros((len(rows), embeddings.shape[1]), dtype=np.float32)
+            for row, embedding_row in enumerate(embedding_rows):
+                if embedding_row is not None:
+                    aligned[row] = embeddings[embedding_row]
+            embeddings = aligned
+
+        self.table = ExperienceTable.from_columns(
+            questions=[row["question"] for row in rows],
+            functions=[row["function"] for row in rows],
+            metadata=[row["metadata"] for row in rows],
+            cluster_ids=[
+                ExperienceTable.NO_CLUSTER if row["cluster_id"] is None else row["cluster_id"]
+                for row in rows
+            ],
+            embeddings=embeddings,
+            has_embedding=[embedding_row is not None for embedding_row in embedding_rows]
+        )
+        self.experiences = self.table.rows()
+        self._routes = None
+        self.templates = {
+            cluster_id: ClusterTemplate(
+                question_template=template["question_template"],
+                function_template=template["function_template"],
+                examples=[
+                    self.experiences[exp] if isinstance(exp, int) else Experience.from_dict(exp)
+                    for exp in template["examples"]
+                ],
+                fingerprint=template.get("fingerprint")
+            )
+            for cluster_id, template in data.get('templates', {}).items()
+        }
+
+        # Resume incremental clustering where the last run stopped
+        clustering = data.get('clustering')
+        if self.incremental_clustering and clustering:
+            self.cluster_manager.set_state(clustering['state'])
+            self.clustered_rows = clustering['clustered_rows']
+
+        # Share the memory-mapped matrix with the vector store when aligned
+        has_embedding = self.table.has_embedding
+        if has_embedding.all() and len(has_embedding):
+            self.vector_store.attach(self.table.embeddings)
+        elif has_embedding.any():
+            self.vector_store.rebuild(self.table.embeddings[has_embedding])
+
+    def _load_legacy(self, data: Dict) -> None:
+        """Load a pool pickled with embeddings stored as lists"""
+        self.table = ExperienceTable()
+        self.experiences = []
+        self._routes = None
+        positions = {}
+        for exp in data['experiences']:
+            positions[id(exp)] = len(self.experiences)
+            self.experiences.append(self.table.append(
+                exp.question, exp.function, exp.embedding, exp.cluster_id, exp.metadata
+            ))
+        self.templates = {
+            cluster_id: ClusterTemplate(
+                question_template=template.question_template,
+                function_template=template.function_template,
+                examples=[
+                    self.experiences[positions[id(exp)]] if id(exp) in positions else exp
+                    for exp in template.examples
+                ],
+                fingerprint=getattr(template, 'fingerprint', None)
+            )
+            for cluster_id, template in data.get('templates', {}).items()
+        }
             
         # Rebuild vector store
-        embeddings = [exp.embedding for exp in self.experiences 
-                     if exp.embedding is not None]
-        if embeddings:
-            self.vector_store.rebuild(embeddings)
\ No newline at end of file
+        has_embedding = self.table.has_embedding
+        if has_embedding.any():
+            self.vector_store.rebuild(self.table.embeddings[has_embedding])
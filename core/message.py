@@ -1,14 +1,17 @@
 # core/message.py
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
+from core.run_context import RunContext
 
 @dataclass
 class Message:
     sender_id: str
     recipient_id: str
     content: Any
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = field(default_factory=datetime.now)
+    # Run the message belongs to; agents keep per-run state here
+    context: Optional[RunContext] = None
     
     def __str__(self):
         return f"Message from {self.sender_id} to {self.recipient_id}: {self.content}"
\ No newline at end of file
@@ -0,0 +1,260 @@
+# core/message_bus.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from core.base_agent import BaseAgent
+from core.message import Message
+from core.run_context import RunContext
+
+logger = logging.getLogger(__name__)
+
+# Recipient id of a run's final message
+OUTPUT = "output"
+
+@dataclass
+class _Run:
+    future: Future
+    # Admission slots held: the most messages the run can have in flight
+    weight: int
+    # Messages of the run queued or being processed
+    pending: int = 0
+
+class MessageBus:
+    """
+    Routes messages between agents through per-agent inbound queues
+
+    Each agent is served by `workers_per_agent` threads, so stages of
+    different runs overlap: the Engineer can work on one run while the
+    Verifier executes another. Queues hold at most `queue_size` messages
+    and a full queue blocks the sender.
+
+    An agent may answer one message with several (a fan-out); a run holds
+    one admission slot per message it can have in flight, its context's
+    `fan_out`. At most `max_in_flight <= queue_size` slots are handed out
+    (further submits wait), so a queue can never stay full and agents
+    cannot deadlock on each other. A run's future resolves with its first
+    message to the output; its remaining messages are then dropped.
+    """
+    def __init__(self,
+                 agents: Dict[str, BaseAgent],
+                 queue_size: int = 16,
+                 workers_per_agent: int = 4,
+                 max_in_flight: Optional[int] = None,
+                 fallback: Optional[Dict[str, str]] = None):
+        self.agents = agents
+        self.queue_size = queue_size
+        self.workers_per_agent = max(1, workers_per_agent)
+        self.max_in_flight = max_in_flight if max_in_flight is not None else queue_size
+        if self.max_in_flight > queue_size:
+            raise ValueError("max_in_flight must not exceed queue_size")
+        # Recipient of an agent's input when the agent produces no response
+        self.fallback = dict(fallback or {})
+        self.stats: Dict[str, float] = {
+            "submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "admission_wait": 0.0
+        }
+        self.queue_stats: Dict[str, Dict[str, float]] = {
+            agent_id: {"processed": 0, "errors": 0, "max_depth": 0, "wait_time": 0.0, "max_wait": 0.0}
+            for agent_id in agents
+        }
+        self._queues: Dict[str, "queue.Queue[Optional[Tuple[Message, float]]]"] = {
+            agent_id: queue.Queue(maxsize=queue_size) for agent_id in agents
+        }
+        self._lock = threading.Lock()
+        # Signalled when admission slots are released
+        self._admission = threading.Condition(self._lock)
+        self._available = self.max_in_flight
+        self._runs: Dict[str, _Run] = {}
+        self._closed = False
+        self._workers: List[threading.Thread] = []
+        for agent_id in agents:
+            for i in range(self.workers_per_agent):
+                worker = threading.Thread(
+                    target=self._work, args=(agent_id,), name=f"bus-{agent_id}-{i}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, message: Message) -> Future:
+        """
+        Start a run with its first message
+
+        Blocks until the run's fan_out admission slots are free. The future
+        resolves to the run's message addressed to the output, or None if
+        the run ended without one.
+        """
+        if self._closed:
+            raise RuntimeError("MessageBus is closed")
+        if message.context is None:
+            message.context = RunContext()
+        weight = max(1, message.context.fan_out)
+        if weight > self.max_in_flight:
+            raise ValueError(f"Run fan_out {weight} exceeds max_in_flight {self.max_in_flight}")
+
+        start = time.monotonic()
+        future: Future = Future()
+        with self._admission:
+            self._admission.wait_for(lambda: self._available >= weight)
+            self._available -= weight
+            self.stats["admission_wait"] += time.monotonic() - start
+            self.stats["submitted"] += 1
+            # The submission counts as a pending message until it is routed
+            self._runs[message.context.run_id] = _Run(future, weight, pending=1)
+        self._route(message, message.context.run_id)
+        self._release(message.context.run_id)
+        return future
+
+    def run(self, message: Message) -> Optional[Message]:
+        return self.submit(message).result()
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Messages currently waiting in each agent's queue"""
+        return {agent_id: inbox.qsize() for agent_id, inbox in self._queues.items()}
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Per-agent queue depth and wait time, with the mean wait per message"""
+        depths = self.queue_depths()
+        with self._lock:
+            metrics = {}
+            for agent_id, stats in self.queue_stats.items():
+                processed = stats["processed"] + stats["errors"]
+                metrics[agent_id] = dict(
+                    stats,
+                    depth=depths[agent_id],
+                    mean_wait=stats["wait_time"] / processed if processed else 0.0
+                )
+            return metrics
+
+    def close(self) -> None:
+        """Stop the agent threads; runs still in flight fail"""
+        if self._closed:
+            return
+        self._closed = True
+        for inbox in self._queues.values():
+            for _ in range(self.workers_per_agent):
+                inbox.put(None)
+        for worker in self._workers:
+            worker.join()
+        with self._lock:
+            runs = list(self._runs.values())
+            self._runs.clear()
+        for run in runs:
+            if not run.future.done():
+                run.future.set_exception(RuntimeError("MessageBus closed before the run finished"))
+
+    def __enter__(self) -> "MessageBus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _route(self, message: Message, run_id: str) -> None:
+        if message.recipient_id == OUTPUT:
+            self._resolve(run_id, result=message)
+            return
+        inbox = self._queues.get(message.recipient_id)
+        if inbox is None:
+            logger.error(f"Unknown agent: {message.recipient_id}")
+            return
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run.pending += 1
+        inbox.put((message, time.monotonic()))
+        with self._lock:
+            stats = self.queue_stats[message.recipient_id]
+            stats["max_depth"] = max(stats["max_depth"], inbox.qsize())
+
+    def _work(self, agent_id: str) -> None:
+        agent = self.agents[agent_id]
+        inbox = self._queues[agent_id]
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            message, enqueued = item
+            run_id = message.context.run_id
+            wait = time.monotonic() - enqueued
+            with self._lock:
+                stats = self.queue_stats[agent_id]
+                stats["wait_time"] += wait
+                stats["max_wait"] = max(stats["max_wait"], wait)
+                run = self._runs.get(run_id)
+                resolved = run is None or run.future.done()
+                if resolved:
+                    self.stats["dropped"] += 1
+
+            if not resolved:
+                self._deliver(agent_id, agent, message)
+            self._release(run_id)
+
+    def _deliver(self, agent_id: str, agent: BaseAgent, message: Message) -> None:
+        """Have the agent process a message and route its responses"""
+        try:
+            agent.receive_message(message)
+            logger.info(f"Processing message: {message}")
+            response = agent.process(message)
+        except Exception as e:
+            with self._lock:
+                self.queue_stats[agent_id]["errors"] += 1
+            self._resolve(message.context.run_id, error=e)
+            return
+        with self._lock:
+            self.queue_stats[agent_id]["processed"] += 1
+
+        if response is None:
+            logger.error(f"Agent {agent_id} failed to produce response")
+            recipient = self.fallback.get(agent_id)
+            if recipient is None:
+                return
+            response = Message(
+                sender_id=agent_id,
+                recipient_id=recipient,
+                content=message.content,
+                context=message.context
+            )
+        # An agent may fan out into several messages, or none
+        responses = response if isinstance(response, list) else [response]
+        for next_message in responses:
+            if next_message.context is None:
+                next_message.context = message.context
+            self._route(next_message, message.context.run_id)
+
+    def _resolve(self,
+                 run_id: str,
+                 result: Optional[Message] = None,
+                 error: Optional[Exception] = None) -> None:
+        """Resolve a run's future; later messages of the run are dropped"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run.future.done():
+                return
+            self.stats["completed" if error is None else "failed"] += 1
+            # Set under the lock so workers see the run as resolved at once
+            if error is not None:
+                run.future.set_exception(error)
+            else:
+                run.future.set_result(result)
+
+    def _release(self, run_id: str) -> None:
+        """
+        Count a processed message; once the run has none left, free its
+        admission slots, resolving it with None if nothing reached the output
+        """
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run.pending -= 1
+            if run.pending > 0:
+                return
+            del self._runs[run_id]
+            self._available += run.weight
+            self._admission.notify_all()
+            if not run.future.done():
+                self.stats["completed"] += 1
+                run.future.set_result(None)
@@ -0,0 +1,49 @@
+# core/retry.py
+import asyncio
+import random
+from typing import Awaitable, Callable, Tuple, Type, TypeVar
+import openai
+
+T = TypeVar("T")
+
+# Errors that mean "slow down and try again" rather than a real failure
+RATE_LIMIT_ERRORS: Tuple[Type[BaseException], ...] = (openai.error.RateLimitError,)
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]"""
+    return random.uniform(0.0, min(max_delay, base_delay * (2 ** attempt)))
+
+async def retry_async(call: Callable[[], Awaitable[T]],
+                      max_retries: int = 5,
+                      base_delay: float = 0.5,
+                      max_delay: float = 20.0,
+                      retry_on: Tuple[Type[BaseException], ...] = RATE_LIMIT_ERRORS) -> T:
+    """Await call(), retrying with jittered exponential backoff on retry_on errors"""
+    attempt = 0
+    while True:
+        try:
+            return await call()
+        except retry_on:
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+class LoopSemaphore:
+    """
+    asyncio.Semaphore created lazily for the running event loop
+
+    Lets a long-lived client be constructed outside any loop and then used
+    from whichever loop drives it.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._loop = None
+        self._semaphore = None
+
+    def get(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
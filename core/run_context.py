@@ -0,0 +1,51 @@
+# core/run_context.py
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, List, Optional, Set, Tuple
+from core.task import Task
+
+# Messages kept per run for inspection; older ones are dropped
+DEFAULT_MAX_MESSAGES = 100
+
+@dataclass
+class RunContext:
+    """
+    State of one pipeline run
+
+    Messages carry the context of the run they belong to, so agents hold
+    no per-run state and one set of agents can serve concurrent runs.
+    """
+    run_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    max_messages: int = DEFAULT_MAX_MESSAGES
+    # Candidate pipelines started from the initial plan and run concurrently
+    fan_out: int = 1
+    # Voter state: completed iterations, the candidate tasks so far with
+    # their scores and total execution time, and whether a candidate has
+    # been selected
+    iterations: int = 0
+    candidates: List[Task] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    cost: float = 0.0
+    selected: bool = False
+    # Set on selection: the stopping policy that ended the run early, and
+    # how many candidates that spared
+    stop_reason: Optional[str] = None
+    iterations_saved: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    # (question, code) pairs already added to the experience pool
+    recorded: Set[Tuple[str, str]] = field(default_factory=set)
+    messages: Deque[Any] = field(init=False, repr=False)
+    # Serializes updates from agents processing concurrent candidates
+    lock: threading.Lock = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.messages = deque(maxlen=self.max_messages)
+        self.lock = threading.Lock()
+
+    def record(self, message: Any) -> None:
+        """Append a message to the bounded message log"""
+        with self.lock:
+            self.messages.append(message)
@@ -0,0 +1,46 @@
+# core/stopping_policy.py
+import abc
+import time
+from dataclasses import dataclass
+from typing import Optional
+from core.run_context import RunContext
+
+class StoppingPolicy(abc.ABC):
+    """Decides whether the Voter can select before all candidates are in"""
+    @abc.abstractmethod
+    def should_stop(self, context: RunContext) -> bool:
+        """Whether the candidates scored so far in the run are good enough"""
+        pass
+
+@dataclass
+class PerfectScore(StoppingPolicy):
+    """Stop once a candidate's success rate reaches `threshold`"""
+    threshold: float = 1.0
+
+    def should_stop(self, context: RunContext) -> bool:
+        return bool(context.scores) and context.scores[-1] >= self.threshold
+
+@dataclass
+class NoImprovement(StoppingPolicy):
+    """Stop when the best score has not improved over the last `patience` candidates"""
+    patience: int = 2
+
+    def should_stop(self, context: RunContext) -> bool:
+        scores = context.scores
+        if len(scores) <= self.patience:
+            return False
+        return max(scores[-self.patience:]) <= max(scores[:-self.patience])
+
+@dataclass
+class Budget(StoppingPolicy):
+    """
+    Stop once the run has used `max_seconds` of wall-clock time or
+    `max_cost` seconds of code execution time across its candidates
+    """
+    max_seconds: Optional[float] = None
+    max_cost: Optional[float] = None
+
+    def should_stop(self, context: RunContext) -> bool:
+        if self.max_seconds is not None and time.monotonic() - context.started_at >= self.max_seconds:
+            return True
+        return self.max_cost is not None and context.cost >= self.max_cost
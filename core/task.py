@@ -13,7 +13,7 @@ class TaskStatus(Enum):
 class Task:
     task_id: str
     description: str
-    subtasks: List[Dict[str, str]]
+    subtasks: List[Dict[str, Any]]
     status: TaskStatus = TaskStatus.PENDING
     code_blocks: Dict[str, str] = None
     execution_results: Dict[str, Any] = None
@@ -29,4 +29,11 @@ class Task:
     def update_execution_result(self, subtask_id: str, result: Any):
         if self.execution_results is None:
             self.execution_results = {}
-        self.execution_results[subtask_id] = result
\ No newline at end of file
+        self.execution_results[subtask_id] = result
+        
+    def dependencies(self, subtask_id: str) -> List[str]:
+        """Ids of the subtasks whose results the given subtask consumes"""
+        subtask = next((st for st in self.subtasks if st["id"] == subtask_id), None)
+        if subtask is None:
+            return []
+        return list(subtask.get("depends_on", []))
@@ -0,0 +1,233 @@
+# core/vector_index.py
+import abc
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+if TYPE_CHECKING:
+    from .vector_store import VectorStore
+
+def prepare_queries(queries: np.ndarray, metric: str) -> np.ndarray:
+    """Convert queries to a float32 matrix, L2-normalized for cosine"""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    if metric == 'cosine':
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+    return queries
+
+def compute_distances(queries: np.ndarray,
+                      vectors: np.ndarray,
+                      norms: np.ndarray,
+                      metric: str) -> np.ndarray:
+    """
+    Distances from prepared queries to vectors with precomputed row norms
+    """
+    if metric == 'cosine':
+        norms = np.where(norms == 0, 1.0, norms)
+        return 1.0 - (queries @ vectors.T) / norms
+    if metric == 'euclidean':
+        squared = (
+            np.einsum('ij,ij->i', queries, queries)[:, None]
+            - 2.0 * (queries @ vectors.T)
+            + np.square(norms)
+        )
+        return np.sqrt(np.maximum(squared, 0.0))
+    return pairwise_distances(queries, vectors, metric=metric)
+
+def top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k smallest distances in each row, nearest first"""
+    if k < distances.shape[1]:
+        candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+    order = np.argsort(np.take_along_axis(distances, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+class VectorIndex(abc.ABC):
+    """
+    Search strategy over the rows of a VectorStore
+
+    The store owns the vectors; an index only keeps whatever auxiliary
+    structure it needs and is told about rows as they are appended.
+    """
+    def reset(self) -> None:
+        """Drop all indexed rows"""
+
+    def add(self, store: 'VectorStore', start: int) -> None:
+        """Index rows [start, len(store)) that were just appended"""
+
+    @abc.abstractmethod
+    def search(self,
+               store: 'VectorStore',
+               queries: np.ndarray,
+               k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, distances) of shape (m, k) for prepared queries"""
+
+class FlatIndex(VectorIndex):
+    """
+    Exact brute-force search over every stored vector
+    """
+    def search(self, store, queries, k):
+        distances = compute_distances(queries, store.vectors, store.norms, store.metric)
+        indices = top_k(distances, k)
+        return indices, np.take_along_axis(distances, indices, axis=1)
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: rows are bucketed by their nearest coarse centroid
+    and a query only scans the rows of its `nprobe` nearest buckets.
+
+    Centroids are either supplied with set_centroids (e.g. the KMeans
+    centroids ClusterManager already computed) or trained on a sample of
+    the store once it holds `train_factor * n_lists` rows. Until then the
+    index falls back to exact search.
+    """
+    def __init__(self,
+                 n_lists: int = 100,
+                 nprobe: int = 8,
+                 train_factor: int = 4,
+                 max_train_size: int = 50000,
+                 random_state: int = 0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_factor = train_factor
+        self.max_train_size = max_train_size
+        self.random_state = random_state
+        self.centroids: Optional[np.ndarray] = None
+        self._centroid_norms: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def reset(self) -> None:
+        self.centroids = None
+        self._centroid_norms = None
+        self._lists = []
+        self._list_arrays = []
+
+    def set_centroids(self, centroids: np.ndarray, store: 'VectorStore') -> None:
+        """Use the given centroids as coarse cells and reassign every row"""
+        centroids = np.asarray(centroids, dtype=np.float32)
+        if store.metric == 'cosine':
+            centroids = prepare_queries(centroids, store.metric)
+        self.centroids = centroids
+        self._centroid_norms = np.linalg.norm(centroids, axis=1)
+        self._lists = [[] for _ in range(len(centroids))]
+        self._list_arrays = [None] * len(centroids)
+        self._assign(store, 0)
+
+    def add(self, store, start):
+        if self.is_trained:
+            self._assign(store, start)
+        elif len(store) >= self.train_factor * self.n_lists:
+            self._train(store)
+
+    def search(self, store, queries, k):
+        if not self.is_trained:
+            return FlatIndex().search(store, queries, k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        cell_distances = compute_distances(queries, self.centroids, self._centroid_norms, store.metric)
+        probes = top_k(cell_distances, nprobe)
+
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        distances = np.empty((len(queries), k), dtype=np.float64)
+        vectors, norms = store.vectors, store.norms
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self._cell(cell) for cell in probes[i]])
+            if len(candidates) < k:
+                # Too few rows in the probed cells; answer this query exactly
+                row_distances = compute_distances(query[None, :], vectors, norms, store.metric)
+                candidates = np.arange(len(store))
+            else:
+                row_distances = compute_distances(
+                    query[None, :], vectors[candidates], norms[candidates], store.metric
+                )
+            best = top_k(row_distances, k)[0]
+            indices[i] = candidates[best]
+            distances[i] = row_distances[0, best]
+        return indices, distances
+
+    def _train(self, store: 'VectorStore') -> None:
+        """Fit coarse centroids on a sample of the stored rows"""
+        rng = np.random.default_rng(self.random_state)
+        sample_size = min(len(store), self.max_train_size)
+        sample = store.vectors[rng.choice(len(store), sample_size, replace=False)]
+        if store.metric == 'cosine':
+            sample = prepare_queries(sample, store.metric)
+        kmeans = KMeans(n_clusters=self.n_lists, n_init=1, random_state=self.random_state)
+        kmeans.fit(sample)
+        self.set_centroids(kmeans.cluster_centers_, store)
+
+    def _assign(self, store: 'VectorStore', start: int, chunk_size: int = 65536) -> None:
+        """Append rows [start, len(store)) to the list of their nearest centroid"""
+        for chunk_start in range(start, len(store), chunk_size):
+            rows = store.vectors[chunk_start:chunk_start + chunk_size]
+            rows = prepare_queries(rows, store.metric)
+            distances = compute_distances(rows, self.centroids, self._centroid_norms, store.metric)
+            cells = np.argmin(distances, axis=1)
+            order = np.argsort(cells, kind='stable')
+            boundaries = np.flatnonzero(np.diff(cells[order])) + 1
+            for group in np.split(order, boundaries):
+                cell = cells[group[0]]
+                self._lists[cell].extend((group + chunk_start).tolist())
+                self._list_arrays[cell] = None
+
+    def _cell(self, cell: int) -> np.ndarray:
+        """Row ids of one cell as an array, cached until the cell changes"""
+        if self._list_arrays[cell] is None:
+            self._list_arrays[cell] = np.asarray(self._lists[cell], dtype=np.int64)
+        return self._list_arrays[cell]
+
+class HNSWIndex(VectorIndex):
+    """
+    Hierarchical navigable small world graph index backed by hnswlib
+
+    hnswlib is an optional dependency; install it with `pip install hnswlib`.
+    """
+    SPACES = {'cosine': 'cosine', 'euclidean': 'l2'}
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        if hnswlib is None:
+            raise ImportError("HNSWIndex requires hnswlib: pip install hnswlib")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+
+    def reset(self) -> None:
+        self._index = None
+
+    def add(self, store, start):
+        if store.metric not in self.SPACES:
+            raise ValueError(f"HNSWIndex does not support metric '{store.metric}'")
+
+        if self._index is None:
+            self._index = hnswlib.Index(space=self.SPACES[store.metric], dim=store.vectors.shape[1])
+            self._index.init_index(
+                max_elements=store.capacity,
+                ef_construction=self.ef_construction,
+                M=self.m
+            )
+        elif store.capacity > self._index.get_max_elements():
+            self._index.resize_index(store.capacity)
+
+        self._index.add_items(store.vectors[start:], np.arange(start, len(store)))
+
+    def search(self, store, queries, k):
+        self._index.set_ef(max(self.ef_search, k))
+        labels, distances = self._index.knn_query(queries, k=k)
+        if store.metric == 'euclidean':
+            # hnswlib reports squared L2 distances
+            distances = np.sqrt(np.maximum(distances, 0.0))
+        return labels.astype(np.int64), distances.astype(np.float64)
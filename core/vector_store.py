@@ -1,53 +1,146 @@
 # core/vector_store.py
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
+from .vector_index import VectorIndex, FlatIndex, prepare_queries
 
 class VectorStore:
     """
     Stores and searches vector embeddings
+
+    Vectors live in a preallocated float32 buffer that doubles its capacity
+    when full, so inserts are amortized O(1). Searches run directly over a
+    view of the filled rows; there is no model to refit after an insert.
+    How a search scans those rows is delegated to a VectorIndex (exact
+    FlatIndex by default; see core/vector_index.py for IVF and HNSW).
     """
-    def __init__(self, metric: str = 'cosine'):
+    def __init__(self, 
+                 metric: str = 'cosine', 
+                 initial_capacity: int = 1024,
+                 index: Optional[VectorIndex] = None):
         self.metric = metric
-        self.nn = NearestNeighbors(metric=metric)
-        self.vectors = None
+        self.initial_capacity = max(1, initial_capacity)
+        self.index = index or FlatIndex()
+        self._buffer: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._size = 0
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        """View of the stored vectors, or None if the store is empty"""
+        if self._size == 0:
+            return None
+        return self._buffer[:self._size]
+
+    @property
+    def norms(self) -> Optional[np.ndarray]:
+        """L2 norms of the stored vectors"""
+        if self._size == 0:
+            return None
+        return self._norms[:self._size]
+
+    @property
+    def capacity(self) -> int:
+        """Number of rows allocated in the buffer"""
+        return 0 if self._buffer is None else len(self._buffer)
+
+    def __len__(self) -> int:
+        return self._size
 
     def add_vector(self, vector: List[float]) -> None:
         """Add a new vector to the store"""
-        vector_array = np.array(vector).reshape(1, -1)
-        if self.vectors is None:
-            self.vectors = vector_array
-        else:
-            self.vectors = np.vstack([self.vectors, vector_array])
-        self._fit()
+        self._append(np.asarray(vector, dtype=np.float32).reshape(1, -1))
 
     def add_vectors(self, vectors: List[List[float]]) -> None:
         """Add multiple vectors to the store"""
-        vectors_array = np.array(vectors)
-        if self.vectors is None:
-            self.vectors = vectors_array
-        else:
-            self.vectors = np.vstack([self.vectors, vectors_array])
-        self._fit()
+        vectors_array = np.asarray(vectors, dtype=np.float32)
+        if vectors_array.size == 0:
+            return
+        self._append(vectors_array.reshape(len(vectors_array), -1))
 
     def rebuild(self, vectors: List[List[float]]) -> None:
         """Rebuild the vector store with new vectors"""
-        self.vectors = np.array(vectors)
-        self._fit()
+        self._buffer = None
+        self._norms = None
+        self._size = 0
+        self.index.reset()
+        self.add_vectors(vectors)
+
+    def attach(self, vectors: np.ndarray) -> None:
+        """
+        Use an existing matrix (e.g. an np.memmap) as the buffer without copying
+
+        The matrix is only read; the first insert after attaching grows into a
+        fresh buffer, so a read-only memory map is never written to.
+        """
+        if vectors.dtype != np.float32 or not vectors.flags.c_contiguous:
+            self.rebuild(vectors)
+            return
+
+        self.index.reset()
+        self._buffer = vectors
+        self._norms = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), 65536):
+            chunk = vectors[start:start + 65536]
+            self._norms[start:start + len(chunk)] = np.linalg.norm(chunk, axis=1)
+        self._size = len(vectors)
+        if self._size:
+            self.index.add(self, 0)
+
+    def use_centroids(self, centroids: Optional[np.ndarray]) -> None:
+        """Hand coarse cluster centroids to indexes that can use them"""
+        if centroids is not None and self._size and hasattr(self.index, 'set_centroids'):
+            self.index.set_centroids(centroids, self)
 
     def search(self, query: List[float], k: int = 5) -> Tuple[List[int], List[float]]:
         """Find k nearest neighbors"""
-        if self.vectors is None or len(self.vectors) == 0:
+        if self._size == 0:
             return [], []
-            
-        query_array = np.array(query).reshape(1, -1)
-        distances, indices = self.nn.kneighbors(
-            query_array, 
-            n_neighbors=min(k, len(self.vectors))
-        )
+
+        indices, distances = self.search_batch(np.asarray(query).reshape(1, -1), k)
         return indices[0].tolist(), distances[0].tolist()
 
-    def _fit(self) -> None:
-        """Fit the nearest neighbors model"""
-        if self.vectors is not None and len(self.vectors) > 0:
-            self.nn.fit(self.vectors)
\ No newline at end of file
+    def search_batch(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest neighbors of every query row at once
+
+        Returns (indices, distances) arrays of shape (m, k), nearest first,
+        where k is capped at the number of stored vectors.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, self._size)
+        if self._size == 0 or len(queries) == 0 or k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+
+        return self.index.search(self, prepare_queries(queries, self.metric), k)
+
+    def _append(self, rows: np.ndarray) -> None:
+        """Copy rows into the buffer, growing it geometrically if needed"""
+        if self._buffer is not None and rows.shape[1] != self._buffer.shape[1]:
+            raise ValueError(
+                f"Vector dimension {rows.shape[1]} does not match "
+                f"store dimension {self._buffer.shape[1]}"
+            )
+
+        required = self._size + len(rows)
+        if required > self.capacity:
+            self._grow(required, rows.shape[1])
+
+        self._buffer[self._size:required] = rows
+        self._norms[self._size:required] = np.linalg.norm(rows, axis=1)
+        start, self._size = self._size, required
+        self.index.add(self, start)
+
+    def _grow(self, required: int, dim: int) -> None:
+        """Reallocate the buffer with at least double the current capacity"""
+        capacity = max(self.initial_capacity, self.capacity)
+        while capacity < required:
+            capacity *= 2
+
+        buffer = np.empty((capacity, dim), dtype=np.float32)
+        norms = np.empty(capacity, dtype=np.float32)
+        if self._size:
+            buffer[:self._size] = self._buffer[:self._size]
+            norms[:self._size] = self._norms[:self._size]
+        self._buffer = buffer
+        self._norms = norms
@@ -52,12 +52,10 @@ def analyze_with_experience():
         """
     ]
     
-    # Run analysis for each task
-    for i, requirements in enumerate(tasks, 1):
-        logger.info(f"\nExecuting Task {i}...")
-        logger.info(f"Requirements:\n{requirements}")
-        
-        result = system.run(requirements)
+    # Run all tasks concurrently; results arrive as each task finishes
+    for i, result in system.run_many(tasks, concurrency=len(tasks)):
+        logger.info(f"\nTask {i + 1} finished")
+        logger.info(f"Requirements:\n{tasks[i]}")
         
         if result and result.content:
             task = result.content
@@ -68,10 +66,10 @@ def analyze_with_experience():
                 
             if task.execution_results:
                 logger.info("\nExecution Results:")
-                for subtask_id, result in task.execution_results.items():
-                    logger.info(f"\nSubtask {subtask_id}: {result}")
+                for subtask_id, execution in task.execution_results.items():
+                    logger.info(f"\nSubtask {subtask_id}: {execution}")
         else:
-            logger.error(f"Task {i} failed to produce results")
+            logger.error(f"Task {i + 1} failed to produce results")
             
     logger.info("\nAll tasks completed. Experience pool updated and saved.")
 
@@ -1,14 +1,23 @@
 # main.py
 import os
 import logging
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, Optional, Sequence, Tuple
 from core.base_agent import BaseAgent
 from core.message import Message
 from core.task import Task, TaskStatus
+from core.run_context import RunContext
+from core.message_bus import MessageBus
+from core.stopping_policy import StoppingPolicy
 from core.experience_pool import ExperiencePool
 from core.embedding_generator import EmbeddingGenerator
+from core.embedding_cache import EmbeddingCache
+from core.embedding_batcher import EmbeddingBatcher
 from core.vector_store import VectorStore
-from core.cluster_manager import ClusterManager
+from core.cluster_manager import AsyncTemplateGenerator, ClusterManager
+from core.code_executor import DEFAULT_PRELOAD, InProcessExecutor, WorkerPool
+from core.execution_cache import ExecutionCache
+from core.dataset_registry import DatasetHandle, DatasetRegistry
 from agents.planner import Planner
 from agents.engineer_with_experience import EngineerWithExperience
 from agents.verifier import Verifier
@@ -21,69 +30,153 @@ class MultiAgentSystem:
     def __init__(self, 
                  openai_api_key: str,
                  max_iterations: int = 5,
-                 experience_pool_path: str = "experience_pool.pkl"):
+                 experience_pool_path: str = "experience_pool.pkl",
+                 embedding_cache_path: Optional[str] = None,
+                 execution_workers: int = 4,
+                 execution_timeout: float = 30.0,
+                 execution_memory_mb: Optional[int] = None,
+                 preload_modules: Sequence[str] = DEFAULT_PRELOAD,
+                 bus_workers: int = 4,
+                 bus_queue_size: int = 16,
+                 parallel_candidates: bool = False,
+                 stopping_policies: Optional[Sequence[StoppingPolicy]] = None,
+                 template_concurrency: Optional[int] = None):
+        # With parallel_candidates the max_iterations candidate pipelines
+        # of a run start together from the initial plan; checked before any
+        # worker process or thread is started
+        self.fan_out = max_iterations if parallel_candidates else 1
+        if self.fan_out > bus_queue_size:
+            raise ValueError("parallel_candidates needs max_iterations <= bus_queue_size")
+        
         # Initialize experience pool components
-        embedding_generator = EmbeddingGenerator(openai_api_key)
+        embedding_generator = EmbeddingGenerator(
+            openai_api_key,
+            cache=EmbeddingCache(path=embedding_cache_path)
+        )
         vector_store = VectorStore()
         cluster_manager = ClusterManager(openai_api_key)
+        # Optionally generate cluster templates from one event loop, with at
+        # most template_concurrency requests in flight
+        template_generator = None
+        if template_concurrency is not None:
+            template_generator = AsyncTemplateGenerator(cluster_manager, max_concurrency=template_concurrency)
         
         # Create experience pool
         self.experience_pool = ExperiencePool(
             embedding_generator=embedding_generator,
             vector_store=vector_store,
             cluster_manager=cluster_manager,
-            save_path=experience_pool_path
+            save_path=experience_pool_path,
+            incremental_clustering=True,
+            template_generator=template_generator
         )
         
         # Load existing experiences
         self.experience_pool.load()
         
-        # Initialize agents
+        # Generated code runs in warm worker processes that have already
+        # imported preload_modules (execution_workers=0 runs it in-process)
+        if execution_workers > 0:
+            self.executor = WorkerPool(
+                n_workers=execution_workers,
+                timeout=execution_timeout,
+                memory_limit_mb=execution_memory_mb,
+                preload=preload_modules
+            )
+        else:
+            self.executor = InProcessExecutor()
+            
+        # Input files loaded once and shared with every worker
+        self.datasets = DatasetRegistry()
+        # Passing code blocks, shared by every run
+        self.execution_cache = ExecutionCache()
+        
+        # Initialize agents; per-run state travels with each message's
+        # RunContext, so these agents serve every run
         self.agents: Dict[str, BaseAgent] = {
             "planner": Planner(),
             "engineer": EngineerWithExperience(self.experience_pool),
-            "verifier": Verifier(),
-            "voter": Voter(max_iterations)
+            "verifier": Verifier(self.executor, cache=self.execution_cache, datasets=self.datasets),
+            "voter": Voter(max_iterations, stopping_policies)
         }
+        # Each agent serves its own queue, so stages of concurrent runs
+        # overlap; a run whose engineer or verifier gives no response
+        # goes back to the planner
+        self.bus = MessageBus(
+            self.agents,
+            queue_size=bus_queue_size,
+            workers_per_agent=bus_workers,
+            fallback={"engineer": "planner", "verifier": "planner"}
+        )
         
     def run(self, requirements: str) -> Optional[Message]:
         """Run the multi-agent system with given requirements"""
+        result = self._run_pipeline(requirements)
+        if result is not None and result.sender_id != "system":
+            # Update clusters periodically
+            self.experience_pool.update_clusters()
+            self.experience_pool.save()
+        return result
+
+    def run_many(self,
+                 requirements_list: Sequence[str],
+                 concurrency: int = 4) -> Iterator[Tuple[int, Optional[Message]]]:
+        """
+        Run independent pipelines for several requirements at once
+
+        Up to `concurrency` runs are submitted to the message bus at once
+        (the bus admits at most `bus_queue_size`), each with its own
+        RunContext, over the shared agents and experience pool. Yields
+        (index, result) pairs in the order the runs finish. Embedding
+        requests from concurrent runs are coalesced, and clusters are
+        updated and the pool saved once after the last run.
+        """
+        requirements_list = list(requirements_list)
+        if not requirements_list:
+            return
+
+        pool = self.experience_pool
+        generator = pool.embedding_generator
+        batcher = EmbeddingBatcher(generator)
+        pool.embedding_generator = batcher
+        completed = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="pipeline") as runner:
+                futures = {
+                    runner.submit(self._run_pipeline, requirements): index
+                    for index, requirements in enumerate(requirements_list)
+                }
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result is not None and result.sender_id != "system":
+                        completed += 1
+                    yield futures[future], result
+        finally:
+            pool.embedding_generator = generator
+            batcher.close()
+            if completed:
+                pool.update_clusters()
+                pool.save()
+
+    def _run_pipeline(self, requirements: str) -> Optional[Message]:
+        """Submit a run to the message bus and wait for its output"""
+        context = RunContext(fan_out=self.fan_out)
         try:
-            current_message = Message(
+            result = self.bus.run(Message(
                 sender_id="input",
                 recipient_id="planner",
-                content=requirements
-            )
+                content=requirements,
+                context=context
+            ))
+            if result is not None:
+                logger.info("Analysis completed successfully")
+                if context.iterations_saved:
+                    logger.info(
+                        f"Stopped after {context.iterations} candidates ({context.stop_reason}), "
+                        f"{context.iterations_saved} iterations saved"
+                    )
+            return result
             
-            while True:
-                if current_message.recipient_id == "output":
-                    logger.info("Analysis completed successfully")
-                    # Update clusters periodically
-                    self.experience_pool.update_clusters()
-                    self.experience_pool.save()
-                    return current_message
-                    
-                agent = self.agents.get(current_message.recipient_id)
-                if not agent:
-                    logger.error(f"Unknown agent: {current_message.recipient_id}")
-                    break
-                    
-                logger.info(f"Processing message: {current_message}")
-                next_message = agent.process(current_message)
-                
-                if not next_message:
-                    logger.error(f"Agent {current_message.recipient_id} failed to produce response")
-                    if current_message.recipient_id in ["engineer", "verifier"]:
-                        next_message = Message(
-                            sender_id=current_message.recipient_id,
-                            recipient_id="planner",
-                            content=current_message.content
-                        )
-                    else:
-                        break
-                
-                current_message = next_message
-                
         except Exception as e:
             logger.error(f"System error: {str(e)}")
             error_task = Task(
@@ -95,10 +188,19 @@ class MultiAgentSystem:
             return Message(
                 sender_id="system",
                 recipient_id="output",
-                content=error_task
+                content=error_task,
+                context=context
             )
-            
-        return None
+
+    def register_dataset(self, path: str, name: Optional[str] = None) -> DatasetHandle:
+        """Publish a CSV file to generated code as load_dataset(name)"""
+        return self.datasets.register(path, name)
+
+    def close(self) -> None:
+        """Stop the agents, the code execution workers and release shared datasets"""
+        self.bus.close()
+        self.executor.close()
+        self.datasets.close()
 
 def main():
     # Get OpenAI API key from environment
@@ -119,7 +221,10 @@ def main():
     5. Identify key insights
     """
     
-    result = system.run(requirements)
+    try:
+        result = system.run(requirements)
+    finally:
+        system.close()
     
     if result:
         logger.info(f"Final result: {result.content}")
@@ -2,6 +2,7 @@
 import pytest
 from core.base_agent import BaseAgent
 from core.message import Message
+from core.run_context import RunContext
 
 class TestAgent(BaseAgent):
     """Concrete implementation of BaseAgent for testing"""
@@ -20,12 +21,33 @@ def test_receive_message():
     assert len(agent.messages) == 1
     assert agent.messages[0] == message
 
+def test_receive_message_is_bounded():
+    agent = TestAgent("test_agent", max_messages=3)
+    for i in range(5):
+        agent.receive_message(Message("sender", "test_agent", i))
+    assert [message.content for message in agent.messages] == [2, 3, 4]
+
+def test_receive_message_records_in_run_context():
+    agent = TestAgent("test_agent")
+    context = RunContext(max_messages=2)
+    for i in range(3):
+        agent.receive_message(Message("sender", "test_agent", i, context=context))
+    assert agent.messages == []
+    assert [message.content for message in context.messages] == [1, 2]
+
 def test_send_message():
     agent = TestAgent("test_agent")
     message = agent.send_message("test content", "recipient")
     assert message.sender_id == "test_agent"
     assert message.recipient_id == "recipient"
     assert message.content == "test content"
+    assert message.context is None
+
+def test_send_message_keeps_context():
+    agent = TestAgent("test_agent")
+    context = RunContext()
+    message = agent.send_message("test content", "recipient", context)
+    assert message.context is context
 
 def test_process_message():
     agent = TestAgent("test_agent")
@@ -1,8 +1,11 @@
 # tests/test_cluster_manager.py
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+import openai
+from unittest.mock import patch, MagicMock, AsyncMock
 import numpy as np
-from core.cluster_manager import ClusterManager
+from sklearn.metrics import silhouette_score
+from core.cluster_manager import ClusterManager, AsyncTemplateGenerator
 from core.experience import Experience
 from core.cluster_template import ClusterTemplate
 
@@ -60,4 +63,161 @@ def test_generate_template_api_error(cluster_manager):
         mock_create.side_effect = Exception("API Error")
         
         with pytest.raises(RuntimeError):
-            cluster_manager.generate_template(experiences)
\ No newline at end of file
+            cluster_manager.generate_template(experiences)
+
+def test_async_generate_template(cluster_manager):
+    generator = AsyncTemplateGenerator(cluster_manager, max_concurrency=2, base_delay=0.0)
+    experiences = [Experience("How to load CSV?", "def load_csv(): pass")]
+    response = MagicMock(choices=[MagicMock(message=MagicMock(
+        content="Load Data Template ### def load_file(path: str): pass"
+    ))])
+    
+    with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_acreate:
+        mock_acreate.side_effect = [openai.error.RateLimitError("Rate limit reached"), response]
+        template = asyncio.run(generator.generate_template(experiences))
+    
+    assert template.question_template == "Load Data Template"
+    assert template.examples == experiences
+    assert mock_acreate.call_count == 2
+
+def test_async_generate_template_errors(cluster_manager):
+    generator = AsyncTemplateGenerator(cluster_manager)
+    with pytest.raises(ValueError):
+        asyncio.run(generator.generate_template([]))
+    
+    with patch('openai.ChatCompletion.acreate', new_callable=AsyncMock) as mock_acreate:
+        mock_acreate.side_effect = Exception("API Error")
+        with pytest.raises(RuntimeError):
+            asyncio.run(generator.generate_template([Experience("q", "f")]))
+
+def test_partial_cluster_waits_for_enough_samples(cluster_manager):
+    labels = cluster_manager.partial_cluster(np.array([[1.0, 0.0]]))
+    assert labels.tolist() == [0]
+    assert not cluster_manager.is_fitted
+
+def test_partial_cluster_updates_with_new_embeddings_only():
+    manager = ClusterManager("fake-api-key", n_clusters=2, random_state=0)
+    first = np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [0.1, 0.9]], dtype=np.float32)
+    labels = manager.partial_cluster(first)
+    assert manager.is_fitted
+    assert labels[0] == labels[1] != labels[2] == labels[3]
+    
+    seen_before = manager.online_kmeans.n_steps_
+    new_labels = manager.partial_cluster(np.array([[0.95, 0.05]], dtype=np.float32))
+    assert new_labels.tolist() == [labels[0]]
+    assert manager.online_kmeans.n_steps_ == seen_before + 1
+    assert manager.centroids.shape == (2, 2)
+
+def test_cluster_state_round_trip():
+    manager = ClusterManager("fake-api-key", n_clusters=2, random_state=0)
+    manager.partial_cluster(np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32))
+    
+    restored = ClusterManager("fake-api-key", n_clusters=2)
+    restored.set_state(manager.get_state())
+    assert restored.is_fitted
+    assert np.allclose(restored.centroids, manager.centroids)
+
+def make_blobs(sizes, dim=4, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = 10.0 * np.eye(len(sizes), dim)
+    return np.vstack([
+        center + 0.1 * rng.normal(size=(size, dim)) for center, size in zip(centers, sizes)
+    ]).astype(np.float32)
+
+def test_select_n_clusters_finds_blob_count():
+    manager = ClusterManager("fake-api-key", auto_k=True, max_clusters=6, random_state=0)
+    assert manager.select_n_clusters(make_blobs([40, 40, 40])) == 3
+    assert manager.selected_k == 3
+
+def test_select_n_clusters_uses_bounded_sample():
+    manager = ClusterManager("fake-api-key", auto_k=True, max_clusters=4,
+                             selection_sample_size=50, random_state=0)
+    with patch("core.cluster_manager.silhouette_score", wraps=silhouette_score) as score:
+        manager.select_n_clusters(make_blobs([300, 300]))
+    assert all(len(call.args[0]) == 50 for call in score.call_args_list)
+
+def test_adaptive_cluster_merges_small_clusters():
+    manager = ClusterManager("fake-api-key", auto_k=True, max_clusters=4,
+                             min_cluster_size=5, random_state=0)
+    embeddings = make_blobs([30, 30, 2])
+    labels = manager.cluster(embeddings)
+    
+    sizes = np.bincount(labels)
+    assert sizes.min() >= 5
+    assert set(labels.tolist()) == set(range(len(sizes)))
+    assert manager.centroids.shape == (len(sizes), embeddings.shape[1])
+
+def test_adaptive_cluster_small_dataset():
+    manager = ClusterManager("fake-api-key", auto_k=True, min_cluster_size=3)
+    labels = manager.cluster(make_blobs([2]))
+    assert labels.tolist() == [0, 0]
+    assert manager.centroids.shape == (1, 4)
+
+def test_partial_cluster_selects_k_on_first_batch():
+    manager = ClusterManager("fake-api-key", n_clusters=2, auto_k=True,
+                             max_clusters=6, random_state=0)
+    manager.partial_cluster(make_blobs([30, 30, 30]))
+    assert manager.online_kmeans.n_clusters == 3
+
+def test_partial_cluster_merges_small_clusters():
+    manager = ClusterManager("fake-api-key", n_clusters=2, auto_k=True, max_clusters=4,
+                             min_cluster_size=5, random_state=0)
+    labels = manager.partial_cluster(make_blobs([30, 30, 2]))
+    
+    sizes = np.bincount(labels)
+    assert sizes.min() >= 5
+    assert manager.selected_k > len(sizes)
+    assert manager.online_kmeans.n_clusters == len(sizes)
+    # Later batches are assigned to the merged clusters
+    more = manager.partial_cluster(make_blobs([3, 3, 3], seed=1))
+    assert set(more.tolist()) <= set(range(len(sizes)))
+
+def make_cluster(n_per_group, groups):
+    rng = np.random.default_rng(0)
+    experiences = []
+    for group, center in enumerate(groups):
+        for i in range(n_per_group):
+            embedding = np.asarray(center) + 0.01 * rng.normal(size=len(center))
+            experiences.append(Experience(
+                f"group {group} question {i}",
+                f"def f_{group}_{i}():\n" + "    pass\n" * 20,
+                embedding=embedding.tolist()
+            ))
+    return experiences
+
+def test_select_exemplars_bounded_and_diverse(cluster_manager):
+    cluster_manager.max_examples = 4
+    experiences = make_cluster(50, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+    
+    exemplars = cluster_manager.select_exemplars(experiences)
+    
+    assert len(exemplars) == 4
+    groups = {exp.question.split()[1] for exp in exemplars}
+    assert groups == {"0", "1", "2"}
+
+def test_select_exemplars_starts_with_medoid(cluster_manager):
+    experiences = [
+        Experience("left", "f", embedding=[-1.0, 0.0]),
+        Experience("middle", "f", embedding=[0.1, 0.0]),
+        Experience("right", "f", embedding=[1.0, 0.0])
+    ]
+    assert cluster_manager.select_exemplars(experiences)[0].question == "middle"
+
+def test_select_exemplars_without_embeddings(cluster_manager):
+    cluster_manager.max_examples = 2
+    experiences = [Experience(f"q{i}", "f") for i in range(5)]
+    assert cluster_manager.select_exemplars(experiences) == experiences[:2]
+
+def test_template_prompt_size_is_bounded(cluster_manager):
+    cluster_manager.prompt_char_budget = 1000
+    small = cluster_manager._format_template_prompt(make_cluster(5, [[1.0, 0.0]]))
+    large = cluster_manager._format_template_prompt(make_cluster(2000, [[1.0, 0.0]]))
+    
+    assert len(large) < 1000 + 300
+    assert len(large) <= len(small) + 300
+
+def test_template_prompt_truncates_oversized_example(cluster_manager):
+    cluster_manager.prompt_char_budget = 100
+    prompt = cluster_manager._format_template_prompt([Experience("q", "x" * 10000)])
+    assert "Example 1" in prompt
+    assert len(prompt) < 500
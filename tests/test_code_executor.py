@@ -0,0 +1,234 @@
+# tests/test_code_executor.py
+import sys
+import threading
+import time
+from unittest.mock import patch
+import pytest
+from core.code_executor import (
+    MAX_OUTPUT_CHARS, InProcessExecutor, WorkerPool, bounded_repr, execute_code,
+    import_time_saved, imported_modules, resource, value_size
+)
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(n_workers=2, timeout=2.0, max_tasks_per_worker=3)
+    yield pool
+    pool.close()
+
+def test_execute_code_success():
+    result = execute_code("x = 1 + 1")
+    assert result["status"] == "success"
+    assert result["variables"] == ["x"]
+    assert "2" in result["output"]
+
+def test_execute_code_failure():
+    result = execute_code("1 / 0")
+    assert result["status"] == "failed"
+    assert "division by zero" in result["error"]
+    assert "ZeroDivisionError" in result["traceback"]
+
+def test_in_process_executor_run_many():
+    results = InProcessExecutor().run_many({"a": "x = 1", "b": "raise ValueError('bad')"})
+    assert results["a"]["status"] == "success"
+    assert results["b"]["status"] == "failed"
+
+def test_worker_pool_runs_code(pool):
+    result = pool.run("x = 6 * 7")
+    assert result["status"] == "success"
+    assert "42" in result["output"]
+    
+    result = pool.run("import nonexistent_module")
+    assert result["status"] == "failed"
+    assert "traceback" in result
+
+def test_worker_pool_runs_blocks_in_parallel(pool):
+    start = time.monotonic()
+    results = pool.run_many({
+        "1": "import time\ntime.sleep(0.5)\nx = 1",
+        "2": "import time\ntime.sleep(0.5)\ny = 2"
+    })
+    assert time.monotonic() - start < 0.9
+    assert "x" in results["1"]["variables"]
+    assert "y" in results["2"]["variables"]
+
+def test_worker_pool_timeout_replaces_worker():
+    with WorkerPool(n_workers=1, timeout=0.3) as pool:
+        result = pool.run("while True:\n    pass")
+        assert result["status"] == "failed"
+        assert "timed out" in result["error"]
+        assert pool.stats["timeouts"] == 1
+        
+        # The replacement worker serves the next block
+        assert pool.run("x = 1")["status"] == "success"
+
+def test_worker_pool_survives_worker_crash(pool):
+    result = pool.run("import os\nos._exit(3)")
+    assert result["status"] == "failed"
+    assert "exit code 3" in result["error"]
+    assert pool.stats["crashes"] == 1
+    assert pool.run("x = 1")["status"] == "success"
+
+def test_worker_pool_reports_unpicklable_input(pool):
+    result = pool.submit("x = 1", context={"lock": threading.Lock()}).result(timeout=10)
+    assert result["status"] == "failed"
+    assert "Could not send" in result["error"]
+    # The dispatcher and its worker keep serving blocks
+    assert pool.run("x = 1")["status"] == "success"
+    assert pool.stats["crashes"] == 0
+
+def test_worker_pool_resolves_jobs_when_respawn_fails():
+    with WorkerPool(n_workers=1, timeout=0.3) as pool:
+        with patch.object(pool, "_spawn", side_effect=OSError("no more processes")):
+            assert "timed out" in pool.submit("while True:\n    pass").result(timeout=10)["error"]
+            result = pool.submit("x = 1").result(timeout=10)
+            assert result["status"] == "failed"
+            assert "no more processes" in result["error"]
+        # A worker is started again once spawning works
+        assert pool.run("x = 1")["status"] == "success"
+
+def test_worker_pool_isolates_state(pool):
+    pool.run("import builtins\nbuiltins.leaked = 1")
+    assert "'x': False" in execute_code("import builtins\nx = hasattr(builtins, 'leaked')")["output"]
+
+def test_worker_pool_recycles_workers():
+    with WorkerPool(n_workers=1, max_tasks_per_worker=2) as pool:
+        pids = [pool.run("import os\npid = os.getpid()")["output"] for _ in range(4)]
+        assert pids[0] == pids[1] != pids[2] == pids[3]
+        assert pool.stats["recycled"] == 2
+
+@pytest.mark.skipif(resource is None, reason="resource module not available")
+def test_worker_pool_memory_limit():
+    with WorkerPool(n_workers=1, memory_limit_mb=512) as pool:
+        result = pool.run("data = bytearray(2 * 1024 ** 3)")
+        assert result["status"] == "failed"
+        assert pool.run("x = 1")["status"] == "success"
+
+def test_closed_pool_rejects_work():
+    pool = WorkerPool(n_workers=1)
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.submit("x = 1")
+
+def test_imported_modules():
+    code = "import pandas as pd\nfrom matplotlib import pyplot\nfrom . import local\ndef f():\n    import json"
+    assert imported_modules(code) == {"pandas", "matplotlib", "json"}
+    assert imported_modules("invalid syntax") == set()
+
+def test_import_time_saved_counts_preloaded_imports():
+    timings = {"pandas": 0.5, "matplotlib.pyplot": 0.25}
+    assert import_time_saved("import pandas as pd", timings) == 0.5
+    assert import_time_saved("import matplotlib.pyplot as plt\nimport pandas", timings) == 0.75
+    assert import_time_saved("import json", timings) == 0.0
+
+def test_warm_pool_reports_import_time_saved():
+    with WorkerPool(n_workers=1, preload=["email.mime.text", "not_a_real_module"]) as pool:
+        warm = pool.run("from email.mime.text import MIMEText\nx = 1")
+        cold = pool.run("import json\ny = 1")
+        assert warm["status"] == cold["status"] == "success"
+        assert warm["import_time_saved"] > 0
+        assert cold["import_time_saved"] == 0
+        assert pool.stats["import_time_saved"] == warm["import_time_saved"]
+
+def test_warm_pool_uses_fresh_namespaces():
+    with WorkerPool(n_workers=1, preload=["json"]) as pool:
+        pool.run("import json\nstate = {'leak': 1}")
+        result = pool.run("x = 'state' in dir()")
+        assert "'x': False" in result["output"]
+
+def test_warm_pool_resets_matplotlib_between_blocks():
+    pytest.importorskip("matplotlib")
+    code = "import matplotlib\nimport matplotlib.pyplot as plt\nplt.figure()\nbackend = matplotlib.get_backend().lower()\nfigures = len(plt.get_fignums())"
+    with WorkerPool(n_workers=1, preload=["matplotlib.pyplot"]) as pool:
+        for _ in range(2):
+            output = pool.run(code)["output"]
+            assert "'figures': 1" in output
+            assert "'backend': 'agg'" in output
+
+def test_execute_code_reports_metrics():
+    result = execute_code("import numpy as np\ndata = np.zeros(1_000_000)\ntotal = sum(range(100000))")
+    metrics = result["metrics"]
+    assert metrics["wall_time"] > 0
+    assert metrics["cpu_time"] >= 0
+    assert metrics["output_bytes"] >= 8_000_000
+    # Not measured in-process, where other threads share the high-water mark
+    assert metrics["peak_rss"] is None
+    
+    measured = execute_code("import numpy as np\ndata = np.ones(1_000_000)", measure_rss=True)["metrics"]
+    assert measured["peak_rss"] is None or measured["peak_rss"] > 8_000_000
+    
+    failed = execute_code("1 / 0")
+    assert failed["metrics"]["output_bytes"] == 0
+    assert failed["metrics"]["wall_time"] >= 0
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="VmHWM is Linux only")
+def test_worker_pool_measures_peak_rss(pool):
+    metrics = pool.run("import numpy as np\ndata = np.ones(1_000_000)", export=False)["metrics"]
+    assert metrics["peak_rss"] > 8_000_000
+
+def test_preload_time_does_not_count_against_timeout(tmp_path, monkeypatch):
+    (tmp_path / "slow_import.py").write_text("import time\ntime.sleep(1.0)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    with WorkerPool(n_workers=1, timeout=0.5, preload=["slow_import"], start_method="spawn",
+                    max_tasks_per_worker=1) as pool:
+        # The second block runs on a freshly respawned worker
+        results = [pool.run("x = 1", export=False) for _ in range(2)]
+    assert [result["status"] for result in results] == ["success", "success"]
+    assert pool.stats["timeouts"] == 0
+
+def test_worker_pool_start_timeout(tmp_path, monkeypatch):
+    (tmp_path / "slow_import.py").write_text("import time\ntime.sleep(5.0)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    with WorkerPool(n_workers=1, preload=["slow_import"], start_method="spawn", start_timeout=0.5) as pool:
+        result = pool.run("x = 1")
+    assert result["status"] == "failed"
+    assert "did not start" in result["error"]
+
+def test_cpu_time_excludes_other_threads():
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            pass
+
+    busy = threading.Thread(target=spin)
+    busy.start()
+    try:
+        metrics = execute_code("import time\ntime.sleep(0.3)")["metrics"]
+    finally:
+        stop.set()
+        busy.join()
+    assert metrics["wall_time"] >= 0.3
+    assert metrics["cpu_time"] < 0.1
+
+def test_execute_code_output_is_bounded():
+    result = execute_code("rows = list(range(100000))\ntext = 'x' * 100000")
+    assert len(result["output"]) <= MAX_OUTPUT_CHARS
+    assert "..." in result["output"]
+    assert len(execute_code("x = 1", max_output=5)["output"]) <= 5
+
+def test_bounded_repr_truncates_large_objects():
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame({"a": range(100000)})
+    assert len(bounded_repr({"frame": frame})) <= MAX_OUTPUT_CHARS
+    assert value_size(frame) >= 800000
+
+def test_worker_pool_timeout_reports_wall_time():
+    with WorkerPool(n_workers=1, timeout=0.2) as pool:
+        result = pool.run("while True:\n    pass")
+    assert result["metrics"]["wall_time"] == pytest.approx(0.2)
+
+def test_execute_code_without_exports():
+    result = execute_code("x = 1", export=False)
+    assert result["status"] == "success"
+    assert "exports" not in result
+    assert result["metrics"]["output_bytes"] > 0
+
+def test_worker_pool_skips_exports_when_not_needed(pool):
+    assert "exports" in pool.run("x = 1")
+    assert "exports" not in pool.run("x = 1", export=False)
+
+def test_in_process_executor_copies_inputs():
+    upstream = {"data": [1]}
+    result = InProcessExecutor().run("data.append(2)\nn = len(data)", [upstream])
+    assert result["status"] == "success"
+    assert upstream == {"data": [1]}
@@ -0,0 +1,147 @@
+# tests/test_dataset_registry.py
+import os
+import pickle
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from agents.verifier import Verifier
+from core.code_executor import WorkerPool
+from core.dataset_registry import DatasetRegistry, SharedDataFrame
+from core.message import Message
+from core.task import Task
+
+SURVEY = os.path.join(os.path.dirname(__file__), "data", "customer_survey.csv")
+
+def bump_mtime(path):
+    """Make a rewritten file look newer even on coarse-grained filesystems"""
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+@pytest.fixture
+def registry():
+    registry = DatasetRegistry()
+    yield registry
+    registry.close()
+
+def test_load_matches_read_csv(registry):
+    registry.register(SURVEY, "survey")
+    frame = registry.load("survey")
+    expected = pd.read_csv(SURVEY)
+    
+    assert isinstance(frame, SharedDataFrame)
+    assert list(frame.columns) == list(expected.columns)
+    assert np.array_equal(frame["purchase_amount"].to_numpy(), expected["purchase_amount"].to_numpy(), equal_nan=True)
+    assert frame["feedback"].astype(str).tolist() == expected["feedback"].astype(str).tolist()
+
+def test_load_by_path(registry):
+    registry.register(SURVEY)
+    assert len(registry.load(SURVEY)) == len(registry.load("customer_survey.csv"))
+
+def test_columns_are_read_only_views(registry):
+    registry.register(SURVEY, "survey")
+    frame = registry.load("survey")
+    with pytest.raises(ValueError):
+        frame["age"].to_numpy()[0] = 0
+    
+    # Changes to one frame are not seen by the next caller
+    frame["extra"] = 1
+    frame.loc[0, "age"] = 0
+    fresh = registry.load("survey")
+    assert "extra" not in fresh.columns
+    assert fresh.loc[0, "age"] == 35
+
+def test_register_reads_each_file_once(registry, tmp_path):
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(path, index=False)
+    with patch("core.dataset_registry.pd.read_csv", wraps=pd.read_csv) as read_csv:
+        first = registry.register(str(path))
+        assert registry.register(str(path)) is first
+        assert read_csv.call_count == 1
+        
+        # A changed file is published again and the old block released
+        pd.DataFrame({"x": [4, 5]}).to_csv(path, index=False)
+        bump_mtime(path)
+        registry.register(str(path))
+        assert read_csv.call_count == 2
+    assert registry.load("data.csv")["x"].tolist() == [4, 5]
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=first.shm_name)
+
+def test_unmodified_frame_pickles_as_reference(registry):
+    registry.register(SURVEY, "survey")
+    frame = registry.load("survey")
+    reference = pickle.dumps(frame)
+    assert len(reference) < 1024
+    assert pickle.loads(reference).equals(frame)
+    
+    frame["extra"] = 1
+    restored = pickle.loads(pickle.dumps(frame))
+    assert type(restored) is pd.DataFrame
+    assert "extra" in restored.columns
+
+def test_close_unlinks_blocks():
+    registry = DatasetRegistry()
+    handle = registry.register(SURVEY)
+    registry.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=handle.shm_name)
+
+def test_workers_attach_to_published_dataset(registry):
+    registry.register(SURVEY, "survey")
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[
+            {"id": "1", "description": "load"},
+            {"id": "2", "description": "summarize", "depends_on": ["1"]}
+        ]
+    )
+    task.add_code_block("1", "data = load_dataset('survey')\nwritable = data['age'].to_numpy().flags.writeable")
+    task.add_code_block("2", "mean_age = float(data['age'].mean())")
+    
+    with WorkerPool(n_workers=2) as pool:
+        Verifier(executor=pool, datasets=registry).process(Message("engineer", "verifier", task))
+    
+    assert "'writable': False" in task.execution_results["1"]["output"]
+    expected = pd.read_csv(SURVEY)["age"].mean()
+    assert f"'mean_age': {float(expected)}" in task.execution_results["2"]["output"]
+
+def test_workers_drop_replaced_dataset_blocks(registry, tmp_path):
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(path, index=False)
+    code = (
+        "from core import dataset_registry\n"
+        "total = int(load_dataset('data')['x'].sum())\n"
+        "attached = sorted(dataset_registry._attached)"
+    )
+    
+    with WorkerPool(n_workers=1) as pool:
+        old = registry.register(str(path), "data")
+        first = pool.run(code, context={"load_dataset": registry.loader()})
+        pd.DataFrame({"x": [10]}).to_csv(path, index=False)
+        bump_mtime(path)
+        new = registry.register(str(path), "data")
+        second = pool.run(code, context={"load_dataset": registry.loader()})
+    
+    assert f"'attached': ['{old.shm_name}']" in first["output"]
+    assert "'total': 10" in second["output"]
+    # The worker unmapped the block of the previous version
+    assert f"'attached': ['{new.shm_name}']" in second["output"]
+
+def test_cache_key_depends_on_datasets(registry, tmp_path):
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"x": [1, 2, 3]}).to_csv(path, index=False)
+    registry.register(str(path), "data")
+    verifier = Verifier(datasets=registry)
+    task = Task(task_id="test", description="Test task", subtasks=[{"id": "1", "description": "sum"}])
+    task.add_code_block("1", "total = int(load_dataset('data')['x'].sum())")
+    verifier.process(Message("engineer", "verifier", task))
+    assert "'total': 6" in task.execution_results["1"]["output"]
+    
+    pd.DataFrame({"x": [10]}).to_csv(path, index=False)
+    bump_mtime(path)
+    registry.register(str(path), "data")
+    verifier.process(Message("engineer", "verifier", task))
+    assert "'total': 10" in task.execution_results["1"]["output"]
@@ -0,0 +1,119 @@
+# tests/test_embedding_batcher.py
+import threading
+import time
+import pytest
+from core.embedding_batcher import EmbeddingBatcher
+
+class FakeEmbeddingBackend:
+    """Local stand-in for the embedding API: one request in flight at a time"""
+    model = "fake-embedding"
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.round_trips = 0
+        self._connection = threading.Lock()
+
+    def _embed(self, text):
+        return [float(len(text)), 1.0]
+
+    def generate(self, text):
+        return self.generate_batch([text])[0]
+
+    def generate_batch(self, texts):
+        with self._connection:
+            time.sleep(self.latency)
+            self.round_trips += 1
+            return [self._embed(text) for text in texts]
+
+def run_concurrently(generate, texts):
+    results = [None] * len(texts)
+
+    def worker(i):
+        results[i] = generate(texts[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(texts))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+def test_batcher_returns_each_callers_embedding():
+    batcher = EmbeddingBatcher(FakeEmbeddingBackend(), max_wait=0.05)
+    results, _ = run_concurrently(batcher.generate, ["a", "bb", "ccc"])
+    batcher.close()
+    assert results == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+
+def test_batcher_reduces_round_trips_and_latency():
+    texts = [f"subtask {i}" for i in range(16)]
+
+    direct = FakeEmbeddingBackend()
+    direct_results, direct_elapsed = run_concurrently(direct.generate, texts)
+
+    backend = FakeEmbeddingBackend()
+    batcher = EmbeddingBatcher(backend, max_batch_size=16, max_wait=0.02)
+    batched_results, batched_elapsed = run_concurrently(batcher.generate, texts)
+    batcher.close()
+
+    assert batched_results == direct_results
+    assert direct.round_trips == 16
+    assert backend.round_trips < 16
+    assert batcher.stats["requests"] == 16
+    assert batcher.stats["round_trips"] == backend.round_trips
+    assert batched_elapsed < direct_elapsed
+
+def test_batcher_respects_max_batch_size():
+    backend = FakeEmbeddingBackend(latency=0.0)
+    batcher = EmbeddingBatcher(backend, max_batch_size=2, max_wait=0.05)
+    futures = [batcher.submit(str(i)) for i in range(5)]
+    assert [future.result() for future in futures] == [[1.0, 1.0]] * 5
+    batcher.close()
+    assert backend.round_trips >= 3
+
+def test_batcher_propagates_errors():
+    class FailingBackend(FakeEmbeddingBackend):
+        def generate_batch(self, texts):
+            raise RuntimeError("Failed to generate embeddings: API Error")
+
+    batcher = EmbeddingBatcher(FailingBackend())
+    with pytest.raises(RuntimeError):
+        batcher.generate("text")
+    batcher.close()
+
+def test_batcher_fails_batch_on_missing_embeddings():
+    backend = FakeEmbeddingBackend(latency=0.0)
+    backend.generate_batch = lambda texts: [[1.0, 0.0]] * (len(texts) - 1)
+    batcher = EmbeddingBatcher(backend, max_wait=0.05)
+    futures = [batcher.submit(f"text {i}") for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="vectors for"):
+            future.result(timeout=5)
+    batcher.close()
+
+def test_submit_after_close():
+    batcher = EmbeddingBatcher(FakeEmbeddingBackend())
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("text")
+
+def test_close_resolves_or_rejects_every_submit():
+    batcher = EmbeddingBatcher(FakeEmbeddingBackend(latency=0.001), max_wait=0.001)
+    futures = []
+
+    def submitter(i):
+        for j in range(200):
+            try:
+                futures.append(batcher.submit(f"text {i} {j}"))
+            except RuntimeError:
+                return
+
+    threads = [threading.Thread(target=submitter, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.005)
+    batcher.close()
+    for thread in threads:
+        thread.join()
+    # Nothing was queued behind the stop sentinel
+    assert all(future.done() for future in futures)
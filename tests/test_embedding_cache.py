@@ -0,0 +1,55 @@
+# tests/test_embedding_cache.py
+import pytest
+from core.embedding_cache import EmbeddingCache
+
+def test_get_miss_and_hit():
+    cache = EmbeddingCache()
+    assert cache.get("model", "text") is None
+    cache.put("model", "text", [0.5, 0.25])
+    assert cache.get("model", "text") == [0.5, 0.25]
+    assert cache.stats["misses"] == 1
+    assert cache.stats["hits"] == 1
+
+def test_put_returns_stored_vector():
+    cache = EmbeddingCache()
+    stored = cache.put("model", "text", [0.1, 1 / 3])
+    assert stored == cache.get("model", "text")
+    assert stored != [0.1, 1 / 3]
+
+def test_keys_include_model():
+    cache = EmbeddingCache()
+    cache.put("model-a", "text", [1.0])
+    assert cache.get("model-b", "text") is None
+
+def test_make_key_hashes_text():
+    model, digest = EmbeddingCache.make_key("model", "text")
+    assert model == "model"
+    assert len(digest) == 64
+    assert "text" not in digest
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("model", "a", [1.0])
+    cache.put("model", "b", [2.0])
+    cache.get("model", "a")  # "b" becomes least recently used
+    cache.put("model", "c", [3.0])
+    
+    assert len(cache) == 2
+    assert cache.stats["evictions"] == 1
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == [1.0]
+
+def test_disk_tier_survives_eviction_and_restart(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    cache = EmbeddingCache(max_entries=1, path=str(path))
+    cache.put("model", "a", [1.0, 2.0])
+    cache.put("model", "b", [3.0, 4.0])
+    
+    # "a" was evicted from memory but is still on disk
+    assert cache.get("model", "a") == [1.0, 2.0]
+    assert cache.stats["disk_hits"] == 1
+    cache.close()
+    
+    reopened = EmbeddingCache(path=str(path))
+    assert reopened.get("model", "b") == [3.0, 4.0]
+    reopened.close()
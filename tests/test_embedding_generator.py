@@ -1,8 +1,11 @@
 # tests/test_embedding_generator.py
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+import openai
+from unittest.mock import patch, MagicMock, AsyncMock
 import numpy as np
-from core.embedding_generator import EmbeddingGenerator
+from core.embedding_generator import EmbeddingGenerator, AsyncEmbeddingGenerator
+from core.embedding_cache import EmbeddingCache
 
 @pytest.fixture
 def embedding_generator():
@@ -55,4 +58,96 @@ def test_generate_error(embedding_generator):
         mock_create.side_effect = Exception("API Error")
         
         with pytest.raises(RuntimeError):
-            embedding_generator.generate("test text")
\ No newline at end of file
+            embedding_generator.generate("test text")
+
+@pytest.fixture
+def cached_generator():
+    return EmbeddingGenerator("fake-api-key", cache=EmbeddingCache(max_entries=2))
+
+def test_generate_uses_cache(cached_generator):
+    with patch('openai.Embedding.create') as mock_create:
+        mock_create.return_value = {'data': [{'embedding': [0.5, 0.25]}]}
+        
+        first = cached_generator.generate("same text")
+        second = cached_generator.generate("same text")
+        
+        assert first == second == [0.5, 0.25]
+        mock_create.assert_called_once()
+        assert cached_generator.cache.stats["hits"] == 1
+        assert cached_generator.cache.stats["misses"] == 1
+
+def test_cache_miss_returns_stored_precision(cached_generator):
+    with patch('openai.Embedding.create') as mock_create:
+        mock_create.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 1 / 3]} for _ in (input if isinstance(input, list) else [input])]
+        }
+        
+        miss = cached_generator.generate("text")
+        hit = cached_generator.generate("text")
+        batch_miss = cached_generator.generate_batch(["other"])[0]
+        batch_hit = cached_generator.generate_batch(["other"])[0]
+    
+    # The same text embeds identically on the first call and on later ones
+    assert miss == hit == batch_miss == batch_hit
+    assert miss == np.asarray([0.1, 1 / 3], dtype=np.float32).tolist()
+
+def test_generate_batch_requests_only_misses(cached_generator):
+    cached_generator.cache.put(cached_generator.model, "cached", [1.0, 0.0])
+    with patch('openai.Embedding.create') as mock_create:
+        mock_create.return_value = {'data': [{'embedding': [0.0, 1.0]}]}
+        
+        embeddings = cached_generator.generate_batch(["cached", "new", "new"])
+        
+        assert embeddings == [[1.0, 0.0], [0.0, 1.0], [0.0, 1.0]]
+        mock_create.assert_called_once_with(
+            model="text-embedding-ada-002",
+            input=["new"]
+        )
+
+def test_async_generate_bounded_concurrency():
+    generator = AsyncEmbeddingGenerator("fake-api-key", max_concurrency=2)
+    in_flight = []
+    peak = []
+
+    async def fake_acreate(model, input):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return {'data': [{'embedding': [float(len(text))]} for text in input]}
+
+    async def run():
+        return await asyncio.gather(*(generator.generate("x" * i) for i in range(1, 7)))
+
+    with patch('openai.Embedding.acreate', side_effect=fake_acreate):
+        embeddings = asyncio.run(run())
+
+    assert embeddings == [[float(i)] for i in range(1, 7)]
+    assert max(peak) == 2
+
+def test_async_generate_batch_retries_rate_limit():
+    generator = AsyncEmbeddingGenerator("fake-api-key", base_delay=0.0)
+    responses = [
+        openai.error.RateLimitError("Rate limit reached"),
+        {'data': [{'embedding': [0.1]}, {'embedding': [0.2]}]}
+    ]
+    with patch('openai.Embedding.acreate', new_callable=AsyncMock) as mock_acreate:
+        mock_acreate.side_effect = responses
+        embeddings = asyncio.run(generator.generate_batch(["a", "b"]))
+
+    assert embeddings == [[0.1], [0.2]]
+    assert mock_acreate.call_count == 2
+
+def test_async_generate_uses_cache():
+    generator = AsyncEmbeddingGenerator("fake-api-key", cache=EmbeddingCache())
+    generator.cache.put(generator.model, "cached", [1.0])
+    with patch('openai.Embedding.acreate', new_callable=AsyncMock) as mock_acreate:
+        assert asyncio.run(generator.generate("cached")) == [1.0]
+    mock_acreate.assert_not_called()
+
+def test_async_generate_error():
+    generator = AsyncEmbeddingGenerator("fake-api-key")
+    with patch('openai.Embedding.acreate', new_callable=AsyncMock) as mock_acreate:
+        mock_acreate.side_effect = Exception("API Error")
+        with pytest.raises(RuntimeError):
+            asyncio.run(generator.generate("test text"))
@@ -3,14 +3,16 @@ import pytest
 from unittest.mock import MagicMock, patch
 from core.message import Message
 from core.task import Task, TaskStatus
+from core.run_context import RunContext
 from core.experience import Experience
 from core.experience_pool import ExperiencePool
+from core.cluster_template import ClusterTemplate
 from agents.engineer_with_experience import EngineerWithExperience
 
 @pytest.fixture
 def mock_experience_pool():
     pool = MagicMock(spec=ExperiencePool)
-    pool.find_similar.return_value = [
+    similar = [
         (Experience(
             question="How to load data?",
             function="def load_data(path):\n    import pandas as pd\n    return pd.read_csv(path)",
@@ -18,6 +20,7 @@ def mock_experience_pool():
             cluster_id=0
         ), 0.95)
     ]
+    pool.find_with_template_batch.side_effect = lambda questions: [(None, similar) for _ in questions]
     return pool
 
 @pytest.fixture
@@ -48,11 +51,11 @@ def test_generate_code_with_experience(engineer, mock_experience_pool):
     assert "1" in updated_task.code_blocks
     assert "load_data" in updated_task.code_blocks["1"]
     
-    mock_experience_pool.find_similar.assert_called_once()
+    mock_experience_pool.find_with_template_batch.assert_called_once_with(["load data"])
     mock_experience_pool.add_experience.assert_called_once()
 
 def test_fallback_to_base_implementation(engineer, mock_experience_pool):
-    mock_experience_pool.find_similar.return_value = []
+    mock_experience_pool.find_with_template_batch.side_effect = lambda questions: [(None, []) for _ in questions]
     
     task = Task(
         task_id="test",
@@ -66,4 +69,51 @@ def test_fallback_to_base_implementation(engineer, mock_experience_pool):
     
     updated_task = response.content
     assert "1" in updated_task.code_blocks
-    assert "TODO" in updated_task.code_blocks["1"]
\ No newline at end of file
+    assert "TODO" in updated_task.code_blocks["1"]
+
+def test_fallback_to_cluster_template(engineer, mock_experience_pool):
+    template = ClusterTemplate("How to {action}?", "def clean(df):\n    return df.dropna()", [])
+    mock_experience_pool.find_with_template_batch.side_effect = lambda questions: [
+        (template, []) for _ in questions
+    ]
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[{"id": "1", "description": "custom task"}]
+    )
+    
+    response = engineer.process(Message("planner", "engineer", task))
+    code = response.content.code_blocks["1"]
+    # The generic template is context for the subtask, not its code
+    assert code.startswith("# TODO: Implement custom task")
+    assert "# def clean(df):\n#     return df.dropna()" in code
+    assert "How to {action}?" in code
+    assert all(line.startswith("#") for line in code.splitlines())
+
+def test_process_batches_similarity_lookup(engineer, mock_experience_pool):
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[
+            {"id": "1", "description": "load data"},
+            {"id": "2", "description": "exploratory analysis"},
+            {"id": "3", "description": "already done"}
+        ]
+    )
+    task.add_code_block("3", "x = 1")
+    message = Message("planner", "engineer", task)
+    
+    engineer.process(message)
+    
+    mock_experience_pool.find_with_template_batch.assert_called_once_with(
+        ["load data", "exploratory analysis"]
+    )
+    assert mock_experience_pool.add_experience.call_count == 2
+
+def test_candidates_of_a_run_record_each_experience_once(engineer, mock_experience_pool):
+    context = RunContext(fan_out=3)
+    for i in range(3):
+        task = Task(f"test-{i}", "Test task", [{"id": "1", "description": "load data"}])
+        engineer.process(Message("planner", "engineer", task, context=context))
+    
+    assert mock_experience_pool.add_experience.call_count == 1
@@ -0,0 +1,69 @@
+# tests/test_execution_cache.py
+from core.execution_cache import ExecutionCache, environment_fingerprint
+
+SUCCESS = {"status": "success", "variables": ["x"], "output": "{'x': 1}"}
+
+def test_environment_fingerprint_depends_on_packages():
+    assert environment_fingerprint() == environment_fingerprint()
+    assert environment_fingerprint(["numpy"]) != environment_fingerprint(["numpy", "not-a-package"])
+
+def test_cache_hit_and_miss():
+    cache = ExecutionCache(environment="env")
+    assert cache.get("x = 1") is None
+    cache.put("x = 1", SUCCESS)
+    assert cache.get("x = 1") == SUCCESS
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+
+def test_cache_skips_failures():
+    cache = ExecutionCache(environment="env")
+    cache.put("1 / 0", {"status": "failed", "error": "division by zero", "traceback": ""})
+    assert len(cache) == 0
+
+def test_cache_key_includes_environment():
+    cache = ExecutionCache(environment="env-a")
+    cache.put("x = 1", SUCCESS)
+    other = ExecutionCache(environment="env-b")
+    assert cache.make_key("x = 1") != other.make_key("x = 1")
+
+def test_cache_evicts_least_recently_used():
+    cache = ExecutionCache(max_entries=2, environment="env")
+    cache.put("a = 1", SUCCESS)
+    cache.put("b = 1", SUCCESS)
+    cache.get("a = 1")
+    cache.put("c = 1", SUCCESS)
+    assert cache.get("b = 1") is None
+    assert cache.get("a = 1") is not None
+    assert cache.stats["evictions"] == 1
+
+def test_cached_result_is_a_copy():
+    cache = ExecutionCache(environment="env")
+    cache.put("x = 1", SUCCESS)
+    cache.get("x = 1")["status"] = "changed"
+    assert cache.get("x = 1")["status"] == "success"
+
+def test_cache_requires_exports_when_asked():
+    cache = ExecutionCache(environment="env")
+    cache.put("x = 1", SUCCESS)
+    assert cache.get("x = 1", require_exports=True) is None
+    cache.put("x = 1", dict(SUCCESS, exports=b"data"))
+    assert cache.get("x = 1", require_exports=True)["exports"] == b"data"
+
+def test_cache_is_bounded_by_export_bytes():
+    cache = ExecutionCache(environment="env", max_bytes=100)
+    cache.put("a = 1", dict(SUCCESS, exports=b"a" * 60))
+    cache.put("b = 1", dict(SUCCESS, exports=b"b" * 60))
+    assert cache.get("a = 1") is None
+    assert cache.get("b = 1") is not None
+    assert cache.bytes == 60
+    assert cache.stats["evictions"] == 1
+    # A result larger than the whole budget is not stored
+    cache.put("c = 1", dict(SUCCESS, exports=b"c" * 200))
+    assert cache.get("c = 1") is None
+    assert cache.bytes == 60
+
+def test_cache_sizes_live_exports():
+    cache = ExecutionCache(environment="env")
+    cache.put("x = 1", dict(SUCCESS, exports={"x": bytes(1000)}))
+    assert cache.bytes >= 1000
+    cache.clear()
+    assert cache.bytes == 0
@@ -1,7 +1,8 @@
 # tests/test_experience.py
+import pickle
 import pytest
 import numpy as np
-from core.experience import Experience
+from core.experience import Experience, ExperienceTable
 
 def test_experience_creation():
     exp = Experience(
@@ -25,7 +26,7 @@ def test_experience_to_dict():
     data = exp.to_dict()
     assert data["question"] == exp.question
     assert data["function"] == exp.function
-    assert data["embedding"] == exp.embedding
+    assert data["embedding"] == pytest.approx([0.1, 0.2])
     assert data["cluster_id"] == exp.cluster_id
     assert data["metadata"] == exp.metadata
 
@@ -40,7 +41,7 @@ def test_experience_from_dict():
     exp = Experience.from_dict(data)
     assert exp.question == data["question"]
     assert exp.function == data["function"]
-    assert exp.embedding == data["embedding"]
+    assert exp.embedding == pytest.approx(data["embedding"])
     assert exp.cluster_id == data["cluster_id"]
     assert exp.metadata == data["metadata"]
 
@@ -59,4 +60,79 @@ def test_get_embedding_array_none():
         question="How to load data?",
         function="def load_data(): pass"
     )
-    assert exp.get_embedding_array() is None
\ No newline at end of file
+    assert exp.get_embedding_array() is None
+
+def test_get_embedding_array_is_float32_view():
+    exp = Experience(
+        question="How to load data?",
+        function="def load_data(): pass",
+        embedding=[0.1, 0.2]
+    )
+    array = exp.get_embedding_array()
+    assert array.dtype == np.float32
+    assert np.shares_memory(array, exp.table.embeddings)
+
+def test_experience_has_no_instance_dict():
+    exp = Experience(question="q", function="f")
+    assert not hasattr(exp, "__dict__")
+
+def test_experience_table_append_and_views():
+    table = ExperienceTable(initial_capacity=2)
+    first = table.append("q1", "f1", embedding=[1.0, 0.0])
+    second = table.append("q2", "f2")
+    third = table.append("q3", "f3", embedding=[0.0, 1.0], cluster_id=4)
+    
+    assert len(table) == 3
+    assert table.embeddings.shape == (3, 2)
+    assert table.has_embedding.tolist() == [True, False, True]
+    assert table.cluster_ids.tolist() == [-1, -1, 4]
+    assert first.question == "q1"
+    assert second.embedding is None
+    assert third.cluster_id == 4
+    
+    # Views write through to the columns
+    first.cluster_id = 2
+    second.embedding = [0.5, 0.5]
+    assert table.cluster_ids[0] == 2
+    assert table.has_embedding[1]
+    assert np.allclose(table.embeddings[1], [0.5, 0.5])
+
+def test_experience_table_dimension_mismatch():
+    table = ExperienceTable()
+    table.append("q1", "f1", embedding=[1.0, 0.0])
+    with pytest.raises(ValueError):
+        table.append("q2", "f2", embedding=[1.0, 0.0, 0.0])
+
+def test_experience_table_copies_read_only_embeddings_on_write():
+    matrix = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    matrix.flags.writeable = False
+    table = ExperienceTable.from_columns(
+        ["q1", "q2"], ["f1", "f2"], [{}, {}], np.array([0, 1]), embeddings=matrix
+    )
+    assert np.shares_memory(table.embeddings, matrix)
+    
+    table.row(0).embedding = [2.0, 2.0]
+    assert np.allclose(matrix[0], [1.0, 0.0])
+    assert np.allclose(table.embeddings[0], [2.0, 2.0])
+
+def test_experience_pickles_as_standalone_row():
+    table = ExperienceTable()
+    table.append("q1", "f1", embedding=[1.0, 0.0])
+    exp = table.append("q2", "f2", embedding=[0.0, 1.0], metadata={"k": "v"})
+    
+    restored = pickle.loads(pickle.dumps(exp))
+    assert restored == exp
+    assert len(restored.table) == 1
+
+def test_experience_restores_legacy_dataclass_state():
+    exp = Experience.__new__(Experience)
+    exp.__setstate__({
+        "question": "q",
+        "function": "f",
+        "embedding": [0.1, 0.2],
+        "cluster_id": 3,
+        "metadata": {}
+    })
+    assert exp.question == "q"
+    assert exp.cluster_id == 3
+    assert exp.embedding == pytest.approx([0.1, 0.2])
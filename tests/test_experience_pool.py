@@ -1,19 +1,31 @@
 # tests/test_experience_pool.py
+import json
+import pickle
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import openai
 import pytest
-from unittest.mock import MagicMock
+import numpy as np
+from unittest.mock import MagicMock, patch
 from core.experience_pool import ExperiencePool
 from core.experience import Experience
 from core.embedding_generator import EmbeddingGenerator
 from core.vector_store import VectorStore
-from core.cluster_manager import ClusterManager
+from core.cluster_manager import AsyncTemplateGenerator, ClusterManager
+from core.cluster_template import ClusterTemplate, membership_fingerprint
 
 @pytest.fixture
 def mock_components():
     embedding_generator = MagicMock(spec=EmbeddingGenerator)
     embedding_generator.generate.return_value = [0.1, 0.2]
+    embedding_generator.generate_batch.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
     
     vector_store = MagicMock(spec=VectorStore)
     vector_store.search.return_value = ([0], [0.9])
+    vector_store.search_batch.side_effect = lambda queries, k: (
+        np.zeros((len(queries), 1), dtype=int), np.full((len(queries), 1), 0.9)
+    )
     
     cluster_manager = MagicMock(spec=ClusterManager)
     cluster_manager.cluster.return_value = [0, 1]
@@ -34,7 +46,7 @@ def test_add_experience(mock_components):
     assert isinstance(exp, Experience)
     assert exp.question == "How to load data?"
     assert exp.function == "def load_data(): pass"
-    assert exp.embedding == [0.1, 0.2]
+    assert exp.embedding == pytest.approx([0.1, 0.2])
     
     assert len(pool.experiences) == 1
     embedding_generator.generate.assert_called_once()
@@ -68,4 +80,441 @@ def test_update_clusters(mock_components):
     pool.update_clusters()
     
     cluster_manager.cluster.assert_called_once()
-    assert all(exp.cluster_id is not None for exp in pool.experiences)
\ No newline at end of file
+    assert all(exp.cluster_id is not None for exp in pool.experiences)
+
+def test_find_similar_batch(mock_components):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    
+    results = pool.find_similar_batch(["How to load CSV?", "How to read a file?"])
+    assert len(results) == 2
+    assert all(len(similar) == 1 for similar in results)
+    assert results[0][0][0] is pool.experiences[0]
+    assert isinstance(results[0][0][1], float)
+    
+    embedding_generator.generate_batch.assert_called_once()
+    vector_store.search_batch.assert_called_once()
+
+def test_find_similar_batch_empty(mock_components):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager)
+    assert pool.find_similar_batch([]) == []
+    embedding_generator.generate_batch.assert_not_called()
+
+def make_persistent_pool(path, embedding_generator, cluster_manager):
+    return ExperiencePool(embedding_generator, VectorStore(), cluster_manager, save_path=str(path))
+
+def test_save_and_load_memory_maps_embeddings(tmp_path, mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    embeddings = iter([[1.0, 0.0], [0.0, 1.0]])
+    embedding_generator.generate.side_effect = lambda text: next(embeddings)
+    
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.add_experience("How to plot data?", "def plot_data(): pass")
+    pool.experiences[1].metadata["type"] = "plotting"
+    pool.templates[0] = ClusterTemplate("Q", "F", examples=[pool.experiences[0]], fingerprint="abc")
+    pool.save()
+    
+    assert (tmp_path / "pool.npy").exists()
+    
+    loaded = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    loaded.load()
+    
+    assert [exp.question for exp in loaded.experiences] == ["How to load data?", "How to plot data?"]
+    assert loaded.experiences[1].metadata == {"type": "plotting"}
+    assert np.allclose(loaded.experiences[1].embedding, [0.0, 1.0])
+    assert loaded.templates[0].examples[0] is loaded.experiences[0]
+    assert loaded.templates[0].fingerprint == "abc"
+    assert isinstance(loaded.vector_store.vectors, np.memmap)
+    assert np.shares_memory(loaded.table.embeddings, loaded.vector_store.vectors)
+    assert loaded.vector_store.vectors.dtype == np.float32
+    assert loaded.vector_store.search([0.0, 1.0], k=1)[0] == [1]
+
+def test_load_then_add_does_not_write_memmap(tmp_path, mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.save()
+    
+    loaded = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    loaded.load()
+    loaded.add_experience("How to save data?", "def save_data(): pass")
+    loaded.save()
+    
+    assert np.load(tmp_path / "pool.npy").shape == (2, 2)
+
+def test_failed_save_keeps_previous_pool(tmp_path, mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.save()
+    
+    pool.add_experience("How to plot data?", "def plot_data(): pass")
+    with patch("core.experience_pool.pickle.dump", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            pool.save()
+    
+    loaded = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    loaded.load()
+    assert [exp.question for exp in loaded.experiences] == ["How to load data?"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["pool.npy", "pool.pkl"]
+
+def test_load_rejects_mismatched_embedding_matrix(tmp_path, mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.save()
+    np.save(tmp_path / "pool.npy", np.zeros((3, 2), dtype=np.float32))
+    
+    loaded = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    with pytest.raises(ValueError, match="holds 1 rows"):
+        loaded.load()
+
+def test_load_legacy_pickle(tmp_path, mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    with open(tmp_path / "pool.pkl", "wb") as f:
+        pickle.dump({
+            'experiences': [Experience("How to load data?", "def load_data(): pass", embedding=[0.1, 0.2])],
+            'templates': {}
+        }, f)
+    
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    pool.load()
+    
+    assert len(pool.experiences) == 1
+    assert pool.vector_store.vectors.shape == (1, 2)
+
+@pytest.mark.parametrize("data", [{'format': 99, 'rows': []}, {'rows': []}])
+def test_load_rejects_unknown_format(tmp_path, mock_components, data):
+    embedding_generator, _, cluster_manager = mock_components
+    with open(tmp_path / "pool.pkl", "wb") as f:
+        pickle.dump(data, f)
+    
+    pool = make_persistent_pool(tmp_path / "pool.pkl", embedding_generator, cluster_manager)
+    with pytest.raises(ValueError, match="Unsupported experience pool format"):
+        pool.load()
+    assert pool.experiences == []
+
+def test_update_clusters_writes_cluster_id_column(mock_components):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.add_experience("How to save data?", "def save_data(): pass")
+    
+    pool.update_clusters()
+    
+    embeddings = cluster_manager.cluster.call_args[0][0]
+    assert embeddings.dtype == np.float32
+    assert pool.table.cluster_ids.tolist() == [0, 1]
+    assert sorted(pool.templates) == [0, 1]
+
+def test_incremental_update_clusters_only_sends_new_rows(mock_components):
+    embedding_generator, vector_store, _ = mock_components
+    vectors = iter([[1.0, 0.0], [0.0, 1.0], [0.9, 0.1], [0.1, 0.9]])
+    embedding_generator.generate.side_effect = lambda text: next(vectors)
+    cluster_manager = ClusterManager("fake-api-key", n_clusters=2, random_state=0)
+    cluster_manager.generate_template = MagicMock(return_value=ClusterTemplate("Q", "F", []))
+    cluster_manager.partial_cluster = MagicMock(wraps=cluster_manager.partial_cluster)
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager,
+                          incremental_clustering=True)
+    
+    pool.add_experience("q1", "f1")
+    pool.add_experience("q2", "f2")
+    pool.update_clusters()
+    pool.add_experience("q3", "f3")
+    pool.update_clusters()
+    pool.add_experience("q4", "f4")
+    pool.update_clusters()
+    
+    batch_sizes = [len(c.args[0]) for c in cluster_manager.partial_cluster.call_args_list]
+    assert batch_sizes == [2, 1, 1]
+    assert pool.clustered_rows == 4
+    ids = pool.table.cluster_ids.tolist()
+    assert ids[0] == ids[2] != ids[1] == ids[3]
+
+def test_incremental_clustering_state_persists(tmp_path, mock_components):
+    embedding_generator, _, _ = mock_components
+    vectors = iter([[1.0, 0.0], [0.0, 1.0]])
+    embedding_generator.generate.side_effect = lambda text: next(vectors)
+    
+    def make_pool():
+        manager = ClusterManager("fake-api-key", n_clusters=2, random_state=0)
+        manager.generate_template = MagicMock(return_value=ClusterTemplate("Q", "F", []))
+        return ExperiencePool(embedding_generator, VectorStore(), manager,
+                              save_path=str(tmp_path / "pool.pkl"),
+                              incremental_clustering=True)
+    
+    pool = make_pool()
+    pool.add_experience("q1", "f1")
+    pool.add_experience("q2", "f2")
+    pool.update_clusters()
+    pool.save()
+    
+    loaded = make_pool()
+    loaded.load()
+    assert loaded.clustered_rows == 2
+    assert loaded.cluster_manager.is_fitted
+    assert np.allclose(loaded.cluster_manager.centroids, pool.cluster_manager.centroids)
+
+def make_template_pool(mock_components, cluster_ids, **kwargs):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    cluster_manager.cluster.side_effect = lambda embeddings: cluster_ids[:len(embeddings)]
+    cluster_manager.generate_template.side_effect = lambda exps: ClusterTemplate("Q", "F", exps)
+    return ExperiencePool(embedding_generator, vector_store, cluster_manager, **kwargs)
+
+def test_update_clusters_reuses_unchanged_templates(mock_components):
+    pool = make_template_pool(mock_components, [0, 1, 1, 0])
+    for i in range(3):
+        pool.add_experience(f"q{i}", f"f{i}")
+    pool.update_clusters()
+    assert pool.template_stats == {"reused": 0, "regenerated": 2, "failed": 0}
+    first_templates = dict(pool.templates)
+    
+    # Nothing changed: no template is regenerated
+    pool.update_clusters()
+    assert pool.template_stats == {"reused": 2, "regenerated": 2, "failed": 0}
+    assert pool.templates[0] is first_templates[0]
+    
+    # A new member only dirties its own cluster
+    pool.add_experience("q3", "f3")
+    pool.update_clusters()
+    assert pool.template_stats == {"reused": 3, "regenerated": 3, "failed": 0}
+    assert pool.templates[1] is first_templates[1]
+    assert pool.templates[0] is not first_templates[0]
+    assert pool.templates[0].fingerprint == membership_fingerprint([0, 3])
+
+def test_update_clusters_matches_templates_across_relabeling(mock_components):
+    pool = make_template_pool(mock_components, [0, 1])
+    pool.add_experience("q0", "f0")
+    pool.add_experience("q1", "f1")
+    pool.update_clusters()
+    template_for_row_0 = pool.templates[0]
+    
+    pool.cluster_manager.cluster.side_effect = lambda embeddings: [1, 0]
+    pool.update_clusters()
+    assert pool.templates[1] is template_for_row_0
+    assert pool.template_stats["regenerated"] == 2
+
+def test_update_clusters_min_template_change(mock_components):
+    pool = make_template_pool(mock_components, [0] * 10, min_template_change=0.5)
+    for i in range(4):
+        pool.add_experience(f"q{i}", f"f{i}")
+    pool.update_clusters()
+    
+    # One new member out of five is below the threshold
+    pool.add_experience("q4", "f4")
+    pool.update_clusters()
+    assert pool.template_stats == {"reused": 1, "regenerated": 1, "failed": 0}
+    
+    # Four new members since generation crosses it
+    for i in range(5, 8):
+        pool.add_experience(f"q{i}", f"f{i}")
+    pool.update_clusters()
+    assert pool.template_stats == {"reused": 1, "regenerated": 2, "failed": 0}
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal chat completions endpoint; prompts mentioning FAIL get an error"""
+    latency = 0.3
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        time.sleep(self.latency)
+        if "FAIL" in prompt:
+            status, payload = 400, {"error": {"message": "stub failure", "type": "invalid_request_error"}}
+        else:
+            question = prompt.split("Question: ")[1].split("\n")[0]
+            status, payload = 200, {
+                "id": "stub", "object": "chat.completion", "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                    "role": "assistant", "content": f"Template for {question} ### def f(): pass"
+                }}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+            }
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_llm_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(openai, "api_base", f"http://127.0.0.1:{server.server_port}/v1")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_stub_pool(mock_components, cluster_ids, template_workers):
+    embedding_generator, vector_store, _ = mock_components
+    embedding_generator.generate.side_effect = lambda text: [float(len(text)), 1.0]
+    cluster_manager = ClusterManager("fake-api-key", n_clusters=len(set(cluster_ids)))
+    cluster_manager.cluster = MagicMock(side_effect=lambda embeddings: cluster_ids[:len(embeddings)])
+    return ExperiencePool(embedding_generator, vector_store, cluster_manager,
+                          template_workers=template_workers)
+
+def test_parallel_template_generation_against_stub_server(stub_llm_server, mock_components):
+    pool = make_stub_pool(mock_components, [0, 1, 2, 3], template_workers=4)
+    for i in range(4):
+        pool.add_experience(f"question {i}", f"def f{i}(): pass")
+    
+    start = time.perf_counter()
+    pool.update_clusters()
+    elapsed = time.perf_counter() - start
+    
+    assert sorted(pool.templates) == [0, 1, 2, 3]
+    assert pool.templates[2].question_template == "Template for question 2"
+    assert pool.template_stats["regenerated"] == 4
+    # Four sequential requests would take at least 4 * latency
+    assert elapsed < 3 * StubLLMHandler.latency
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_template_failure_is_isolated_per_cluster(stub_llm_server, mock_components, asynchronous):
+    pool = make_stub_pool(mock_components, [0, 1, 2, 0, 1, 2], template_workers=3)
+    if asynchronous:
+        pool.template_generator = AsyncTemplateGenerator(pool.cluster_manager, max_retries=0)
+    pool.add_experience("question 0", "def f0(): pass")
+    pool.add_experience("question 1", "def f1(): pass")
+    pool.add_experience("question 2", "def f2(): pass")
+    pool.update_clusters()
+    previous = pool.templates[1]
+    
+    # Cluster 1 grows with an example the stub refuses; the others still update
+    pool.add_experience("question 3", "def f3(): pass")
+    pool.add_experience("FAIL question", "def f4(): pass")
+    pool.add_experience("question 5", "def f5(): pass")
+    pool.update_clusters()
+    
+    assert pool.template_stats["failed"] == 1
+    assert pool.templates[1] is previous
+    assert pool.templates[0].fingerprint == membership_fingerprint([0, 3])
+    assert pool.templates[2].fingerprint == membership_fingerprint([2, 5])
+
+def test_async_template_generation_against_stub_server(stub_llm_server, mock_components):
+    pool = make_stub_pool(mock_components, [0, 1, 2, 3], template_workers=1)
+    pool.template_generator = AsyncTemplateGenerator(pool.cluster_manager, max_concurrency=4)
+    for i in range(4):
+        pool.add_experience(f"question {i}", f"def f{i}(): pass")
+    
+    start = time.perf_counter()
+    pool.update_clusters()
+    elapsed = time.perf_counter() - start
+    
+    assert sorted(pool.templates) == [0, 1, 2, 3]
+    assert pool.templates[3].question_template == "Template for question 3"
+    assert pool.templates[3].fingerprint == membership_fingerprint([3])
+    assert pool.template_stats["regenerated"] == 4
+    # One template thread, yet the requests overlap on the event loop
+    assert elapsed < 3 * StubLLMHandler.latency
+
+def make_routed_pool(embedding_generator, cluster_manager):
+    pool = ExperiencePool(embedding_generator, VectorStore(), cluster_manager, route_clusters=1)
+    embeddings = {}
+    for group, center in enumerate([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]):
+        for i in range(4):
+            question = f"group {group} question {i}"
+            embeddings[question] = (np.asarray(center) + 0.01 * i).tolist()
+    embedding_generator.generate.side_effect = lambda text: embeddings[text]
+    for question in embeddings:
+        pool.add_experience(question, f"def f(): return {question!r}")
+    cluster_manager.cluster.return_value = [0] * 4 + [1] * 4 + [2] * 4
+    cluster_manager.generate_template.side_effect = lambda exps: ClusterTemplate(
+        "q", exps[0].question.split(" question")[0], exps
+    )
+    pool.update_clusters()
+    return pool
+
+def test_find_with_template_routes_to_nearest_cluster(mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    pool = make_routed_pool(embedding_generator, cluster_manager)
+    embedding_generator.generate_batch.side_effect = lambda texts: [[0.0, 1.0, 0.05] for _ in texts]
+    
+    template, similar = pool.find_with_template("anything", k=10)
+    assert template is pool.templates[1]
+    assert template.function_template == "group 1"
+    # Only the members of the closest cluster are searched
+    assert len(similar) == 4
+    assert all(exp.cluster_id == 1 for exp, _ in similar)
+    assert [dist for _, dist in similar] == sorted(dist for _, dist in similar)
+
+def test_find_with_template_searches_unclustered_rows(mock_components):
+    embedding_generator, _, cluster_manager = mock_components
+    pool = make_routed_pool(embedding_generator, cluster_manager)
+    embedding_generator.generate.side_effect = None
+    embedding_generator.generate.return_value = [0.0, 1.0, 0.05]
+    late = pool.add_experience("added after clustering", "def late(): pass")
+    embedding_generator.generate_batch.side_effect = lambda texts: [[0.0, 1.0, 0.05] for _ in texts]
+    
+    _, similar = pool.find_with_template("anything", k=1)
+    assert similar[0][0] is late
+
+def test_find_with_template_without_clusters_falls_back(mock_components):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    
+    results = pool.find_with_template_batch(["How to load CSV?"])
+    assert results[0][0] is None
+    assert results[0][1][0][0] is pool.experiences[0]
+    vector_store.search_batch.assert_called_once()
+
+def test_update_clusters_generates_templates_without_holding_pool_lock(mock_components):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(embedding_generator, vector_store, cluster_manager)
+    pool.add_experience("How to load data?", "def load_data(): pass")
+    pool.add_experience("How to plot data?", "def plot_data(): pass")
+    
+    started = threading.Event()
+    release = threading.Event()
+    def slow_template(experiences):
+        started.set()
+        release.wait(5)
+        return ClusterTemplate("question", "function", experiences)
+    cluster_manager.generate_template.side_effect = slow_template
+    
+    updater = threading.Thread(target=pool.update_clusters)
+    updater.start()
+    try:
+        assert started.wait(5)
+        # Lookups and additions proceed while templates are generated
+        adder = threading.Thread(target=pool.add_experience, args=("How to clean data?", "def clean(): pass"))
+        adder.start()
+        adder.join(2)
+        assert not adder.is_alive()
+        assert len(pool.find_similar("How to load CSV?")) == 1
+    finally:
+        release.set()
+        updater.join()
+    assert set(pool.templates) == {0, 1}
+
+def test_save_is_consistent_with_concurrent_additions(mock_components, tmp_path):
+    embedding_generator, vector_store, cluster_manager = mock_components
+    pool = ExperiencePool(
+        embedding_generator, vector_store, cluster_manager,
+        save_path=str(tmp_path / "pool.pkl")
+    )
+    stop = threading.Event()
+    def add():
+        i = 0
+        while not stop.is_set():
+            pool.add_experience(f"question {i}", "pass")
+            i += 1
+    adder = threading.Thread(target=add)
+    adder.start()
+    try:
+        for _ in range(20):
+            pool.save()
+            with open(pool.save_path, 'rb') as f:
+                rows = pickle.load(f)['rows']
+            assert np.load(pool.embeddings_path).shape[0] == len(rows)
+    finally:
+        stop.set()
+        adder.join()
@@ -1,5 +1,6 @@
 # tests/test_integration.py
 import pytest
+from types import SimpleNamespace
 from unittest.mock import patch
 from main import MultiAgentSystem
 from core.task import Task, TaskStatus
@@ -9,16 +10,37 @@ from core.experience import Experience
 def mock_openai_api_key():
     return "test-api-key-12345"
 
-def test_system_initialization(mock_openai_api_key):
-    system = MultiAgentSystem(openai_api_key=mock_openai_api_key)
+@pytest.fixture(autouse=True)
+def mock_chat():
+    """Template generation never reaches the real chat endpoint"""
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+        content="Analyze the data ### def analyze(data):\n    return data.describe()"
+    ))])
+    with patch('openai.ChatCompletion.create', return_value=response) as chat:
+        yield chat
+
+@pytest.fixture
+def make_system(mock_openai_api_key, tmp_path):
+    """Build MultiAgentSystems whose workers and threads are closed after the test"""
+    systems = []
+
+    def make(**kwargs):
+        kwargs.setdefault("experience_pool_path", str(tmp_path / "experience_pool.pkl"))
+        system = MultiAgentSystem(openai_api_key=mock_openai_api_key, **kwargs)
+        systems.append(system)
+        return system
+
+    yield make
+    for system in systems:
+        system.close()
+
+def test_system_initialization(make_system):
+    system = make_system()
     assert len(system.agents) == 4
     assert all(agent_id in system.agents for agent_id in ["planner", "engineer", "verifier", "voter"])
 
-def test_complete_analysis_workflow(mock_openai_api_key):
-    system = MultiAgentSystem(
-        openai_api_key=mock_openai_api_key,
-        max_iterations=2
-    )
+def test_complete_analysis_workflow(make_system):
+    system = make_system(max_iterations=2)
     requirements = """
     Simple data analysis:
     1. Calculate mean and median
@@ -26,7 +48,9 @@ def test_complete_analysis_workflow(mock_openai_api_key):
     """
     
     with patch('openai.Embedding.create') as mock_embedding:
-        mock_embedding.return_value = {'data': [{'embedding': [0.1, 0.2]}]}
+        mock_embedding.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 0.2]} for _ in (input if isinstance(input, list) else [input])]
+        }
         result = system.run(requirements)
         
     assert result is not None
@@ -37,8 +61,8 @@ def test_complete_analysis_workflow(mock_openai_api_key):
     assert final_task.code_blocks is not None
     assert final_task.execution_results is not None
 
-def test_system_error_handling(mock_openai_api_key):
-    system = MultiAgentSystem(openai_api_key=mock_openai_api_key)
+def test_system_error_handling(make_system):
+    system = make_system(execution_workers=0)
     with patch('openai.Embedding.create') as mock_embedding:
         mock_embedding.side_effect = Exception("API Error")
         result = system.run("invalid:::syntax;;requirements")
@@ -48,4 +72,96 @@ def test_system_error_handling(mock_openai_api_key):
     
     task = result.content
     assert isinstance(task, Task)
-    assert task.status == TaskStatus.FAILED
\ No newline at end of file
+    assert task.status == TaskStatus.FAILED
+
+def test_run_many_shares_pool_across_concurrent_runs(make_system, tmp_path):
+    system = make_system(
+        max_iterations=2,
+        execution_workers=0
+    )
+    requirements_list = [f"Analysis {i}: calculate summary statistics" for i in range(4)]
+    
+    with patch('openai.Embedding.create') as mock_embedding:
+        mock_embedding.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 0.2]} for _ in (input if isinstance(input, list) else [input])]
+        }
+        generator = system.experience_pool.embedding_generator
+        results = dict(system.run_many(requirements_list, concurrency=2))
+        
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(result.recipient_id == "output" for result in results.values())
+    assert all(result.content.status != TaskStatus.FAILED for result in results.values())
+    # Each run had its own task, all recorded in the shared pool
+    assert len({result.content.task_id for result in results.values()}) == 4
+    assert len(system.experience_pool.experiences) == 4 * len(results[0].content.subtasks)
+    assert system.experience_pool.embedding_generator is generator
+    assert (tmp_path / "experience_pool.pkl").exists()
+
+def test_repeated_runs_iterate_fully(make_system):
+    system = make_system(
+        max_iterations=2,
+        execution_workers=0,
+        stopping_policies=[]
+    )
+    
+    with patch('openai.Embedding.create') as mock_embedding:
+        mock_embedding.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 0.2]} for _ in (input if isinstance(input, list) else [input])]
+        }
+        first = system.run("First analysis: calculate summary statistics")
+        second = system.run("Second analysis: calculate summary statistics")
+        
+    # The second run votes over its own iterations, not the first run's
+    assert first.context is not second.context
+    assert first.context.iterations == second.context.iterations == 2
+    assert second.content.description.startswith("Second")
+    assert len(second.context.messages) <= second.context.max_messages
+
+def test_parallel_candidates(make_system):
+    system = make_system(
+        max_iterations=3,
+        execution_workers=0,
+        parallel_candidates=True
+    )
+    
+    with patch('openai.Embedding.create') as mock_embedding:
+        mock_embedding.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 0.2]} for _ in (input if isinstance(input, list) else [input])]
+        }
+        result = system.run("Parallel analysis: calculate summary statistics")
+        
+    assert result.recipient_id == "output"
+    assert result.content.status != TaskStatus.FAILED
+    assert result.context.fan_out == 3
+    assert 1 <= result.context.iterations <= 3
+
+def test_parallel_candidates_must_fit_bus(mock_openai_api_key, tmp_path):
+    # Rejected before the worker pool is started or the pool file is read
+    with patch('main.WorkerPool') as pool, patch('main.ExperiencePool') as experience_pool:
+        with pytest.raises(ValueError):
+            MultiAgentSystem(
+                openai_api_key=mock_openai_api_key,
+                max_iterations=8,
+                experience_pool_path=str(tmp_path / "experience_pool.pkl"),
+                bus_queue_size=4,
+                parallel_candidates=True
+            )
+    pool.assert_not_called()
+    experience_pool.assert_not_called()
+
+def test_run_stops_early_on_perfect_candidate(make_system):
+    system = make_system(
+        max_iterations=3,
+        execution_workers=0
+    )
+    
+    with patch('openai.Embedding.create') as mock_embedding:
+        mock_embedding.side_effect = lambda model, input: {
+            'data': [{'embedding': [0.1, 0.2]} for _ in (input if isinstance(input, list) else [input])]
+        }
+        result = system.run("Simple analysis: calculate summary statistics")
+        
+    # Every generated block passes, so the first candidate is selected
+    assert result.context.iterations == 1
+    assert result.context.iterations_saved == 2
+    assert system.agents["voter"].stats["iterations_saved"] == 2
@@ -1,4 +1,5 @@
 # tests/test_message.py
+import time
 from datetime import datetime
 from core.message import Message
 
@@ -12,4 +13,10 @@ def test_message_creation():
 def test_message_str():
     message = Message("sender", "recipient", "test content")
     expected = "Message from sender to recipient: test content"
-    assert str(message) == expected
\ No newline at end of file
+    assert str(message) == expected
+
+def test_message_timestamp_is_set_per_message():
+    first = Message("sender", "recipient", "content")
+    time.sleep(0.001)
+    second = Message("sender", "recipient", "content")
+    assert second.timestamp > first.timestamp
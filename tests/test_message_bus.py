@@ -0,0 +1,202 @@
+# tests/test_message_bus.py
+import threading
+import time
+import pytest
+from core.base_agent import BaseAgent
+from core.message import Message
+from core.message_bus import MessageBus
+from core.run_context import RunContext
+
+class RelayAgent(BaseAgent):
+    """Forwards its input to the next agent after an optional delay"""
+    def __init__(self, agent_id, recipient_id, delay=0.0):
+        super().__init__(agent_id)
+        self.recipient_id = recipient_id
+        self.delay = delay
+        
+    def process(self, message):
+        time.sleep(self.delay)
+        return self.send_message(message.content, self.recipient_id, message.context)
+
+class SilentAgent(BaseAgent):
+    def process(self, message):
+        return None
+
+class FailingAgent(BaseAgent):
+    def process(self, message):
+        raise ValueError("boom")
+
+def start(recipient_id="a", content="payload"):
+    return Message("input", recipient_id, content, context=RunContext())
+
+def test_routes_run_to_output():
+    agents = {"a": RelayAgent("a", "b"), "b": RelayAgent("b", "output")}
+    with MessageBus(agents) as bus:
+        result = bus.run(start())
+        
+    assert result.recipient_id == "output"
+    assert result.content == "payload"
+    assert bus.stats["completed"] == 1
+    assert bus.queue_stats["a"]["processed"] == 1
+    assert bus.queue_stats["b"]["processed"] == 1
+
+def test_context_is_kept_along_the_run():
+    agents = {"a": RelayAgent("a", "output")}
+    message = start()
+    with MessageBus(agents) as bus:
+        result = bus.run(message)
+    assert result.context is message.context
+    assert [m.recipient_id for m in message.context.messages] == ["a"]
+
+def test_stages_of_different_runs_overlap():
+    delay = 0.1
+    agents = {"a": RelayAgent("a", "b", delay), "b": RelayAgent("b", "output", delay)}
+    with MessageBus(agents, workers_per_agent=1) as bus:
+        start_time = time.perf_counter()
+        futures = [bus.submit(start()) for _ in range(4)]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start_time
+        
+    assert all(result.recipient_id == "output" for result in results)
+    # Serially 4 runs x 2 stages would take 8 delays; pipelined about 5
+    assert elapsed < 7 * delay
+
+def test_admission_limits_runs_in_flight():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class CountingAgent(BaseAgent):
+        def process(self, message):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            return self.send_message(message.content, "output", message.context)
+
+    with MessageBus({"a": CountingAgent("a")}, queue_size=4, workers_per_agent=8, max_in_flight=2) as bus:
+        futures = [bus.submit(start()) for _ in range(6)]
+        assert all(future.result() is not None for future in futures)
+        
+    assert max(peak) <= 2
+    assert bus.stats["submitted"] == 6
+    assert bus.stats["admission_wait"] > 0
+
+def test_max_in_flight_cannot_exceed_queue_size():
+    with pytest.raises(ValueError):
+        MessageBus({"a": RelayAgent("a", "output")}, queue_size=2, max_in_flight=3)
+
+def test_agent_error_fails_the_run():
+    with MessageBus({"a": FailingAgent("a")}) as bus:
+        future = bus.submit(start())
+        with pytest.raises(ValueError, match="boom"):
+            future.result()
+    assert bus.stats["failed"] == 1
+    assert bus.queue_stats["a"]["errors"] == 1
+
+def test_missing_response_uses_fallback():
+    calls = []
+
+    class Recorder(BaseAgent):
+        def process(self, message):
+            calls.append(message.sender_id)
+            return self.send_message(message.content, "output", message.context)
+
+    agents = {"silent": SilentAgent("silent"), "planner": Recorder("planner")}
+    with MessageBus(agents, fallback={"silent": "planner"}) as bus:
+        result = bus.run(start("silent"))
+    assert result.recipient_id == "output"
+    assert calls == ["silent"]
+
+def test_missing_response_without_fallback_ends_run():
+    with MessageBus({"silent": SilentAgent("silent")}) as bus:
+        assert bus.run(start("silent")) is None
+
+def test_unknown_recipient_ends_run():
+    with MessageBus({"a": RelayAgent("a", "nobody")}) as bus:
+        assert bus.run(start()) is None
+
+def test_metrics_report_depth_and_wait():
+    agents = {"a": RelayAgent("a", "output", delay=0.05)}
+    with MessageBus(agents, workers_per_agent=1) as bus:
+        futures = [bus.submit(start()) for _ in range(3)]
+        for future in futures:
+            future.result()
+        metrics = bus.metrics()
+        
+    assert metrics["a"]["depth"] == 0
+    assert metrics["a"]["max_depth"] >= 1
+    assert metrics["a"]["max_wait"] >= 0.05
+    assert metrics["a"]["mean_wait"] > 0
+
+def test_submit_after_close_raises():
+    bus = MessageBus({"a": RelayAgent("a", "output")})
+    bus.close()
+    with pytest.raises(RuntimeError):
+        bus.submit(start())
+
+class FanOutAgent(BaseAgent):
+    """Answers one message with one message per recipient"""
+    def __init__(self, agent_id, recipients):
+        super().__init__(agent_id)
+        self.recipients = recipients
+        
+    def process(self, message):
+        return [self.send_message(recipient, recipient, message.context) for recipient in self.recipients]
+
+def test_fan_out_resolves_with_first_output():
+    agents = {
+        "split": FanOutAgent("split", ["fast", "slow"]),
+        "fast": RelayAgent("fast", "output"),
+        "slow": RelayAgent("slow", "output", delay=0.2)
+    }
+    context = RunContext(fan_out=2)
+    with MessageBus(agents) as bus:
+        result = bus.run(Message("input", "split", "payload", context=context))
+        assert result.content == "fast"
+        # The slow branch finishes but its output is ignored
+        deadline = time.monotonic() + 5.0
+        while bus.metrics()["slow"]["processed"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert bus.metrics()["slow"]["processed"] == 1
+        assert bus.stats["completed"] == 1
+
+def test_messages_of_resolved_run_are_dropped():
+    agents = {
+        "split": FanOutAgent("split", ["fast", "slow"]),
+        "fast": RelayAgent("fast", "output"),
+        "slow": RelayAgent("slow", "output", delay=0.05)
+    }
+    with MessageBus(agents, workers_per_agent=1) as bus:
+        futures = [bus.submit(Message("input", "split", "x", context=RunContext(fan_out=2))) for _ in range(5)]
+        assert all(future.result().content == "fast" for future in futures)
+        
+    # Slow branches still queued once their run resolved were never processed
+    assert bus.stats["dropped"] >= 1
+    assert bus.queue_stats["slow"]["processed"] + bus.stats["dropped"] == 5
+
+def test_empty_response_ends_run_when_nothing_is_pending():
+    class Drop(BaseAgent):
+        def process(self, message):
+            return []
+
+    with MessageBus({"drop": Drop("drop")}) as bus:
+        assert bus.run(start("drop")) is None
+
+def test_fan_out_must_fit_admission():
+    with MessageBus({"a": RelayAgent("a", "output")}, queue_size=4) as bus:
+        with pytest.raises(ValueError):
+            bus.submit(Message("input", "a", "payload", context=RunContext(fan_out=5)))
+
+def test_fan_out_holds_one_slot_per_branch():
+    agents = {
+        "split": FanOutAgent("split", ["a", "a"]),
+        "a": RelayAgent("a", "output", delay=0.05)
+    }
+    with MessageBus(agents, queue_size=2) as bus:
+        futures = [bus.submit(Message("input", "split", "x", context=RunContext(fan_out=2))) for _ in range(3)]
+        assert all(future.result().content == "a" for future in futures)
+        # Runs were admitted one at a time
+        assert bus.stats["admission_wait"] > 0
@@ -3,6 +3,7 @@ import pytest
 from agents.planner import Planner
 from core.message import Message
 from core.task import Task, TaskStatus
+from core.run_context import RunContext
 
 def test_planner_initialization():
     planner = Planner()
@@ -33,4 +34,47 @@ def test_update_plan():
     updated_task = planner.process(update_message).content
     
     assert updated_task is not None
-    assert isinstance(updated_task, Task)
\ No newline at end of file
+    assert isinstance(updated_task, Task)
+
+def test_plan_declares_dependencies():
+    planner = Planner()
+    task = planner.process(Message("user", "planner", "Test analysis")).content
+    ids = {st["id"] for st in task.subtasks}
+    assert all(set(st["depends_on"]) <= ids for st in task.subtasks)
+    assert task.dependencies("2") == ["1"]
+
+def test_modify_subtask_rewires_dependencies():
+    planner = Planner()
+    task = planner.process(Message("user", "planner", "Test analysis")).content
+    task.add_code_block("1", "1 / 0")
+    task.update_execution_result("1", {"status": "failed"})
+    task.update_execution_result("2", {"status": "failed", "blocked_by": "1"})
+    
+    task = planner.process(Message("verifier", "planner", task)).content
+    subtasks = {st["id"]: st for st in task.subtasks}
+    assert "1" not in subtasks
+    assert subtasks["1_1"]["depends_on"] == []
+    assert subtasks["1_2"]["depends_on"] == ["1_1"]
+    assert subtasks["1_3"]["depends_on"] == ["1_2"]
+    # Former dependents now wait for the last replacement step
+    assert subtasks["2"]["depends_on"] == ["1_3"]
+    assert subtasks["3"]["depends_on"] == ["1_3"]
+    # The stale block is dropped; blocked dependents are not broken down
+    assert "1" not in task.code_blocks
+    assert "1" not in task.execution_results
+    assert "2_1" not in subtasks
+
+def test_fan_out_starts_candidates_from_one_plan():
+    planner = Planner()
+    context = RunContext(fan_out=3)
+    responses = planner.process(Message("user", "planner", "Analyze customer data", context=context))
+    
+    assert len(responses) == 3
+    assert all(response.recipient_id == "engineer" for response in responses)
+    assert all(response.context is context for response in responses)
+    tasks = [response.content for response in responses]
+    assert len({task.task_id for task in tasks}) == 3
+    assert all(task.subtasks == tasks[0].subtasks for task in tasks)
+    # Candidates are independent copies
+    tasks[0].subtasks[0]["description"] = "changed"
+    assert tasks[1].subtasks[0]["description"] != "changed"
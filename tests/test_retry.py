@@ -0,0 +1,58 @@
+# tests/test_retry.py
+import asyncio
+import pytest
+import openai
+from unittest.mock import patch
+from core.retry import LoopSemaphore, backoff_delay, retry_async
+
+def rate_limit_error():
+    return openai.error.RateLimitError("Rate limit reached")
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base_delay=0.5, max_delay=4.0)
+        assert 0.0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+def test_retry_async_retries_rate_limits():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    with patch('core.retry.backoff_delay', return_value=0.0) as mock_delay:
+        result = asyncio.run(retry_async(call, max_retries=5))
+
+    assert result == "ok"
+    assert len(calls) == 3
+    assert [c.args[0] for c in mock_delay.call_args_list] == [0, 1]
+
+def test_retry_async_gives_up_after_max_retries():
+    async def call():
+        raise rate_limit_error()
+
+    with pytest.raises(openai.error.RateLimitError):
+        asyncio.run(retry_async(call, max_retries=2, base_delay=0.0))
+
+def test_retry_async_does_not_retry_other_errors():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(retry_async(call, max_retries=5, base_delay=0.0))
+    assert len(calls) == 1
+
+def test_loop_semaphore_follows_running_loop():
+    semaphore = LoopSemaphore(2)
+
+    async def get():
+        return semaphore.get()
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert first is not second
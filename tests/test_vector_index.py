@@ -0,0 +1,91 @@
+# tests/test_vector_index.py
+import pytest
+import numpy as np
+from core.vector_store import VectorStore
+from core.vector_index import FlatIndex, IVFIndex, HNSWIndex
+
+@pytest.fixture
+def clustered_vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(8, 16)) * 5
+    labels = rng.integers(0, 8, size=400)
+    return centers[labels] + rng.normal(size=(400, 16))
+
+def exact_neighbors(vectors, queries, k):
+    store = VectorStore(index=FlatIndex())
+    store.add_vectors(vectors)
+    indices, _ = store.search_batch(queries, k)
+    return indices
+
+def test_flat_index_is_default():
+    assert isinstance(VectorStore().index, FlatIndex)
+
+def test_ivf_falls_back_to_exact_before_training(clustered_vectors):
+    store = VectorStore(index=IVFIndex(n_lists=50, train_factor=100))
+    store.add_vectors(clustered_vectors[:20])
+    assert not store.index.is_trained
+
+    indices, _ = store.search_batch(clustered_vectors[:3], k=5)
+    expected = exact_neighbors(clustered_vectors[:20], clustered_vectors[:3], 5)
+    assert np.array_equal(indices, expected)
+
+def test_ivf_trains_and_matches_exact_with_full_probe(clustered_vectors):
+    index = IVFIndex(n_lists=8, nprobe=8, train_factor=4)
+    store = VectorStore(index=index)
+    for vector in clustered_vectors:
+        store.add_vector(vector)
+    assert index.is_trained
+    assert sum(len(cell) for cell in index._lists) == len(clustered_vectors)
+
+    queries = clustered_vectors[::40]
+    indices, distances = store.search_batch(queries, k=5)
+    assert np.array_equal(indices, exact_neighbors(clustered_vectors, queries, 5))
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+def test_ivf_recall_with_partial_probe(clustered_vectors):
+    store = VectorStore(index=IVFIndex(n_lists=8, nprobe=2, train_factor=4))
+    store.add_vectors(clustered_vectors)
+
+    queries = clustered_vectors[::10]
+    indices, _ = store.search_batch(queries, k=5)
+    expected = exact_neighbors(clustered_vectors, queries, 5)
+    recall = np.mean([
+        len(set(found) & set(truth)) / 5
+        for found, truth in zip(indices, expected)
+    ])
+    assert recall >= 0.9
+
+def test_use_centroids_sets_ivf_cells(clustered_vectors):
+    store = VectorStore(index=IVFIndex(n_lists=64, train_factor=100))
+    store.add_vectors(clustered_vectors)
+    assert not store.index.is_trained
+
+    centroids = np.random.default_rng(1).normal(size=(4, 16))
+    store.use_centroids(centroids)
+    assert store.index.is_trained
+    assert len(store.index.centroids) == 4
+
+def test_use_centroids_ignored_by_flat_index(clustered_vectors):
+    store = VectorStore()
+    store.add_vectors(clustered_vectors)
+    store.use_centroids(np.ones((4, 16)))
+    assert isinstance(store.index, FlatIndex)
+
+def test_rebuild_resets_ivf(clustered_vectors):
+    store = VectorStore(index=IVFIndex(n_lists=8, train_factor=4))
+    store.add_vectors(clustered_vectors)
+    assert store.index.is_trained
+    store.rebuild(clustered_vectors[:10])
+    assert not store.index.is_trained
+
+def test_hnsw_index(clustered_vectors):
+    pytest.importorskip("hnswlib")
+    store = VectorStore(initial_capacity=16, index=HNSWIndex())
+    for vector in clustered_vectors:
+        store.add_vector(vector)
+
+    queries = clustered_vectors[::40]
+    indices, distances = store.search_batch(queries, k=5)
+    expected = exact_neighbors(clustered_vectors, queries, 5)
+    assert indices[:, 0].tolist() == expected[:, 0].tolist()
+    assert np.allclose(distances[:, 0], 0.0, atol=1e-5)
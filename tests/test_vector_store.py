@@ -52,4 +52,85 @@ def test_search(vector_store):
 def test_search_empty_store(vector_store):
     indices, distances = vector_store.search([1.0, 0.0], k=5)
     assert indices == []
-    assert distances == []
\ No newline at end of file
+    assert distances == []
+
+def test_capacity_doubles(vector_store):
+    store = VectorStore(initial_capacity=2)
+    for i in range(5):
+        store.add_vector([float(i), 1.0])
+    assert len(store) == 5
+    assert store.capacity == 8
+    assert store.vectors.shape == (5, 2)
+    assert store.vectors.dtype == np.float32
+
+def test_add_vector_dimension_mismatch(vector_store):
+    vector_store.add_vector([1.0, 0.0])
+    with pytest.raises(ValueError):
+        vector_store.add_vector([1.0, 0.0, 0.0])
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 8))
+    store = VectorStore(initial_capacity=4)
+    for vector in vectors:
+        store.add_vector(vector.tolist())
+
+    query = rng.normal(size=8)
+    indices, distances = store.search(query.tolist(), k=5)
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = 1.0 - normed @ (query / np.linalg.norm(query))
+    assert indices == np.argsort(expected)[:5].tolist()
+    assert np.allclose(distances, np.sort(expected)[:5], atol=1e-5)
+
+def test_search_euclidean():
+    store = VectorStore(metric='euclidean')
+    store.add_vectors([[0.0, 0.0], [3.0, 4.0], [1.0, 0.0]])
+    indices, distances = store.search([0.0, 0.0], k=3)
+    assert indices == [0, 2, 1]
+    assert np.allclose(distances, [0.0, 1.0, 5.0])
+
+
+def test_search_batch(vector_store):
+    vector_store.add_vectors([
+        [1.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0],
+        [0.0, 0.0, 1.0]
+    ])
+    queries = np.array([[0.9, 0.1, 0.0], [0.0, 0.1, 0.9]])
+    indices, distances = vector_store.search_batch(queries, k=2)
+
+    assert indices.shape == (2, 2)
+    assert distances.shape == (2, 2)
+    assert indices[0, 0] == 0
+    assert indices[1, 0] == 2
+    assert np.all(np.diff(distances, axis=1) >= 0)
+
+def test_search_batch_matches_search():
+    rng = np.random.default_rng(1)
+    store = VectorStore()
+    store.add_vectors(rng.normal(size=(50, 6)))
+    queries = rng.normal(size=(4, 6))
+
+    indices, distances = store.search_batch(queries, k=3)
+    for query, row_indices, row_distances in zip(queries, indices, distances):
+        single_indices, single_distances = store.search(query.tolist(), k=3)
+        assert row_indices.tolist() == single_indices
+        assert np.allclose(row_distances, single_distances)
+
+def test_search_batch_empty_store(vector_store):
+    indices, distances = vector_store.search_batch(np.ones((3, 2)), k=5)
+    assert indices.shape == (3, 0)
+    assert distances.shape == (3, 0)
+
+def test_attach_does_not_copy(vector_store):
+    matrix = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    matrix.flags.writeable = False
+    vector_store.attach(matrix)
+    assert np.shares_memory(vector_store.vectors, matrix)
+    assert vector_store.search([0.0, 1.0], k=1)[0] == [1]
+
+    # Growing after attach copies into a new writable buffer
+    vector_store.add_vector([1.0, 1.0])
+    assert len(vector_store) == 3
+    assert np.allclose(matrix, [[1.0, 0.0], [0.0, 1.0]])
@@ -1,8 +1,11 @@
 # tests/test_verifier.py
+import time
 import pytest
+from unittest.mock import patch
 from agents.verifier import Verifier
 from core.message import Message
 from core.task import Task
+from core.code_executor import InProcessExecutor, WorkerPool
 
 def test_verifier_initialization():
     verifier = Verifier()
@@ -38,4 +41,181 @@ def test_execute_invalid_code():
     
     result = task.execution_results["1"]
     assert result["status"] == "failed"
-    assert "error" in result
\ No newline at end of file
+    assert "error" in result
+
+def test_verifier_with_worker_pool():
+    with WorkerPool(n_workers=2, timeout=1.0) as pool:
+        verifier = Verifier(executor=pool)
+        task = Task(
+            task_id="test",
+            description="Test task",
+            subtasks=[{"id": "1", "description": "test"}, {"id": "2", "description": "hang"}]
+        )
+        task.add_code_block("1", "x = 1 + 1")
+        task.add_code_block("2", "while True:\n    pass")
+        
+        response = verifier.process(Message("engineer", "verifier", task))
+        
+        assert task.execution_results["1"]["status"] == "success"
+        assert task.execution_results["2"]["status"] == "failed"
+        assert response.recipient_id == "planner"
+
+def test_verifier_skips_unchanged_passing_blocks():
+    executor = InProcessExecutor()
+    verifier = Verifier(executor=executor)
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[{"id": "1", "description": "ok"}, {"id": "2", "description": "broken"}]
+    )
+    task.add_code_block("1", "x = 1")
+    task.add_code_block("2", "1 / 0")
+    
+    with patch.object(executor, "submit", wraps=executor.submit) as submit:
+        verifier.process(Message("engineer", "verifier", task))
+        task.add_code_block("3", "y = 2")
+        verifier.process(Message("engineer", "verifier", task))
+    
+    # The passing block ran once; the failing one is retried
+    executed = [call.args[0] for call in submit.call_args_list]
+    assert executed == ["x = 1", "1 / 0", "1 / 0", "y = 2"]
+    assert task.execution_results["1"]["status"] == "success"
+    assert task.execution_results["3"]["status"] == "success"
+    assert verifier.cache.stats["hits"] == 1
+    # The reused result is marked, so it is not charged as a new execution
+    assert task.execution_results["1"]["cached"] is True
+    assert "cached" not in task.execution_results["3"]
+
+def test_verifier_reruns_changed_blocks():
+    verifier = Verifier()
+    task = Task(task_id="test", description="Test task", subtasks=[{"id": "1", "description": "test"}])
+    task.add_code_block("1", "x = 1")
+    verifier.process(Message("engineer", "verifier", task))
+    
+    task.add_code_block("1", "x = 2")
+    verifier.process(Message("engineer", "verifier", task))
+    assert "2" in task.execution_results["1"]["output"]
+    assert verifier.cache.stats["hits"] == 0
+
+def make_dag_task(delay=0.0):
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[
+            {"id": "load", "description": "load"},
+            {"id": "left", "description": "left", "depends_on": ["load"]},
+            {"id": "right", "description": "right", "depends_on": ["load"]},
+            {"id": "report", "description": "report", "depends_on": ["left", "right"]}
+        ]
+    )
+    sleep = f"import time\ntime.sleep({delay})\n"
+    task.add_code_block("load", sleep + "data = [1, 2, 3]\ndef total(xs):\n    return sum(xs)")
+    task.add_code_block("left", sleep * 2 + "left = total(data)")
+    task.add_code_block("right", sleep * 2 + "right = max(data)")
+    task.add_code_block("report", "report = (left, right, len(data))")
+    return task
+
+def test_verifier_passes_upstream_exports():
+    verifier = Verifier()
+    task = make_dag_task()
+    verifier.process(Message("engineer", "verifier", task))
+    
+    assert all(result["status"] == "success" for result in task.execution_results.values())
+    assert "'report': (6, 3, 3)" in task.execution_results["report"]["output"]
+    assert "exports" not in task.execution_results["report"]
+
+def test_verifier_runs_independent_branches_concurrently():
+    with WorkerPool(n_workers=2, timeout=5.0) as pool:
+        verifier = Verifier(executor=pool)
+        task = make_dag_task(delay=0.2)
+        start = time.monotonic()
+        verifier.process(Message("engineer", "verifier", task))
+        elapsed = time.monotonic() - start
+    
+    assert task.execution_results["report"]["status"] == "success"
+    assert "'report': (6, 3, 3)" in task.execution_results["report"]["output"]
+    # load (0.2s) then left/right side by side (0.4s), not one after the other
+    assert elapsed < 0.95
+
+def test_verifier_skips_dependents_of_failed_blocks():
+    verifier = Verifier()
+    task = make_dag_task()
+    task.add_code_block("left", "1 / 0")
+    verifier.process(Message("engineer", "verifier", task))
+    
+    assert task.execution_results["right"]["status"] == "success"
+    assert task.execution_results["report"]["status"] == "failed"
+    assert task.execution_results["report"]["blocked_by"] == "left"
+
+def test_verifier_reruns_dependents_when_upstream_changes():
+    verifier = Verifier()
+    task = make_dag_task()
+    verifier.process(Message("engineer", "verifier", task))
+    
+    task.add_code_block("load", "data = [10]\ndef total(xs):\n    return sum(xs)")
+    verifier.process(Message("engineer", "verifier", task))
+    assert "'report': (10, 10, 1)" in task.execution_results["report"]["output"]
+
+def test_verifier_reports_dependency_cycles():
+    verifier = Verifier()
+    task = Task(
+        task_id="test",
+        description="Test task",
+        subtasks=[
+            {"id": "a", "description": "a", "depends_on": ["b"]},
+            {"id": "b", "description": "b", "depends_on": ["a"]},
+            {"id": "c", "description": "c"}
+        ]
+    )
+    for subtask_id in "abc":
+        task.add_code_block(subtask_id, "x = 1")
+    verifier.process(Message("engineer", "verifier", task))
+    
+    assert task.execution_results["c"]["status"] == "success"
+    assert "cycle" in task.execution_results["a"]["error"]
+    assert "cycle" in task.execution_results["b"]["error"]
+
+def test_verifier_only_exports_blocks_with_dependents():
+    verifier = Verifier()
+    task = make_dag_task()
+    with patch.object(verifier.executor, "submit", wraps=verifier.executor.submit) as submit:
+        verifier.process(Message("engineer", "verifier", task))
+    
+    exported = {call.args[0]: call.kwargs["export"] for call in submit.call_args_list}
+    assert exported[task.code_blocks["load"]] is True
+    assert exported[task.code_blocks["report"]] is False
+
+def test_downstream_blocks_cannot_mutate_cached_exports():
+    verifier = Verifier()
+    subtasks = [
+        {"id": "1", "description": "load"},
+        {"id": "2", "description": "use", "depends_on": ["1"]}
+    ]
+    first = Task("first", "First", subtasks)
+    first.add_code_block("1", "data = [1]")
+    first.add_code_block("2", "data.append(2)\nn = len(data)")
+    verifier.process(Message("engineer", "verifier", first))
+    
+    # Block 1 is served from the cache, unchanged by block 2 of the first task
+    second = Task("second", "Second", subtasks)
+    second.add_code_block("1", "data = [1]")
+    second.add_code_block("2", "m = len(data)")
+    verifier.process(Message("engineer", "verifier", second))
+    assert verifier.cache.stats["hits"] == 1
+    assert "'m': 1" in second.execution_results["2"]["output"]
+
+def test_cached_leaf_is_rerun_when_it_gains_dependents():
+    verifier = Verifier()
+    leaf = Task("leaf", "Leaf", [{"id": "1", "description": "load"}])
+    leaf.add_code_block("1", "data = [1, 2]")
+    verifier.process(Message("engineer", "verifier", leaf))
+    
+    task = Task("task", "Task", [
+        {"id": "1", "description": "load"},
+        {"id": "2", "description": "use", "depends_on": ["1"]}
+    ])
+    task.add_code_block("1", "data = [1, 2]")
+    task.add_code_block("2", "n = len(data)")
+    verifier.process(Message("engineer", "verifier", task))
+    assert task.execution_results["2"]["status"] == "success"
+    assert "'n': 2" in task.execution_results["2"]["output"]
@@ -2,41 +2,209 @@
 import pytest
 from agents.voter import Voter
 from core.message import Message
+from core.run_context import RunContext
+from core.stopping_policy import Budget, NoImprovement, PerfectScore
 from core.task import Task
 
 def test_voter_initialization():
     voter = Voter(max_iterations=5)
     assert voter.agent_id == "voter"
     assert voter.max_iterations == 5
-    assert voter.iterations == 0
-    assert voter.candidates == []
 
 def test_process_before_max_iterations():
     voter = Voter(max_iterations=3)
+    context = RunContext()
     task = Task("test", "Test task", [])
-    message = Message("verifier", "voter", task)
+    message = Message("verifier", "voter", task, context=context)
     
     response = voter.process(message)
-    assert voter.iterations == 1
-    assert len(voter.candidates) == 1
+    assert context.iterations == 1
+    assert len(context.candidates) == 1
     assert response.recipient_id == "planner"
+    assert response.context is context
 
 def test_process_at_max_iterations():
-    voter = Voter(max_iterations=2)
+    voter = Voter(max_iterations=2, stopping_policies=[])
+    context = RunContext()
     task1 = Task("test1", "Test task 1", [])
     task2 = Task("test2", "Test task 2", [])
     
     # First iteration
     task1.update_execution_result("1", {"status": "success"})
-    message1 = Message("verifier", "voter", task1)
+    message1 = Message("verifier", "voter", task1, context=context)
     voter.process(message1)
     
     # Second iteration
     task2.update_execution_result("1", {"status": "failed"})
-    message2 = Message("verifier", "voter", task2)
+    message2 = Message("verifier", "voter", task2, context=context)
     response = voter.process(message2)
     
-    assert voter.iterations == 2
-    assert len(voter.candidates) == 2
+    assert context.iterations == 2
+    assert len(context.candidates) == 2
     assert response.recipient_id == "output"
-    assert response.content == task1  # Should select task1 as it has better results
\ No newline at end of file
+    assert response.content == task1  # Should select task1 as it has better results
+
+def test_select_best_task_breaks_ties_on_cost():
+    voter = Voter(max_iterations=2, stopping_policies=[])
+    slow = Task("slow", "Slow task", [])
+    fast = Task("fast", "Fast task", [])
+    slow.update_execution_result("1", {"status": "success", "metrics": {"wall_time": 2.0}})
+    fast.update_execution_result("1", {"status": "success", "metrics": {"wall_time": 0.5}})
+    
+    context = RunContext()
+    voter.process(Message("verifier", "voter", slow, context=context))
+    response = voter.process(Message("verifier", "voter", fast, context=context))
+    assert response.content.task_id == "fast"
+
+def test_select_best_task_prefers_success_over_cost():
+    voter = Voter(max_iterations=2, stopping_policies=[])
+    cheap = Task("cheap", "Cheap task", [])
+    working = Task("working", "Working task", [])
+    cheap.update_execution_result("1", {"status": "failed", "metrics": {"wall_time": 0.1}})
+    working.update_execution_result("1", {"status": "success", "metrics": {"wall_time": 5.0}})
+    
+    context = RunContext()
+    voter.process(Message("verifier", "voter", working, context=context))
+    response = voter.process(Message("verifier", "voter", cheap, context=context))
+    assert response.content.task_id == "working"
+
+def test_runs_do_not_share_state():
+    voter = Voter(max_iterations=2)
+    first, second = RunContext(), RunContext()
+    task = Task("test", "Test task", [])
+    
+    # Each run starts from its own first iteration
+    assert voter.process(Message("verifier", "voter", task, context=first)).recipient_id == "planner"
+    assert voter.process(Message("verifier", "voter", task, context=second)).recipient_id == "planner"
+    assert voter.process(Message("verifier", "voter", task, context=first)).recipient_id == "output"
+    assert second.iterations == 1
+
+def test_process_requires_context():
+    voter = Voter(max_iterations=2)
+    with pytest.raises(ValueError):
+        voter.process(Message("verifier", "voter", Task("test", "Test task", [])))
+
+def make_candidate(task_id, statuses):
+    task = Task(task_id, "Candidate", [])
+    for i, status in enumerate(statuses):
+        task.update_execution_result(str(i), {"status": status})
+    return task
+
+def test_fan_out_waits_for_every_candidate():
+    voter = Voter(max_iterations=3)
+    context = RunContext(fan_out=3)
+    partial = make_candidate("partial", ["success", "failed"])
+    worse = make_candidate("worse", ["failed", "failed"])
+    
+    assert voter.process(Message("verifier", "voter", partial, context=context)) == []
+    assert voter.process(Message("verifier", "voter", worse, context=context)) == []
+    responses = voter.process(Message("verifier", "voter", worse, context=context))
+    assert [response.recipient_id for response in responses] == ["output"]
+    assert responses[0].content is partial
+
+def test_fan_out_stops_early_on_perfect_score():
+    voter = Voter(max_iterations=3)
+    context = RunContext(fan_out=3)
+    perfect = make_candidate("perfect", ["success", "success"])
+    
+    responses = voter.process(Message("verifier", "voter", perfect, context=context))
+    assert responses[0].recipient_id == "output"
+    assert responses[0].content is perfect
+    assert context.selected
+    # Candidates arriving after the selection are dropped
+    late = make_candidate("late", ["success", "success"])
+    assert voter.process(Message("verifier", "voter", late, context=context)) == []
+    assert context.iterations == 1
+
+def test_fan_out_without_early_stop_scores_all():
+    voter = Voter(max_iterations=2, stopping_policies=[])
+    context = RunContext(fan_out=2)
+    perfect = make_candidate("perfect", ["success"])
+    
+    assert voter.process(Message("verifier", "voter", perfect, context=context)) == []
+    responses = voter.process(Message("verifier", "voter", make_candidate("other", ["failed"]), context=context))
+    assert responses[0].content is perfect
+
+def test_perfect_score_stops_serial_run_early():
+    voter = Voter(max_iterations=5)
+    context = RunContext()
+    response = voter.process(Message("verifier", "voter", make_candidate("perfect", ["success"]), context=context))
+    
+    assert response.recipient_id == "output"
+    assert context.iterations == 1
+    assert context.iterations_saved == 4
+    assert context.stop_reason == repr(PerfectScore())
+    assert voter.stats == {"runs": 1, "stopped_early": 1, "iterations_saved": 4}
+
+def test_no_improvement_stops_after_patience():
+    voter = Voter(max_iterations=10, stopping_policies=[NoImprovement(patience=2)])
+    context = RunContext()
+    recipients = [
+        voter.process(Message("verifier", "voter", make_candidate(str(i), statuses), context=context)).recipient_id
+        for i, statuses in enumerate([["failed", "failed"], ["success", "failed"], ["failed", "failed"], ["success", "failed"]])
+    ]
+    
+    assert recipients == ["planner", "planner", "planner", "output"]
+    assert context.iterations_saved == 6
+    assert context.stop_reason == "NoImprovement(patience=2)"
+
+def test_no_improvement_resets_on_better_candidate():
+    policy = NoImprovement(patience=2)
+    context = RunContext()
+    context.scores = [0.0, 0.5, 0.5]
+    assert not policy.should_stop(context)
+    context.scores.append(0.5)
+    assert policy.should_stop(context)
+
+def test_budget_policy():
+    context = RunContext()
+    assert not Budget().should_stop(context)
+    assert Budget(max_seconds=0.0).should_stop(context)
+    assert not Budget(max_seconds=60.0).should_stop(context)
+    context.cost = 3.0
+    assert Budget(max_cost=2.5).should_stop(context)
+    assert not Budget(max_cost=5.0).should_stop(context)
+
+def test_serial_run_selects_candidate_as_scored():
+    voter = Voter(max_iterations=10, stopping_policies=[NoImprovement(patience=1)])
+    context = RunContext()
+    task = make_candidate("task", ["success", "failed"])
+    assert voter.process(Message("verifier", "voter", task, context=context)).recipient_id == "planner"
+    
+    # The Planner and Verifier revise the same Task for the next iteration
+    task.update_execution_result("0", {"status": "failed"})
+    response = voter.process(Message("verifier", "voter", task, context=context))
+    
+    assert response.recipient_id == "output"
+    assert response.content.execution_results["0"]["status"] == "success"
+
+def test_cached_results_cost_nothing():
+    voter = Voter(max_iterations=5, stopping_policies=[Budget(max_cost=1.0)])
+    context = RunContext()
+    task = Task("cached", "Cached task", [])
+    task.update_execution_result("1", {"status": "failed", "metrics": {"wall_time": 0.6}})
+    task.update_execution_result("2", {"status": "success", "metrics": {"wall_time": 0.6}, "cached": True})
+    
+    assert voter.process(Message("verifier", "voter", task, context=context)).recipient_id == "planner"
+    assert context.cost == pytest.approx(0.6)
+
+def test_budget_stops_on_execution_cost():
+    voter = Voter(max_iterations=5, stopping_policies=[Budget(max_cost=1.0)])
+    context = RunContext()
+    task = Task("slow", "Slow task", [])
+    task.update_execution_result("1", {"status": "failed", "metrics": {"wall_time": 0.6}})
+    
+    assert voter.process(Message("verifier", "voter", task, context=context)).recipient_id == "planner"
+    assert voter.process(Message("verifier", "voter", task, context=context)).recipient_id == "output"
+    assert context.cost == pytest.approx(1.2)
+    assert context.iterations_saved == 3
+
+def test_full_run_saves_no_iterations():
+    voter = Voter(max_iterations=2)
+    context = RunContext()
+    voter.process(Message("verifier", "voter", make_candidate("a", ["failed"]), context=context))
+    voter.process(Message("verifier", "voter", make_candidate("b", ["failed"]), context=context))
+    
+    assert context.iterations_saved == 0
+    assert context.stop_reason is None
+    assert voter.stats == {"runs": 1, "stopped_early": 0, "iterations_saved": 0}